@@ -0,0 +1,27 @@
+if __name__ == "__main__":
+    import os
+    import timeit
+    from pathlib import Path
+
+    from pipelime.items import Item
+
+    # the file names of a metadata-heavy dataset, as listed by a reader
+    data_folder = (
+        Path(__file__).resolve().absolute().parents[2]
+        / "tests/sample_data/datasets/underfolder_minimnist/data"
+    )
+    with os.scandir(data_folder) as it:
+        paths = [entry.path for entry in it if entry.is_file()]
+
+    def _checked():
+        for p in paths:
+            Item.get_instance(p)
+
+    def _trusted():
+        for p in paths:
+            Item.get_trusted_instance(p)
+
+    number = 200
+    for name, fn in (("get_instance", _checked), ("get_trusted_instance", _trusted)):
+        elapsed = min(timeit.repeat(fn, number=number, repeat=5))
+        print(f"{name}: {elapsed / (number * len(paths)) * 1e6:.2f} us per item")
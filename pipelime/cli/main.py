@@ -36,6 +36,7 @@ class PlCliOptions(BaseModel):
     command_outputs: t.Optional[Path]
     verbose: int
     data_cache: t.Optional[str]
+    data_cache_size: t.Optional[str] = None
     dry_run: bool
     no_ui: bool
     command: str
@@ -81,12 +82,20 @@ def _set_logger_level(verbose: int):
         os.environ["LOGURU_LEVEL"] = level
 
 
-def _set_item_data_cache(data_cache: t.Optional[str]):
+def _set_item_data_cache(
+    data_cache: t.Optional[str], data_cache_size: t.Optional[str] = None
+):
     from loguru import logger
+    from pydantic.v1 import ByteSize, parse_obj_as
 
-    from pipelime.items import enable_item_data_cache
+    from pipelime.items import ItemDataCache, enable_item_data_cache
     from pipelime.utils.pydantic_types import ItemType
 
+    if data_cache_size:
+        max_bytes = parse_obj_as(ByteSize, data_cache_size.strip())
+        logger.debug(f"Setting the data cache budget to {max_bytes.human_readable()}.")
+        ItemDataCache.set_budget(max_bytes)
+
     item_list = (data_cache or "").replace(" ", "").split(",")
     item_list = [i for i in item_list if i]
 
@@ -457,6 +466,13 @@ def pl_main(
             "Use the special `*` value to enable data cache for any item."
         ),
     ),
+    data_cache_size: t.Optional[str] = typer.Option(
+        None,
+        help=(
+            "The byte budget of the item data cache in each process, eg, `512MB` or "
+            "`2GiB`. The least recently used data is dropped when exceeded."
+        ),
+    ),
     verbose: int = typer.Option(
         0,
         "--verbose",
@@ -610,6 +626,7 @@ def pl_main(
             command_outputs=command_outputs,
             verbose=verbose,
             data_cache=data_cache,
+            data_cache_size=data_cache_size,
             dry_run=dry_run,
             no_ui=no_ui,
             command=command,
@@ -654,7 +671,7 @@ def run_with_checkpoint(
     from pipelime.choixe import XConfig
     from pipelime.cli.pretty_print import print_error, print_info, print_warning
 
-    _set_item_data_cache(cli_opts.data_cache)
+    _set_item_data_cache(cli_opts.data_cache, cli_opts.data_cache_size)
     PipelimeSymbolsHelper.set_extra_modules(cli_opts.extra_modules)
 
     if cli_opts.pipelime_tmp:
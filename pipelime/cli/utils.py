@@ -160,10 +160,10 @@ class PipelimeSymbolsHelper:
                             symbol_type, sym_name, sym_cls, other_sym_cls
                         )
 
-            # check for double commands across modules
+            # check for double commands across modules, skipping re-exported symbols
             module_symbols = dict(module_symbols)
             for sym_name, sym_cls in module_symbols.items():
-                if sym_name in all_syms:
+                if sym_name in all_syms and sym_cls is not all_syms[sym_name]:
                     cls._warn_double_def(
                         symbol_type, sym_name, sym_cls, all_syms[sym_name]
                     )
@@ -850,6 +850,10 @@ class PipelimeUserAppDir:
     def base_checkpoints_path(cls) -> Path:
         return cls.base_path() / "ckpts"
 
+    @classmethod
+    def grabber_calibration_path(cls) -> Path:
+        return cls.base_path() / "grabber_calibration.json"
+
     @classmethod
     def temporary_checkpoint_path(cls) -> Path:
         ckpt = cls.base_checkpoints_path() / (cls.BASE_CHECKPOINT_NAME + "~")
@@ -11,6 +11,7 @@ from pipelime.commands.general import (
     SliceCommand,
     SortCommand,
     StageTimingCommand,
+    StatsCommand,
     TimeItCommand,
     ValidateCommand,
     ZipCommand,
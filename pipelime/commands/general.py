@@ -574,14 +574,13 @@ class ValidateCommand(PipelimeCommand, title="validate"):
         seq = self.input.create_reader()
         if self.max_samples != 0:
             seq = seq[0 : self.max_samples]  # noqa
-        item_info = StageItemInfo()
-
-        self.grabber.grab_all(
+        item_info = self.grabber.reduce(
             seq,
-            keep_order=False,
+            StageItemInfo,
+            StageItemInfo.update,
+            StageItemInfo.merge,
             parent_cmd=self,
             track_message=f"Reading data ({len(seq)} samples)",
-            sample_fn=item_info,
         )
 
         sample_schema = {
@@ -615,6 +614,142 @@ class ValidateCommand(PipelimeCommand, title="validate"):
         )
 
 
+class _ArrayStatistics:
+    """Running statistics of the values of numpy arrays. Partial results are merged
+    through the parallel algorithm by Chan et al.
+    """
+
+    def __init__(self):
+        self.samples = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def update(self, value) -> None:
+        import numpy as np
+
+        other = _ArrayStatistics()
+        other.samples = 1
+        value = np.asarray(value, dtype=np.float64)
+        if value.size > 0:
+            other.count = value.size
+            other.mean = float(value.mean())
+            other.m2 = float(np.square(value - other.mean).sum())
+            other.min = float(value.min())
+            other.max = float(value.max())
+        self.merge(other)
+
+    def merge(self, other: "_ArrayStatistics") -> None:
+        self.samples += other.samples
+        if other.count == 0:
+            return
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        return {
+            "samples": self.samples,
+            "values": self.count,
+            "min": self.min if self.count > 0 else None,
+            "max": self.max if self.count > 0 else None,
+            "mean": self.mean if self.count > 0 else None,
+            "std": (self.m2 / self.count) ** 0.5 if self.count > 0 else None,
+        }
+
+
+class _DatasetStatistics:
+    """Collects the statistics of numpy items by key."""
+
+    def __init__(self, keys: t.Optional[t.Sequence[str]] = None):
+        self.keys = keys
+        self.stats: t.Dict[str, _ArrayStatistics] = {}
+
+    def update(self, x) -> "_DatasetStatistics":
+        from pipelime.items import NumpyItem
+
+        for k, v in x.items():
+            if self.keys is None:
+                if not isinstance(v, NumpyItem) or v.is_shared:
+                    continue
+            elif k not in self.keys:
+                continue
+            self.stats.setdefault(k, _ArrayStatistics()).update(v())
+        return self
+
+    def merge(self, other: "_DatasetStatistics") -> "_DatasetStatistics":
+        for k, v in other.stats.items():
+            self.stats.setdefault(k, _ArrayStatistics()).merge(v)
+        return self
+
+
+class StatsCommand(PipelimeCommand, title="stats"):
+    """Computes the statistics of the values of numpy items, eg, images,
+    ie, min, max, mean and standard deviation."""
+
+    class OutputStatistics(pyd.BaseModel):
+        stats: t.Mapping[str, t.Mapping[str, t.Any]]
+
+        def __repr__(self) -> str:
+            return self.__piper_repr__()
+
+        def __piper_repr__(self) -> str:
+            import yaml
+
+            return yaml.safe_dump(self.stats, sort_keys=False)
+
+    input: pl_interfaces.InputDatasetInterface = (
+        pl_interfaces.InputDatasetInterface.pyd_field(
+            alias="i", piper_port=PiperPortType.INPUT
+        )
+    )
+
+    keys: t.Union[str, t.Sequence[str], None] = pyd.Field(
+        None,
+        alias="k",
+        description=(
+            "The keys of the items to analyze. If not set, all the numpy items "
+            "not shared are considered."
+        ),
+    )
+
+    grabber: pl_interfaces.GrabberInterface = pl_interfaces.GrabberInterface.pyd_field(
+        alias="g"
+    )
+
+    output_stats: t.Optional[OutputStatistics] = pyd.Field(
+        None,
+        description="Statistics of each item key.",
+        exclude=True,
+        repr=False,
+        piper_port=PiperPortType.OUTPUT,
+    )
+
+    def run(self):
+        from functools import partial
+
+        seq = self.input.create_reader()
+        keys = [self.keys] if isinstance(self.keys, str) else self.keys
+        dataset_stats = self.grabber.reduce(
+            seq,
+            partial(_DatasetStatistics, keys),
+            _DatasetStatistics.update,
+            _DatasetStatistics.merge,
+            parent_cmd=self,
+            track_message=f"Computing statistics ({len(seq)} samples)",
+        )
+        self.output_stats = StatsCommand.OutputStatistics(
+            stats={k: v.to_dict() for k, v in sorted(dataset_stats.stats.items())}
+        )
+
+
 class MapCommand(PipelimeCommand, title="map"):
     """Apply a stage on a dataset."""
 
@@ -733,6 +868,14 @@ class SortCommand(PipelimeCommand, title="sort"):
             "ie, accepting two arguments, to a key function."
         ),
     )
+    probe_images: bool = pyd.Field(
+        False,
+        description=(
+            "Read just the header of the image items, so that the key path can "
+            "access, eg, `image.width`, `image.height`, `image.channels`, "
+            "`image.dtype` and `image.format` without decoding the pixels."
+        ),
+    )
 
     input: pl_interfaces.InputDatasetInterface = (
         pl_interfaces.InputDatasetInterface.pyd_field(
@@ -751,7 +894,7 @@ class SortCommand(PipelimeCommand, title="sort"):
     )
 
     def _sort_key_fn(self, x):
-        return x.deep_get(self.sort_key)
+        return x.deep_get(self.sort_key, probe_images=self.probe_images)
 
     def run(self):
         if (self.sort_key is None) == (self.sort_fn is None):
@@ -774,6 +917,33 @@ class SortCommand(PipelimeCommand, title="sort"):
         )
 
 
+class _FilterVerdict:
+    """Replaces a sample with a tiny one telling whether it passes the filter."""
+
+    def __init__(self, filter_fn):
+        self._filter_fn = filter_fn
+
+    def __call__(self, x):
+        from pipelime.items import YamlMetadataItem
+        from pipelime.sequences import Sample
+
+        return Sample({"valid": YamlMetadataItem(bool(self._filter_fn(x)))})
+
+
+def _write_selection(cmd, seq, valid_idxs: t.Sequence[int]):
+    """Writes the selected samples in parallel. Since the indexes are sorted, each
+    sample is written at its final position, ie, the number of valid samples before it.
+    """
+    seq = cmd.output.append_writer(seq.select(sorted(valid_idxs)))
+    cmd.grabber.grab_all(
+        seq,
+        grab_context_manager=cmd.output.serialization_cm(),
+        keep_order=False,
+        parent_cmd=cmd,
+        track_message=f"Writing data ({len(seq)} samples)",
+    )
+
+
 class FilterCommand(PipelimeCommand, title="filter"):
     """Filter samples by metadata values or according to a custom sorting function."""
 
@@ -790,6 +960,14 @@ class FilterCommand(PipelimeCommand, title="filter"):
             "of a callable `(Sample) -> bool` returning True for any valid sample."
         ),
     )
+    probe_images: bool = pyd.Field(
+        False,
+        description=(
+            "Read just the header of the image items, so that the query can "
+            "access, eg, `image.width`, `image.height`, `image.channels`, "
+            "`image.dtype` and `image.format` without decoding the pixels."
+        ),
+    )
 
     input: pl_interfaces.InputDatasetInterface = (
         pl_interfaces.InputDatasetInterface.pyd_field(
@@ -817,16 +995,39 @@ class FilterCommand(PipelimeCommand, title="filter"):
         return v
 
     def _filter_key_fn(self, x):
-        return x.match(self.filter_query)
+        return x.match(self.filter_query, probe_images=self.probe_images)
 
     def run(self):
-        from pipelime.sequences import DataStream
+        from pipelime.sequences import DataStream, reuse_worker_pools
+        from pipelime.stages import StageLambda
 
         filter_fn = (
             self._filter_key_fn if self.filter_fn is None else self.filter_fn.value
         )
 
-        # multi-processing friendly filtering
+        seq = self.input.create_reader()
+
+        if self.output.zfill is None:
+            self.output.zfill = seq.best_zfill()
+
+        if self.grabber.num_workers != 0:
+            # two-phase filtering: the workers send back just the verdicts,
+            # then the valid samples are written in parallel
+            valid_idxs = []
+            with reuse_worker_pools():
+                self.grabber.grab_all(
+                    seq.map(StageLambda(_FilterVerdict(filter_fn))),
+                    keep_order=False,
+                    parent_cmd=self,
+                    sample_fn=lambda x, idx: (
+                        valid_idxs.append(idx) if x["valid"]() else None
+                    ),
+                    track_message=f"Filtering data ({len(seq)} samples)",
+                )
+                _write_selection(self, seq, valid_idxs)
+            return
+
+        # single process filtering
         class _WriterHelper:
             def __init__(self, output_pipe):
                 self.stream = DataStream(output_pipe=output_pipe)
@@ -837,10 +1038,6 @@ class FilterCommand(PipelimeCommand, title="filter"):
                     self.stream.set_output(self.curr_idx, sample)
                     self.curr_idx += 1
 
-        seq = self.input.create_reader()
-
-        if self.output.zfill is None:
-            self.output.zfill = seq.best_zfill()
         writer_helper = _WriterHelper(output_pipe=self.output.as_pipe())
 
         seq = seq.filter(filter_fn, lazy=True, insert_empty_samples=True)
@@ -931,7 +1128,7 @@ class SetMetadataCommand(FilterCommand, title="set-meta"):
     )
 
     def _filter_key_fn(self, idx, x):
-        return x.match(self.filter_query)
+        return x.match(self.filter_query, probe_images=self.probe_images)
 
     def run(self) -> None:
         from pipelime.stages import StageSetMetadata
@@ -990,16 +1187,41 @@ class FilterDuplicatesCommand(PipelimeCommand, title="filter-duplicates"):
     )
 
     def run(self):
-        from pipelime.sequences import DataStream
-        from pipelime.stages import StageSampleHash
+        from pipelime.sequences import DataStream, reuse_worker_pools
+        from pipelime.stages import StageKeysFilter, StageSampleHash
 
         seq = self.input.create_reader()
         hash_key = self._get_hash_key(list(seq[0].keys()))
         keys = [self.keys] if isinstance(self.keys, str) else self.keys
         stage = StageSampleHash(algorithm=self.algorithm, keys=keys, hash_key=hash_key)
+
+        if self.output.zfill is None:
+            self.output.zfill = seq.best_zfill()
+
+        if self.grabber.num_workers != 0:
+            # two-phase filtering: the workers send back just the hashes,
+            # then the first sample of each hash is written in parallel
+            hashes = {}
+            with reuse_worker_pools():
+                self.grabber.grab_all(
+                    seq.map(stage).map(StageKeysFilter(key_list=hash_key)),
+                    keep_order=False,
+                    parent_cmd=self,
+                    sample_fn=lambda x, idx: hashes.__setitem__(idx, x[hash_key]()),
+                    track_message=f"Checking hashes ({len(seq)} samples)",
+                )
+
+                unique_hashes, valid_idxs = set(), []
+                for idx in sorted(hashes):
+                    if hashes[idx] not in unique_hashes:
+                        unique_hashes.add(hashes[idx])
+                        valid_idxs.append(idx)
+                _write_selection(self, seq, valid_idxs)
+            return
+
         seq = seq.map(stage)
 
-        # multi-processing friendly filtering
+        # single process filtering
         class _WriterHelper:
             def __init__(self, output_pipe):
                 self.stream = DataStream(output_pipe=output_pipe)
@@ -1014,8 +1236,6 @@ class FilterDuplicatesCommand(PipelimeCommand, title="filter-duplicates"):
                     self.stream.set_output(self.curr_idx, sample)
                     self.curr_idx += 1
 
-        if self.output.zfill is None:
-            self.output.zfill = seq.best_zfill()
         writer_helper = _WriterHelper(output_pipe=self.output.as_pipe())
 
         # filter out samples that have a hash that appears more than once
@@ -9,6 +9,7 @@ import pydantic.v1 as pyd
 from pydantic.v1.generics import GenericModel
 
 from pipelime.piper import PiperPortType
+from pipelime.sequences import StagedWorkers
 from pipelime.utils.pydantic_types import ItemType, SampleValidationInterface, YamlInput
 
 
@@ -94,22 +95,64 @@ class GrabberInterface(PydanticFieldWithDefaultMixin, pyd.BaseModel, extra="forb
 
     _default_type_description: t.ClassVar[t.Optional[str]] = "Grabber options."
     _compact_form: t.ClassVar[t.Optional[str]] = (
-        "<num_workers>[,<prefetch>[,<allow_nested_mp>]]"
+        "<num_workers>[,<prefetch>[,<allow_nested_mp>[,<backend>]]]"
     )
 
-    num_workers: int = pyd.Field(
+    num_workers: t.Union[int, t.Literal["auto"]] = pyd.Field(
         0,
         description=(
             "The number of processes to spawn. If negative, "
-            "the number of (logical) cpu cores is used."
+            "the number of (logical) cpu cores is used. If `auto`, the number of "
+            "workers and the prefetch are chosen by a short calibration on the "
+            "actual pipe, whose result is cached in the user app directory."
         ),
     )
-    prefetch: pyd.PositiveInt = pyd.Field(
-        2, description="The number of samples loaded in advanced by each worker."
+    prefetch: t.Union[pyd.PositiveInt, t.Literal["auto"]] = pyd.Field(
+        2,
+        description=(
+            "The number of samples loaded in advanced by each worker. "
+            "If `auto`, it is tuned on the time spent on each sample."
+        ),
     )
     allow_nested_mp: bool = pyd.Field(
         False, description="Whether to allow nested multiprocessing."
     )
+    backend: t.Literal["process", "thread", "auto"] = pyd.Field(
+        "process",
+        description=(
+            "`process` spawns new processes, `thread` uses a pool of threads, "
+            "`auto` uses threads if the sequence is thread-safe."
+        ),
+    )
+    reorder_buffer: t.Optional[pyd.PositiveInt] = pyd.Field(
+        None,
+        description=(
+            "If the order must be preserved, the results are re-sequenced in a "
+            "buffer holding at most this number of samples. If None, a slow sample "
+            "blocks any later one."
+        ),
+    )
+    shm_threshold: t.Optional[pyd.NonNegativeInt] = pyd.Field(
+        None,
+        description=(
+            "Numpy arrays larger than this number of bytes are sent from the worker "
+            "processes through shared memory. If None, shared memory is not used."
+        ),
+    )
+    share_items: bool = pyd.Field(
+        False,
+        description=(
+            "If True, the arrays of shared items, eg, root items, are decoded by the "
+            "first worker process and mapped read-only by the others."
+        ),
+    )
+    staged: t.Optional[StagedWorkers] = pyd.Field(
+        None,
+        description=(
+            "Runs the source, the map stages and the final writer each on its own "
+            "workers, with bounded queues in between. `num_workers` is then ignored."
+        ),
+    )
 
     @classmethod
     def __get_validators__(cls):
@@ -128,11 +171,21 @@ class GrabberInterface(PydanticFieldWithDefaultMixin, pyd.BaseModel, extra="forb
                 raw_data = str(value).split(",")
                 try:
                     if raw_data[0]:
-                        data["num_workers"] = int(raw_data[0])
+                        data["num_workers"] = (
+                            "auto"
+                            if raw_data[0].lower() == "auto"
+                            else int(raw_data[0])
+                        )
                     if len(raw_data) > 1 and raw_data[1]:
-                        data["prefetch"] = int(raw_data[1])
+                        data["prefetch"] = (
+                            "auto"
+                            if raw_data[1].lower() == "auto"
+                            else int(raw_data[1])
+                        )
                     if len(raw_data) > 2 and raw_data[2]:
                         data["allow_nested_mp"] = raw_data[2].lower() == "true"
+                    if len(raw_data) > 3 and raw_data[3]:
+                        data["backend"] = raw_data[3]
                 except ValueError:
                     raise ValueError("Invalid grabber definition.")
             value = data
@@ -232,33 +285,144 @@ class GrabberInterface(PydanticFieldWithDefaultMixin, pyd.BaseModel, extra="forb
                 before starting the grabbing loop on each worker. If no process is
                 spawn, it will be run on the main process. Defaults to None.
         """
-        from pipelime.sequences import Grabber, grab_all
+        from pipelime.sequences import grab_all
+
+        with self._calibration_cm():
+            grab_all(
+                self._make_grabber(
+                    keep_order=keep_order,
+                    sequence=sequence,
+                    size=size,
+                    grab_context_manager=grab_context_manager,
+                    worker_init_fn=worker_init_fn,
+                ),
+                sequence,
+                track_fn=self._make_track_fn(sequence, parent_cmd, track_message, size),
+                sample_fn=sample_fn,
+                size=size,
+                grab_context_manager=grab_context_manager,
+                worker_init_fn=worker_init_fn,
+            )
+
+    def reduce(
+        self,
+        sequence,
+        init: t.Callable[[], t.Any],
+        accumulate: t.Callable[[t.Any, t.Any], t.Any],
+        merge: t.Callable[[t.Any, t.Any], t.Any],
+        *,
+        parent_cmd=None,
+        track_message: str = "",
+        size: t.Optional[int] = None,
+        grab_context_manager: t.Optional[t.ContextManager] = None,
+    ) -> t.Any:
+        """Reduces a sequence to a single value. Each worker task gets its own
+        accumulator, then the partial results are merged on the main process.
+
+        Args:
+            sequence: the sequence to reduce, usually a SamplesSequence.
+            init (t.Callable[[], t.Any]): a callable returning a new accumulator.
+            accumulate (t.Callable[[t.Any, Sample], t.Any]): a callable updating an
+                accumulator with a sample and returning it.
+            merge (t.Callable[[t.Any, t.Any], t.Any]): a callable merging two
+                accumulators and returning the result. It should be associative and
+                commutative, since the tasks may complete in any order.
+            parent_cmd (_type_, optional): the pipelime command running the grabber is
+                needed to correctly setup the progress bar. Defaults to None.
+            track_message (str, optional): a message shown next to the progress bar.
+                Defaults to "".
+            size (t.Optional[int], optional): the size of the sequence. If not given,
+                `len(sequence)` is evaluated. Defaults to None.
+            grab_context_manager (ContextManager, optional): a context manager wrapping
+                the whole operation on the main process. Also,
+                `grab_context_manager.__enter__` will be used as `worker_init_fn`.
+                Defaults to None.
+
+        Returns:
+            t.Any: the final accumulator.
+        """
+        from copy import deepcopy
+
+        from pipelime.sequences import grab_reduce
+
+        worker_init_fn = (
+            None
+            if grab_context_manager is None
+            else deepcopy(grab_context_manager).__enter__
+        )
+        with self._calibration_cm():
+            return grab_reduce(
+                self._make_grabber(
+                    keep_order=False,
+                    sequence=sequence,
+                    size=size,
+                    grab_context_manager=grab_context_manager,
+                    worker_init_fn=worker_init_fn,
+                ),
+                sequence,
+                init,
+                accumulate,
+                merge,
+                track_fn=self._make_track_fn(sequence, parent_cmd, track_message, size),
+                size=size,
+                grab_context_manager=grab_context_manager,
+                worker_init_fn=worker_init_fn,
+            )
+
+    def _calibration_cm(self) -> t.ContextManager:
+        import contextlib
+
+        from pipelime.sequences import reuse_worker_pools
+
+        # the workers spawned by the calibration are reused by the actual grabbing
+        return (
+            reuse_worker_pools()
+            if self.num_workers == "auto"
+            else contextlib.nullcontext()
+        )
+
+    def _make_grabber(
+        self,
+        keep_order: bool,
+        sequence=None,
+        size: t.Optional[int] = None,
+        grab_context_manager: t.Optional[t.ContextManager] = None,
+        worker_init_fn: t.Union[
+            t.Callable, t.Tuple[t.Callable, t.Sequence], None
+        ] = None,
+    ):
+        from pipelime.sequences import Grabber, calibrate_grabber
 
         grabber = Grabber(
-            num_workers=self.num_workers,
+            num_workers=0 if self.num_workers == "auto" else self.num_workers,
             prefetch=self.prefetch,
             keep_order=keep_order,
+            reorder_buffer=self.reorder_buffer,
             allow_nested_mp=self.allow_nested_mp,
+            backend=self.backend,
+            shm_threshold=self.shm_threshold,
+            share_items=self.share_items,
+            staged=self.staged,
         )
-        track_fn = (
-            None
-            if parent_cmd is None
-            else (
-                lambda x: parent_cmd.track(
-                    x,
-                    size=len(sequence) if size is None else size,
-                    message=track_message,
-                )
+        if self.num_workers == "auto" and sequence is not None:
+            grabber = calibrate_grabber(
+                grabber,
+                sequence,
+                size=size,
+                grab_context_manager=grab_context_manager,
+                worker_init_fn=worker_init_fn,
             )
-        )
-        grab_all(
-            grabber,
-            sequence,
-            track_fn=track_fn,
-            sample_fn=sample_fn,
-            size=size,
-            grab_context_manager=grab_context_manager,
-            worker_init_fn=worker_init_fn,
+        return grabber
+
+    def _make_track_fn(
+        self, sequence, parent_cmd, track_message: str, size: t.Optional[int]
+    ):
+        if parent_cmd is None:
+            return None
+        return lambda x: parent_cmd.track(
+            x,
+            size=len(sequence) if size is None else size,
+            message=track_message,
         )
 
 
@@ -410,7 +574,9 @@ class InputDatasetInterface(
 IDataset = InputDatasetInterface
 
 
-any_serialization_t = t.Literal["CREATE_NEW_FILE", "DEEP_COPY", "SYM_LINK", "HARD_LINK"]
+any_serialization_t = t.Literal[
+    "CREATE_NEW_FILE", "DEEP_COPY", "SYM_LINK", "HARD_LINK", "REFLINK"
+]
 any_item_t = t.Union[None, t.Literal["_"], ItemType]
 
 
@@ -549,6 +715,28 @@ class OutputDatasetInterface(
         alias="schema",
         description="Sample schema validation, verified before any other operation.",
     )
+    manifest: bool = pyd.Field(
+        False,
+        description=(
+            "Keep an index of the data files, so that readers do not have to scan "
+            "the data folder."
+        ),
+    )
+    write_behind: pyd.NonNegativeInt = pyd.Field(
+        0,
+        description=(
+            "If positive, the items are written in background by this number of "
+            "threads per process, overlapping disk writes with sample processing."
+        ),
+    )
+    resume: bool = pyd.Field(
+        False,
+        description=(
+            "Log the completed samples, so that, when an interrupted run is "
+            "resumed, the samples already written and not changed since are skipped "
+            "without processing them. Implies `exists_ok`."
+        ),
+    )
 
     @pyd.validator("folder")
     def resolve_folder(cls, v: t.Optional[Path]):
@@ -557,16 +745,18 @@ class OutputDatasetInterface(
             return v.resolve().absolute()
         return v
 
-    @pyd.validator("exists_ok", always=True)
+    @pyd.validator("resume", always=True)
     def _check_folder_exists(cls, v: bool, values: t.Mapping[str, t.Any]) -> bool:
         if (
             not v
+            and not values.get("exists_ok", True)
             and values.get("folder", None) is not None
             and values["folder"].exists()
         ):
             raise ValueError(
                 f"Trying to overwrite an existing dataset: `{values['folder']}`. "
-                "Please use `exists_ok=True` to overwrite."
+                "Please use `exists_ok=True` to overwrite or `resume=True` to "
+                "complete it."
             )
         return v
 
@@ -629,6 +819,9 @@ class OutputDatasetInterface(
                 zfill=self.zfill,
                 exists_ok=self.exists_ok,
                 key_serialization_mode=self.serialization.keys,
+                manifest=self.manifest,
+                write_behind=self.write_behind,
+                resume=self.resume,
             )
 
         return sequence
@@ -650,6 +843,9 @@ class OutputDatasetInterface(
                         "zfill": self.zfill,
                         "exists_ok": self.exists_ok,
                         "key_serialization_mode": self.serialization.keys,
+                        "manifest": self.manifest,
+                        "write_behind": self.write_behind,
+                        "resume": self.resume,
                     }
                 }
             )
@@ -221,6 +221,7 @@ class RunCommandBase(GraphPortForwardingCommand):
         from contextlib import ExitStack
 
         from pipelime.piper.executors.factory import NodesGraphExecutorFactory
+        from pipelime.sequences import reuse_worker_pools
 
         exit_stack = ExitStack()
 
@@ -263,6 +264,9 @@ class RunCommandBase(GraphPortForwardingCommand):
             exit_stack.callback(logger.enable, "pipelime")
             exit_stack.callback(PipelimeCommand._track_callback.stop_callbacks)
 
+        # nodes with the same grabber settings will share the same worker processes
+        exit_stack.enter_context(reuse_worker_pools())
+
         with exit_stack:
             executor = NodesGraphExecutorFactory.get_executor(
                 watch=False,
@@ -168,6 +168,8 @@ class SplitCommand(PipelimeCommand, title="split"):
     )
 
     def run(self):
+        from pipelime.sequences import reuse_worker_pools
+
         reader = self.input.create_reader()
         if self.shuffle:
             reader = reader.shuffle(
@@ -198,24 +200,25 @@ class SplitCommand(PipelimeCommand, title="split"):
             split_sizes[none_idx] = input_length - split_total
 
         split_start = 0
-        for idx, split_length, split in zip(
-            range(len(split_sizes)), split_sizes, splits
-        ):
-            split_stop = split_start + split_length  # type: ignore
-            if split.output is not None:  # pragma: no branch
-                seq = reader[split_start:split_stop]
-                seq = split.output.append_writer(seq)
-                self.grabber.grab_all(
-                    seq,
-                    grab_context_manager=split.output.serialization_cm(),
-                    keep_order=False,
-                    parent_cmd=self,
-                    track_message=(
-                        f"Writing split {idx + 1}/{len(split_sizes)} "
-                        f"({split_length} samples)"
-                    ),
-                )
-            split_start = split_stop
+        with reuse_worker_pools():
+            for idx, split_length, split in zip(
+                range(len(split_sizes)), split_sizes, splits
+            ):
+                split_stop = split_start + split_length  # type: ignore
+                if split.output is not None:  # pragma: no branch
+                    seq = reader[split_start:split_stop]
+                    seq = split.output.append_writer(seq)
+                    self.grabber.grab_all(
+                        seq,
+                        grab_context_manager=split.output.serialization_cm(),
+                        keep_order=False,
+                        parent_cmd=self,
+                        track_message=(
+                            f"Writing split {idx + 1}/{len(split_sizes)} "
+                            f"({split_length} samples)"
+                        ),
+                    )
+                split_start = split_stop
 
 
 class _MatchHelper:
@@ -339,7 +342,7 @@ class SplitByValueCommand(PipelimeCommand, title="split-value"):
     def run(self):
         import uuid
 
-        from pipelime.sequences import Sample
+        from pipelime.sequences import Sample, reuse_worker_pools
 
         class WorkerHelper:
             def __init__(self, idx_key, value_key):
@@ -384,31 +387,33 @@ class SplitByValueCommand(PipelimeCommand, title="split-value"):
 
         reader = self.input.create_reader()
 
-        unique_idx_key = uuid.uuid1().hex
-        worker = WorkerHelper(unique_idx_key, self.key)
-        self.grabber.grab_all(
-            reader.enumerate(idx_key=unique_idx_key),
-            keep_order=True,
-            parent_cmd=self,
-            track_message="Gathering unique values",
-            sample_fn=worker,
-        )
-
-        for idx, (group_val, group_idxs) in enumerate(worker._groups.items()):
-            split_name = f"{self.key}={group_val}"
-            split_output = self.output.copy(
-                update={"folder": self.output.folder / split_name}
-            )
-
-            split_name = f"{split_name} " if len(split_name) < 20 else ""
-            split_seq = split_output.append_writer(reader.select(group_idxs))
+        # the same workers are used to gather the values and to write the splits
+        with reuse_worker_pools():
+            unique_idx_key = uuid.uuid1().hex
+            worker = WorkerHelper(unique_idx_key, self.key)
             self.grabber.grab_all(
-                split_seq,
-                grab_context_manager=split_output.serialization_cm(),
-                keep_order=False,
+                reader.enumerate(idx_key=unique_idx_key),
+                keep_order=True,
                 parent_cmd=self,
-                track_message=(
-                    f"Writing split {idx + 1}/{len(worker._groups)} "
-                    f"{split_name}({len(split_seq)} samples)"
-                ),
+                track_message="Gathering unique values",
+                sample_fn=worker,
             )
+
+            for idx, (group_val, group_idxs) in enumerate(worker._groups.items()):
+                split_name = f"{self.key}={group_val}"
+                split_output = self.output.copy(
+                    update={"folder": self.output.folder / split_name}
+                )
+
+                split_name = f"{split_name} " if len(split_name) < 20 else ""
+                split_seq = split_output.append_writer(reader.select(group_idxs))
+                self.grabber.grab_all(
+                    split_seq,
+                    grab_context_manager=split_output.serialization_cm(),
+                    keep_order=False,
+                    parent_cmd=self,
+                    track_message=(
+                        f"Writing split {idx + 1}/{len(worker._groups)} "
+                        f"{split_name}({len(split_seq)} samples)"
+                    ),
+                )
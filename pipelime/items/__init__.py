@@ -10,6 +10,12 @@ from pipelime.items.base import (
     enable_item_data_cache,
     no_data_cache,
     data_cache,
+    disable_item_mmap,
+    enable_item_mmap,
+    mmap_data,
+    ItemDataCache,
+    ItemDataCacheStats,
+    SharedItemCache,
 )
 
 # import and register all items
@@ -23,6 +29,7 @@ from pipelime.items.numpy_item import (
 )
 from pipelime.items.image_item import (
     ImageItem,
+    ImageProbe,
     BmpImageItem,
     PngImageItem,
     JpegImageItem,
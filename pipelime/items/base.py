@@ -22,14 +22,65 @@ from loguru import logger
 #   -> any_serialization
 class SerializationMode(IntEnum):
     """Standard resolution is HARD LINK -> FILE COPY -> NEW FILE
-    or SYM LINK -> FILE COPY -> NEW FILE. You can alter this behaviour
-    by setting default and disabled serialization modes.
+    or SYM LINK -> FILE COPY -> NEW FILE. When REFLINK is set, a copy-on-write clone
+    is tried before the hard link, ie, REFLINK -> HARD LINK -> FILE COPY -> NEW FILE.
+    You can alter this behaviour by setting default and disabled serialization modes.
+
+    NB: when an item class and its bases have different modes, the lowest one wins,
+    but REFLINK ranks between DEEP_COPY and SYM_LINK, since a clone is an independent
+    file just like a copy.
     """
 
     CREATE_NEW_FILE = 0
     DEEP_COPY = 1
     SYM_LINK = 2
     HARD_LINK = 3
+    REFLINK = 4
+
+
+# the FICLONE ioctl request, ie, _IOW(0x94, 9, int)
+_FICLONE = 0x40049409
+
+
+def _reflink_file(src: str, dst: str):
+    """Clones `src` to `dst` sharing the data blocks on copy-on-write file systems,
+    such as btrfs or xfs. Raises an exception if the file system does not support it.
+    """
+    import fcntl
+
+    with open(src, "rb") as fsrc, open(dst, "xb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        except BaseException:
+            fdst.close()
+            os.unlink(dst)
+            raise
+    shutil.copymode(src, dst)
+
+
+def _copy_file(src: str, dst: str):
+    """Copies `src` to `dst` in kernel space through `os.copy_file_range`, which also
+    clones the data blocks when supported. Falls back to `shutil.copy`, which in turn
+    uses `sendfile` on Linux.
+    """
+    copy_file_range = getattr(os, "copy_file_range", None)
+    if copy_file_range is not None:
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                size, copied = os.fstat(fsrc.fileno()).st_size, 0
+                while True:
+                    n = copy_file_range(fsrc.fileno(), fdst.fileno(), 1 << 30)
+                    if n <= 0:
+                        break
+                    copied += n
+            # some file systems, eg, procfs or some network mounts, report no data
+            if copied == size:
+                shutil.copymode(src, dst)
+                return
+        except OSError:
+            # eg, cross-device copies on older kernels or unsupported file systems
+            pass
+    shutil.copy(src, dst)
 
 
 class deferred_classattr:
@@ -61,6 +112,7 @@ class ItemFactory(ABCMeta):
 
     ITEM_CLASSES: t.Dict[str, t.Type[Item]] = {}
     ITEM_DATA_CACHE_MODE: t.Dict[t.Type[Item], t.Optional[bool]] = {}
+    ITEM_MMAP_MODE: t.Dict[t.Type[Item], t.Optional[bool]] = {}
     ITEM_SERIALIZATION_MODE: t.Dict[t.Type[Item], SerializationMode] = {}
     ITEM_DISABLED_SERIALIZATION_MODES: t.Dict[
         t.Type[Item], t.Set[SerializationMode]
@@ -73,6 +125,7 @@ class ItemFactory(ABCMeta):
                 raise ValueError(f"File extension `{ext}` is already registered")
             cls.ITEM_CLASSES[ext] = cls  # type: ignore
         cls.ITEM_DATA_CACHE_MODE[cls] = None  # type: ignore
+        cls.ITEM_MMAP_MODE[cls] = None  # type: ignore
         cls.ITEM_SERIALIZATION_MODE[cls] = SerializationMode.HARD_LINK  # type: ignore
         cls.ITEM_DISABLED_SERIALIZATION_MODES[cls] = set()  # type: ignore
 
@@ -99,6 +152,25 @@ class ItemFactory(ABCMeta):
         item_cls = cls.ITEM_CLASSES.get(ext, UnknownItem)
         return item_cls(*path_or_urls, shared=shared_item)
 
+    @classmethod
+    def get_trusted_instance(cls, filepath: str, shared_item: bool = False) -> Item:
+        """Same as `get_instance`, but the path is trusted to be absolute and normalized,
+        eg, when joining a resolved folder and the names returned by `os.scandir`,
+        so that it is not checked and only symbolic links are resolved.
+
+        Args:
+          filepath: str: the absolute path to the file.
+          shared_item: bool: whether the new Item should be shared
+            (Default value = False)
+
+        Returns:
+            Item: an Item instance wrapping the given file.
+        """
+        item_cls = cls.ITEM_CLASSES.get(os.path.splitext(filepath)[1], UnknownItem)
+        if os.path.islink(filepath):
+            filepath = os.path.realpath(filepath)
+        return item_cls.from_trusted_path(Path(filepath), shared=shared_item)
+
     @classmethod
     def set_data_cache_mode(
         cls, item_cls: t.Type[Item], enable_data_cache: t.Optional[bool]
@@ -114,17 +186,36 @@ class ItemFactory(ABCMeta):
                     return value
         return False
 
+    @classmethod
+    def set_mmap_mode(cls, item_cls: t.Type[Item], enable_mmap: t.Optional[bool]):
+        cls.ITEM_MMAP_MODE[item_cls] = enable_mmap
+
+    @classmethod
+    def is_mmap_enabled(cls, item_cls: t.Type[Item]) -> bool:
+        for base_cls in item_cls.mro():
+            if issubclass(base_cls, Item):
+                value = cls.ITEM_MMAP_MODE.get(base_cls, None)
+                if value is not None:
+                    return value
+        return False
+
     @classmethod
     def set_serialization_mode(cls, item_cls: t.Type[Item], mode: SerializationMode):
         cls.ITEM_SERIALIZATION_MODE[item_cls] = mode
 
     @classmethod
     def get_serialization_mode(cls, item_cls: t.Type[Item]) -> SerializationMode:
+        def _rank(mode: SerializationMode) -> float:
+            # a clone is an independent file, so it ranks right after a copy
+            if mode is SerializationMode.REFLINK:
+                return SerializationMode.DEEP_COPY + 0.5
+            return mode
+
         smode = cls.ITEM_SERIALIZATION_MODE[item_cls]
         for base_cls in item_cls.mro():
             if issubclass(base_cls, Item):
                 other_smode = cls.ITEM_SERIALIZATION_MODE[base_cls]
-                if other_smode < smode:
+                if _rank(other_smode) < _rank(smode):
                     smode = other_smode
         return smode
 
@@ -181,6 +272,22 @@ def enable_item_data_cache(*item_cls: t.Type[Item]):
         ItemFactory.set_data_cache_mode(itc, True)
 
 
+def disable_item_mmap(*item_cls: t.Type[Item]):
+    """Disables memory-mapped decoding on selected item classes.
+    Applies to all items if no item class is given.
+    """
+    for itc in item_cls if item_cls else ItemFactory.ITEM_MMAP_MODE.keys():
+        ItemFactory.set_mmap_mode(itc, False)
+
+
+def enable_item_mmap(*item_cls: t.Type[Item]):
+    """Enables memory-mapped decoding on selected item classes.
+    Applies to all items if no item class is given.
+    """
+    for itc in item_cls if item_cls else ItemFactory.ITEM_MMAP_MODE.keys():
+        ItemFactory.set_mmap_mode(itc, True)
+
+
 class item_serialization_mode(ContextDecorator):
     """Use this class as context manager or function decorator to temporarily change
     the items' serialization mode.
@@ -309,6 +416,7 @@ class no_data_cache(ContextDecorator):
 class data_cache(ContextDecorator):
     """Use this class as context manager or function decorator to enable data caching
     on some or all item types. Useful when nested with ``no_data_cache``.
+    Optionally, `max_bytes` temporarily sets the byte budget of the ``ItemDataCache``.
 
     Examples:
        # disable data cache for all items, then re-enable it
@@ -316,20 +424,270 @@ class data_cache(ContextDecorator):
            with data_cache(...):
                ...
            ...
+
+       # cache at most 1GB of decoded images
+       with data_cache(ImageItem, max_bytes=2**30):
+           ...
     """
 
-    def __init__(self, *item_cls: t.Type[Item]):
+    def __init__(self, *item_cls: t.Type[Item], max_bytes: t.Optional[int] = None):
         self._items = item_cls if item_cls else ItemFactory.ITEM_DATA_CACHE_MODE.keys()
+        self._max_bytes = max_bytes
 
     def __enter__(self):
         self._prev_state = {
             itc: ItemFactory.ITEM_DATA_CACHE_MODE[itc] for itc in self._items
         }
+        self._prev_max_bytes = ItemDataCache.max_bytes
         enable_item_data_cache(*self._items)
+        if self._max_bytes is not None:
+            ItemDataCache.set_budget(self._max_bytes)
 
     def __exit__(self, exc_type, exc_value, traceback):
         for itc, val in self._prev_state.items():
             ItemFactory.set_data_cache_mode(itc, val)
+        if self._max_bytes is not None:
+            ItemDataCache.set_budget(self._prev_max_bytes)
+
+
+class mmap_data(ContextDecorator):
+    """Use this class as context manager or function decorator to decode files as
+    read-only memory-mapped data on some or all item types. Items not supporting
+    memory mapping, ie, other than ``NpyNumpyItem``, are decoded as usual.
+
+    Examples:
+       # any npy file is mapped in memory and paged lazily
+       with mmap_data(NpyNumpyItem):
+           ...
+    """
+
+    def __init__(self, *item_cls: t.Type[Item]):
+        self._items = item_cls if item_cls else ItemFactory.ITEM_MMAP_MODE.keys()
+
+    def __enter__(self):
+        self._prev_state = {itc: ItemFactory.ITEM_MMAP_MODE[itc] for itc in self._items}
+        enable_item_mmap(*self._items)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for itc, val in self._prev_state.items():
+            ItemFactory.set_mmap_mode(itc, val)
+
+
+class ItemDataCacheStats(t.NamedTuple):
+    """The counters of the ``ItemDataCache``."""
+
+    hits: int
+    misses: int
+    evictions: int
+    count: int
+    nbytes: int
+    max_bytes: t.Optional[int]
+
+
+class ItemDataCache:
+    """The process-wide registry of the data decoded from files and cached by the items.
+    When a byte budget is set, the least recently used data is dropped as soon as the
+    total size exceeds the budget, so that it is decoded again on the next access.
+    The size of numpy arrays and buffers is their `nbytes`, otherwise it is estimated.
+    NB: data set by the user is never dropped nor counted. Also, each process has its
+    own cache and counters.
+
+    Examples:
+       # bound the data cache to 512MB and print the counters
+       ItemDataCache.set_budget(512 * 2**20)
+       ...
+       print(ItemDataCache.stats())
+    """
+
+    max_bytes: t.ClassVar[t.Optional[int]] = None
+
+    _entries: t.ClassVar[t.Dict[int, t.Tuple[t.Any, int]]] = {}
+    _nbytes: t.ClassVar[int] = 0
+    _hits: t.ClassVar[int] = 0
+    _misses: t.ClassVar[int] = 0
+    _evictions: t.ClassVar[int] = 0
+    # NB: reentrant, since weakref callbacks may run while the lock is held
+    _lock: t.ClassVar[t.Any] = None
+
+    @classmethod
+    def _get_lock(cls):
+        if cls._lock is None:
+            import threading
+
+            cls._lock = threading.RLock()
+        return cls._lock
+
+    @classmethod
+    def set_budget(cls, max_bytes: t.Optional[int]):
+        """Sets the byte budget of the cache, ie, `None` for no limit."""
+        with cls._get_lock():
+            cls.max_bytes = None if max_bytes is None else max(int(max_bytes), 0)
+            cls._trim()
+
+    @classmethod
+    def stats(cls) -> ItemDataCacheStats:
+        return ItemDataCacheStats(
+            hits=cls._hits,
+            misses=cls._misses,
+            evictions=cls._evictions,
+            count=len(cls._entries),
+            nbytes=cls._nbytes,
+            max_bytes=cls.max_bytes,
+        )
+
+    @classmethod
+    def reset_stats(cls):
+        with cls._get_lock():
+            cls._hits, cls._misses, cls._evictions = 0, 0, 0
+
+    @classmethod
+    def clear(cls):
+        """Drops all the cached data."""
+        with cls._get_lock():
+            while cls._entries:
+                cls._evict_oldest()
+
+    @staticmethod
+    def estimate_nbytes(value: t.Any, _depth: int = 0) -> int:
+        import sys
+
+        nbytes = getattr(value, "nbytes", None)
+        if isinstance(nbytes, int):
+            return nbytes
+        if isinstance(value, (bytes, bytearray, str)):
+            return len(value)
+        if _depth < 8:
+            if isinstance(value, t.Mapping):
+                return sum(
+                    ItemDataCache.estimate_nbytes(k, _depth + 1)
+                    + ItemDataCache.estimate_nbytes(v, _depth + 1)
+                    for k, v in value.items()
+                )
+            if isinstance(value, (list, tuple, set, frozenset)):
+                return sum(ItemDataCache.estimate_nbytes(v, _depth + 1) for v in value)
+        return sys.getsizeof(value)
+
+    @classmethod
+    def _store(cls, item: Item, value: t.Any):
+        import weakref
+
+        key = id(item)
+        nbytes = cls.estimate_nbytes(value)
+        with cls._get_lock():
+            cls._misses += 1
+            cls._drop(key)
+            cls._entries[key] = (weakref.ref(item, lambda _: cls._drop(key)), nbytes)
+            cls._nbytes += nbytes
+            cls._trim()
+
+    @classmethod
+    def _hit(cls, item: Item):
+        key = id(item)
+        if key in cls._entries:
+            with cls._get_lock():
+                entry = cls._entries.pop(key, None)
+                if entry is not None:
+                    # move to the end, ie, most recently used
+                    cls._entries[key] = entry
+                    cls._hits += 1
+
+    @classmethod
+    def _drop(cls, key: int):
+        with cls._get_lock():
+            entry = cls._entries.pop(key, None)
+            if entry is not None:
+                cls._nbytes -= entry[1]
+
+    @classmethod
+    def _evict_oldest(cls):
+        key = next(iter(cls._entries))
+        item = cls._entries[key][0]()
+        cls._drop(key)
+        if item is not None:
+            item._data_cache = None
+        cls._evictions += 1
+
+    @classmethod
+    def _trim(cls):
+        if cls.max_bytes is not None:
+            while cls._entries and cls._nbytes > cls.max_bytes:
+                cls._evict_oldest()
+
+
+class SharedItemCache:
+    """A cross-process and read-only cache of the numpy arrays decoded by shared items,
+    eg, the root items of an Underfolder dataset. When a folder is set, the first
+    process decoding a shared item publishes its data there as a `.npy` file, which
+    the other processes map in memory, so that the data is decoded and stored just
+    once. The Grabber sets the folder on its worker processes, creating it in
+    `/dev/shm`, if available, so that the files never reach the disk.
+    NB: the mapped arrays are read-only.
+    """
+
+    folder: t.ClassVar[t.Optional[Path]] = None
+
+    @staticmethod
+    def make_folder() -> Path:
+        import tempfile
+
+        base = Path("/dev/shm")
+        if not base.is_dir() or not os.access(base, os.W_OK):
+            from pipelime.choixe.utils.io import PipelimeTmp
+
+            base = PipelimeTmp.make_session_dir()
+        return Path(tempfile.mkdtemp(prefix="pipelime-shared-items-", dir=base))
+
+    @classmethod
+    def load(cls, item: Item, path: Path) -> t.Any:
+        """Maps the data of the item stored in `path`, decoding and publishing it
+        if not available yet. Data other than numpy arrays is just decoded.
+        """
+        import hashlib
+        import tempfile
+
+        import numpy as np
+
+        stat = os.stat(path)
+        key = (
+            f"{item.__class__.__module__}.{item.__class__.__qualname__}:"
+            f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+        )
+        target = cls.folder / (  # type: ignore
+            hashlib.sha1(key.encode("utf-8")).hexdigest() + ".npy"
+        )
+        try:
+            return np.asarray(np.load(target, mmap_mode="r"))
+        except FileNotFoundError:
+            pass
+
+        with open(path, "rb") as fp:
+            value = item.decode(fp)
+        if (
+            not isinstance(value, np.ndarray)
+            or value.dtype.hasobject
+            or value.size == 0
+        ):
+            return value
+
+        # the file is renamed when complete, so that readers never see partial data
+        tmp_path = None
+        try:
+            fd, tmp_name = tempfile.mkstemp(
+                suffix=".tmp", prefix=f"{target.name}.", dir=target.parent
+            )
+            tmp_path = Path(tmp_name)
+            with open(fd, "wb") as fp:
+                np.save(fp, value, allow_pickle=False)
+            os.replace(tmp_path, target)
+            return np.asarray(np.load(target, mmap_mode="r"))
+        except OSError as exc:
+            logger.debug(f"{cls.__name__}: cannot publish `{path}` ({exc})")
+            try:
+                if tmp_path is not None:
+                    tmp_path.unlink(missing_ok=True)
+            except OSError:  # pragma: no cover
+                pass
+            return value
 
 
 @contextmanager
@@ -462,6 +820,18 @@ class Item(t.Generic[T], metaclass=ItemFactory):
     ) -> DerivedItemTp:
         return cls.default_concrete(*sources, shared=shared)
 
+    @classmethod
+    def from_trusted_path(
+        cls: t.Type[DerivedItemTp], path: Path, shared: bool = False
+    ) -> DerivedItemTp:
+        """Creates a new item from an absolute and normalized file path, skipping the
+        extension check and the path resolution. Meant for readers that scan a folder
+        and select the item class from the file extension.
+        """
+        item = cls(shared=shared)
+        item._file_sources.append(path)
+        return item
+
     def default_extension(self) -> t.Optional[str]:
         ext = self.file_extensions()[0]
         if ext is None and self._file_sources:
@@ -524,6 +894,16 @@ class Item(t.Generic[T], metaclass=ItemFactory):
             return None
         path.unlink(missing_ok=True)
 
+        if smode is SerializationMode.REFLINK:
+            smode = (
+                None
+                if (
+                    self.is_mode_enabled(SerializationMode.REFLINK)
+                    and _try_copy(_reflink_file, str(path))
+                )
+                else SerializationMode.HARD_LINK
+            )
+
         if smode is SerializationMode.HARD_LINK:
             smode = (
                 None
@@ -546,7 +926,7 @@ class Item(t.Generic[T], metaclass=ItemFactory):
             smode = (
                 None
                 if self.is_mode_enabled(SerializationMode.DEEP_COPY)
-                and _try_copy(shutil.copy, str(path))
+                and _try_copy(_copy_file, str(path))
                 else SerializationMode.CREATE_NEW_FILE
             )
 
@@ -577,13 +957,52 @@ class Item(t.Generic[T], metaclass=ItemFactory):
                 trg = Path(trg).absolute().resolve()
                 data_source = self._serialize_to_local_file(trg)
             if data_source is not None:
-                self._add_data_source(data_source)
-                if (
-                    self.cache_data is None
-                    and Item.is_cache_enabled(self.__class__) is False
-                    or self.cache_data is False
-                ):
-                    self._data_cache = None
+                self._set_serialized(data_source)
+
+    def serialize_atomic(self, target: Path) -> t.Optional[Path]:
+        """Serializes the item to a temporary file with a unique random name in the
+        `.pipelime` subfolder of the parent of `target`, ie, on the same filesystem,
+        then renames it to the final name. Therefore, concurrent writers never see a
+        partial file and the last rename wins. Any file left behind by a crash is out
+        of the way of the readers.
+
+        Returns:
+          t.Optional[Path]: the final path or None if the item cannot be serialized.
+        """
+        import tempfile
+
+        target = Path(target).absolute().resolve()
+        if target.suffix not in self.file_extensions():
+            target = self.as_default_name(target)
+
+        tmp_folder = target.parent / ".pipelime"
+        tmp_folder.mkdir(parents=True, exist_ok=True)
+        # NB: the file is created just to reserve its name, then it is replaced
+        fd, tmp_name = tempfile.mkstemp(
+            suffix=f".tmp{target.suffix}", prefix=f"{target.stem}.", dir=tmp_folder
+        )
+        os.close(fd)
+        tmp_path = Path(tmp_name)
+        try:
+            data_source = self._serialize_to_local_file(tmp_path)
+            if data_source is None:
+                return None
+            os.replace(data_source, target)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+        self._set_serialized(target)
+        return target
+
+    def _set_serialized(self, path: Path):
+        self._add_data_source(path)
+        if (
+            self.cache_data is None
+            and Item.is_cache_enabled(self.__class__) is False
+            or self.cache_data is False
+        ):
+            ItemDataCache._drop(id(self))
+            self._data_cache = None
 
     def remove_data_source(
         self: DerivedItemTp, *sources: _item_data_source
@@ -629,10 +1048,15 @@ class Item(t.Generic[T], metaclass=ItemFactory):
         return self.make_new(*new_sources, shared=self.is_shared)
 
     def __call__(self) -> t.Optional[T]:
-        if self._data_cache is not None:
-            return self._data_cache
+        # NB: the data may be evicted by another thread at any time
+        data = self._data_cache
+        if data is not None:
+            ItemDataCache._hit(self)
+            return data
         for fsrc in self._file_sources:
             try:
+                if self._shared and SharedItemCache.folder is not None:
+                    return self._store_data(SharedItemCache.load(self, fsrc))
                 with open(fsrc, "rb") as fp:
                     return self._decode_and_store(fp)
             except Exception as exc:
@@ -642,13 +1066,16 @@ class Item(t.Generic[T], metaclass=ItemFactory):
         return None
 
     def _decode_and_store(self, fp: t.BinaryIO) -> T:
-        v = self.decode(fp)
+        return self._store_data(self.decode(fp))
+
+    def _store_data(self, v: T) -> T:
         if (
             self.cache_data is None
             and Item.is_cache_enabled(self.__class__)
             or self.cache_data
         ):
             self._data_cache = v
+            ItemDataCache._store(self, v)
         return v
 
     @classmethod
@@ -3,19 +3,120 @@ import tifffile
 import numpy as np
 import typing as t
 
+from loguru import logger
+
 from pipelime.items.numpy_item import NumpyItem
 from pipelime.items.base import deferred_classattr
 
 
+class ImageProbe(t.NamedTuple):
+    """The image properties read from the file header."""
+
+    shape: t.Tuple[int, ...]
+    dtype: np.dtype
+    format: str
+
+    @property
+    def height(self) -> int:
+        return self.shape[0]
+
+    @property
+    def width(self) -> int:
+        return self.shape[1]
+
+    @property
+    def channels(self) -> int:
+        return self.shape[2] if len(self.shape) > 2 else 1
+
+    def as_dict(self) -> t.Dict[str, t.Any]:
+        """Returns the properties as a plain mapping, eg, to be used in a query."""
+        return {
+            "shape": list(self.shape),
+            "dtype": str(self.dtype),
+            "format": self.format,
+            "height": self.height,
+            "width": self.width,
+            "channels": self.channels,
+        }
+
+
 class ImageItem(NumpyItem):
     """Base class for all image types. Subclasses should implement `file_extensions`
     and, optionally, `save_options`.
     """
 
+    _probe_cache: t.Optional[ImageProbe] = None
+
     @deferred_classattr
     def default_concrete(cls):
         return PngImageItem
 
+    @classmethod
+    def image_format(cls) -> str:
+        """The name of the image format, ie, the default extension without the dot."""
+        return cls.file_extensions()[0].lstrip(".")
+
+    @classmethod
+    def decode_probe(cls, fp: t.BinaryIO) -> t.Optional[ImageProbe]:
+        """Reads the image properties from the file header, without decoding the
+        pixels. Subclasses may override this method to support specific formats.
+
+        Args:
+          fp (t.BinaryIO): the binary stream to read.
+
+        Returns:
+          t.Optional[ImageProbe]: the image properties or None if not available.
+        """
+        props = iio.improps(fp, extension=cls.file_extensions()[0])
+        return ImageProbe(tuple(props.shape), np.dtype(props.dtype), cls.image_format())
+
+    def probe(self) -> t.Optional[ImageProbe]:
+        """Returns the shape, dtype and format of the image. If the data has not been
+        loaded yet, just the file header is read. The result is cached on the item.
+        """
+        if self._probe_cache is None:
+            probe = None
+            data = self._data_cache
+            if data is None:
+                probe = self._read_partial(self.decode_probe)
+                if probe is None:
+                    data = self()
+            if data is not None:
+                probe = ImageProbe(data.shape, data.dtype, self.image_format())
+            self._probe_cache = probe
+        return self._probe_cache
+
+    @classmethod
+    def decode_reduced(
+        cls, fp: t.BinaryIO, min_height: int, min_width: int
+    ) -> t.Optional[np.ndarray]:
+        """Decodes the image at a reduced resolution, which must be at least
+        `min_height` x `min_width`. Subclasses supporting reduced decoding, eg, through
+        DCT scaling, should override this method.
+
+        Args:
+          fp (t.BinaryIO): the binary stream to read.
+          min_height (int): the minimum height of the decoded image.
+          min_width (int): the minimum width of the decoded image.
+
+        Returns:
+          t.Optional[np.ndarray]: the reduced image or None if the format does not
+            support it or the image cannot be reduced.
+        """
+        return None
+
+    def read_reduced(self, min_height: int, min_width: int) -> t.Optional[np.ndarray]:
+        """Decodes the image at the smallest resolution supported by the format which
+        is at least `min_height` x `min_width`. The result is not cached on the item.
+        If the data has already been loaded, the format does not support reduced
+        decoding or the image is already small enough, None is returned.
+        """
+        if self._data_cache is not None:
+            return None
+        return self._read_partial(
+            lambda fp: self.decode_reduced(fp, max(1, min_height), max(1, min_width))
+        )
+
     @classmethod
     def save_options(cls) -> t.Mapping[str, t.Any]:
         """Subclass can override and return specific saving options.
@@ -94,6 +195,20 @@ class JpegImageItem(ImageItem):
     def file_extensions(cls) -> t.Sequence[str]:
         return (".jpeg", ".jpg", ".jfif", ".jpe")
 
+    @classmethod
+    def decode_reduced(
+        cls, fp: t.BinaryIO, min_height: int, min_width: int
+    ) -> t.Optional[np.ndarray]:
+        """Lets libjpeg decode at 1/2, 1/4 or 1/8 scale through DCT scaling."""
+        from PIL import Image
+
+        with Image.open(fp) as img:
+            full_size = img.size
+            img.draft(img.mode, (min_width, min_height))
+            if img.size == full_size:
+                return None
+            return np.array(img)
+
 
 class TiffImageItem(ImageItem):
     @classmethod
@@ -111,3 +226,84 @@ class TiffImageItem(ImageItem):
     @classmethod
     def encode(cls, value: np.ndarray, fp: t.BinaryIO):
         tifffile.imwrite(fp, value, **cls.save_options())
+
+    @classmethod
+    def decode_shape(cls, fp: t.BinaryIO) -> t.Optional[t.Tuple[int, ...]]:
+        with tifffile.TiffFile(fp) as tif:
+            return tuple(tif.series[0].shape)
+
+    @classmethod
+    def decode_probe(cls, fp: t.BinaryIO) -> t.Optional[ImageProbe]:
+        with tifffile.TiffFile(fp) as tif:
+            series = tif.series[0]
+            return ImageProbe(tuple(series.shape), series.dtype, cls.image_format())
+
+    @classmethod
+    def decode_region(
+        cls, fp: t.BinaryIO, y0: int, y1: int, x0: int, x1: int
+    ) -> t.Optional[np.ndarray]:
+        """Decodes just the tiles or strips of the first page overlapping the window.
+        Multi-page, volumetric and planar images are not supported.
+        NB: only the public api of `tifffile` is used, ie, `TiffPage.decode` and
+        `FileHandle.read_segments`. If it changes, a warning is logged and the whole
+        image is decoded.
+        """
+        try:
+            return cls._decode_tiff_region(fp, y0, y1, x0, x1)
+        except (AttributeError, TypeError) as exc:
+            logger.warning(
+                f"{cls}: region reads are not supported by tifffile "
+                f"{tifffile.__version__} (`{exc}`), decoding the whole image."
+            )
+            return None
+
+    @classmethod
+    def _decode_tiff_region(
+        cls, fp: t.BinaryIO, y0: int, y1: int, x0: int, x1: int
+    ) -> t.Optional[np.ndarray]:
+        with tifffile.TiffFile(fp) as tif:
+            page = tif.pages[0]
+            if (
+                len(tif.series[0].pages) != 1
+                or page.shaped[:2] != (1, 1)
+                or tuple(tif.series[0].shape) != page.shape
+            ):
+                return None
+
+            height, width, samples = page.shaped[2:]
+            if page.is_tiled:
+                seg_h, seg_w = page.tilelength, page.tilewidth
+            else:
+                seg_h, seg_w = min(page.rowsperstrip or height, height), width
+            cols = -(-width // seg_w)
+            indices = [
+                r * cols + c
+                for r in range(y0 // seg_h, -(-y1 // seg_h))
+                for c in range(x0 // seg_w, -(-x1 // seg_w))
+            ]
+
+            decode_args: t.Dict[str, t.Any] = {}
+            if page.compression in {6, 7, 34892, 33007}:  # JPEG
+                decode_args["jpegtables"] = page.jpegtables
+                decode_args["jpegheader"] = page.jpegheader
+
+            # empty segments are left to zero, as tifffile does
+            region = np.zeros((y1 - y0, x1 - x0, samples), dtype=page.dtype)
+            for data, pos in tif.filehandle.read_segments(
+                [page.dataoffsets[i] for i in indices],
+                [page.databytecounts[i] for i in indices],
+            ):
+                # each segment is decoded as (depth, height, width, samples)
+                segment, (_, _, sy, sx, _), _ = page.decode(
+                    data, indices[pos], **decode_args
+                )
+                if segment is None:
+                    continue
+                segment = segment[0]
+                ry0, ry1 = max(y0, sy), min(y1, sy + segment.shape[0])
+                rx0, rx1 = max(x0, sx), min(x1, sx + segment.shape[1])
+                if ry0 < ry1 and rx0 < rx1:
+                    region[ry0 - y0 : ry1 - y0, rx0 - x0 : rx1 - x0] = segment[
+                        ry0 - sy : ry1 - sy, rx0 - sx : rx1 - sx
+                    ]
+            return region if len(page.shape) == 3 else region[..., 0]
@@ -1,7 +1,10 @@
+import io
 import numpy as np
 import warnings
 import typing as t
 
+from loguru import logger
+
 from pipelime.items import Item
 from pipelime.items.base import deferred_classattr
 
@@ -17,20 +20,152 @@ class NumpyItem(Item[np.ndarray]):
     def validate(cls, raw_data: t.Any) -> np.ndarray:
         return np.array(raw_data)
 
+    @classmethod
+    def decode_shape(cls, fp: t.BinaryIO) -> t.Optional[t.Tuple[int, ...]]:
+        """Reads the shape of the array from the file header, without decoding the
+        data. Subclasses supporting partial reads should override this method.
+
+        Args:
+          fp (t.BinaryIO): the binary stream to read.
+
+        Returns:
+          t.Optional[t.Tuple[int, ...]]: the shape or None if not available.
+        """
+        return None
+
+    @classmethod
+    def decode_region(
+        cls, fp: t.BinaryIO, y0: int, y1: int, x0: int, x1: int
+    ) -> t.Optional[np.ndarray]:
+        """Decodes just the window `[y0:y1, x0:x1]` of the array, where the bounds are
+        non-negative and already clipped to the array shape. Subclasses supporting
+        partial reads should override this method.
+
+        Args:
+          fp (t.BinaryIO): the binary stream to read.
+          y0 (int): the first row.
+          y1 (int): the row after the last one.
+          x0 (int): the first column.
+          x1 (int): the column after the last one.
+
+        Returns:
+          t.Optional[np.ndarray]: the window or None if the file does not support it.
+        """
+        return None
+
+    def read_shape(self) -> t.Optional[t.Tuple[int, ...]]:
+        """Returns the shape of the array, reading just the file header if the data
+        has not been loaded yet. If the header cannot be read, None is returned.
+        """
+        data = self._data_cache
+        if data is not None:
+            return data.shape
+        return self._read_partial(self.decode_shape)
+
+    def read_region(self, y0: int, y1: int, x0: int, x1: int) -> t.Optional[np.ndarray]:
+        """Returns the window `[y0:y1, x0:x1]` of the array. If the data has not been
+        loaded yet and the file format supports it, eg, tiled TIFF or npy files,
+        only the required part of the file is decoded.
+        """
+        if self._data_cache is None:
+            shape = self.read_shape()
+            if shape is not None and len(shape) >= 2:
+                y0, y1, _ = slice(y0, y1).indices(shape[0])
+                x0, x1, _ = slice(x0, x1).indices(shape[1])
+                region = self._read_partial(
+                    lambda fp: self.decode_region(fp, y0, max(y0, y1), x0, max(x0, x1))
+                )
+                if region is not None:
+                    return region
+
+        data = self()
+        return None if data is None else data[y0:y1, x0:x1]
+
+    def _read_partial(self, decode_fn: t.Callable[[t.BinaryIO], t.Any]) -> t.Any:
+        for fsrc in self._file_sources:
+            try:
+                with open(fsrc, "rb") as fp:
+                    value = decode_fn(fp)
+                if value is not None:
+                    return value
+            except Exception as exc:
+                logger.debug(f"{self.__class__}: partial read error `{exc}`.")
+        return None
+
 
 class NumpyRawItem(NumpyItem):
     """Base class for generic numpy types."""
 
 
 class NpyNumpyItem(NumpyRawItem):
+    """Numpy arrays stored as `.npy` files. If memory mapping is enabled, eg, through
+    `pipelime.items.mmap_data`, files are decoded as read-only memory-mapped arrays.
+    """
+
     @classmethod
     def file_extensions(cls) -> t.Sequence[str]:
         return (".npy",)
 
     @classmethod
     def decode(cls, fp: t.BinaryIO) -> np.ndarray:
+        if Item.is_mmap_enabled(cls):
+            value = cls._decode_mmap(fp)
+            if value is not None:
+                return value
         return np.load(fp)
 
+    @classmethod
+    def decode_shape(cls, fp: t.BinaryIO) -> t.Optional[t.Tuple[int, ...]]:
+        header = cls._read_header(fp)
+        return None if header is None else header[0]
+
+    @classmethod
+    def decode_region(
+        cls, fp: t.BinaryIO, y0: int, y1: int, x0: int, x1: int
+    ) -> t.Optional[np.ndarray]:
+        # only the pages of the window are actually read
+        value = cls._decode_mmap(fp)
+        return None if value is None else np.array(value[y0:y1, x0:x1])
+
+    @classmethod
+    def _read_header(
+        cls, fp: t.BinaryIO
+    ) -> t.Optional[t.Tuple[t.Tuple[int, ...], bool, np.dtype]]:
+        read_header = {
+            (1, 0): np.lib.format.read_array_header_1_0,
+            (2, 0): np.lib.format.read_array_header_2_0,
+        }.get(np.lib.format.read_magic(fp))
+        return None if read_header is None else read_header(fp)
+
+    @classmethod
+    def _decode_mmap(cls, fp: t.BinaryIO) -> t.Optional[np.ndarray]:
+        """Maps the array in memory, if the stream is a file and the array can be
+        mapped, otherwise None is returned and the stream is rewound.
+        """
+        try:
+            fp.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            return None
+
+        start = fp.tell()
+        header = cls._read_header(fp)
+        if header is not None:
+            shape, fortran_order, dtype = header
+            if not dtype.hasobject and 0 not in shape:
+                # NB: the mapping is still valid after closing the file
+                return np.asarray(
+                    np.memmap(
+                        fp,
+                        dtype=dtype,
+                        mode="r",
+                        offset=fp.tell(),
+                        shape=shape,
+                        order="F" if fortran_order else "C",
+                    )
+                )
+        fp.seek(start)
+        return None
+
     @classmethod
     def encode(cls, value: np.ndarray, fp: t.BinaryIO):
         np.save(fp, value)
@@ -9,7 +9,14 @@ from pipelime.sequences.samples_sequence import (
 import pipelime.sequences.sources
 import pipelime.sequences.pipes
 
-from pipelime.sequences.grabber import Grabber, grab_all
+from pipelime.sequences.grabber import (
+    Grabber,
+    StagedWorkers,
+    calibrate_grabber,
+    grab_all,
+    grab_reduce,
+    reuse_worker_pools,
+)
 from pipelime.sequences.utils import build_pipe, DataStream, PipeBuildingError
 
 from pipelime.utils.pydantic_types import SampleValidationInterface, ItemValidationModel
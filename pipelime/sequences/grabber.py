@@ -1,11 +1,20 @@
 from __future__ import annotations
 
+import functools
+import io
 import multiprocessing.context as mp_context
 import multiprocessing.pool as mp_pool
+import os
+import pickle
+import shutil
+import threading
+import time
 import typing as t
+from contextlib import ContextDecorator
 from enum import Enum, auto
 
 import pydantic.v1 as pyd
+from loguru import logger
 
 import pipelime.sequences as pls
 
@@ -17,6 +26,38 @@ class ReturnType(Enum):
     NO_RETURN = auto()
     SAMPLE = auto()
     SAMPLE_AND_INDEX = auto()
+    REDUCTION = auto()
+
+
+class StagedWorkers(pyd.BaseModel, extra="forbid"):
+    """The workers of each segment of a staged pipe."""
+
+    read: pyd.PositiveInt = pyd.Field(
+        2,
+        description=(
+            "The number of threads getting the samples from the source and loading "
+            "their data."
+        ),
+    )
+    transform: int = pyd.Field(
+        -1,
+        description=(
+            "The number of workers running the map stages following the source. If "
+            "negative, the number of (logical) cpu cores is used. If 0, the stages "
+            "run on the read threads. Processes or threads are chosen as set by the "
+            "grabber `backend`."
+        ),
+    )
+    write: pyd.PositiveInt = pyd.Field(
+        2, description="The number of threads running the final writer, if any."
+    )
+    max_samples: pyd.PositiveInt = pyd.Field(
+        64,
+        description=(
+            "The maximum number of samples in flight across all the segments. "
+            "When hit, no new sample is read until the oldest one is done."
+        ),
+    )
 
 
 class Grabber(pyd.BaseModel, extra="forbid", copy_on_model_validation="none"):
@@ -27,12 +68,27 @@ class Grabber(pyd.BaseModel, extra="forbid", copy_on_model_validation="none"):
             "the number of (logical) cpu cores is used."
         ),
     )
-    prefetch: pyd.PositiveInt = pyd.Field(
-        2, description="The number of samples loaded in advanced by each worker."
+    prefetch: t.Union[pyd.PositiveInt, t.Literal["auto"]] = pyd.Field(
+        2,
+        description=(
+            "The number of samples loaded in advanced by each worker. If `auto`, "
+            "it is tuned on the time spent on each sample."
+        ),
     )
     keep_order: bool = pyd.Field(
         False, description="Whether to retrieve the samples in the original order."
     )
+    reorder_buffer: t.Optional[pyd.PositiveInt] = pyd.Field(
+        None,
+        description=(
+            "When `keep_order` is True, the tasks are run unordered and the results "
+            "are re-sequenced in a buffer holding at most this number of samples, "
+            "including those still being processed. When the buffer is full, no new "
+            "task is started until the oldest one is done. It should be at least "
+            "`prefetch * num_workers`. If None, a slow sample blocks any later one "
+            "and memory is not bounded."
+        ),
+    )
     allow_nested_mp: bool = pyd.Field(
         False,
         description=(
@@ -41,6 +97,43 @@ class Grabber(pyd.BaseModel, extra="forbid", copy_on_model_validation="none"):
             "processes and not released resources)."
         ),
     )
+    backend: t.Literal["process", "thread", "auto"] = pyd.Field(
+        "process",
+        description=(
+            "How the workers are run: `process` spawns new processes, `thread` uses "
+            "a pool of threads sharing the sequence and the item caches of the main "
+            "process, `auto` selects `thread` if the sequence is thread-safe. "
+            "Sequences with any step not thread-safe always run on processes."
+        ),
+    )
+    shm_threshold: t.Optional[pyd.NonNegativeInt] = pyd.Field(
+        None,
+        description=(
+            "Numpy arrays returned by worker processes and larger than this number "
+            "of bytes are moved through shared memory instead of being pickled. "
+            "The memory is released as soon as the array is garbage collected. "
+            "If None, shared memory is not used. Ignored on Windows."
+        ),
+    )
+    share_items: bool = pyd.Field(
+        False,
+        description=(
+            "If True, the numpy arrays decoded by shared items, eg, the root items "
+            "of an Underfolder dataset, are published by the first worker process "
+            "loading them and mapped read-only by the others, instead of being "
+            "decoded and stored by each worker."
+        ),
+    )
+    staged: t.Optional[StagedWorkers] = pyd.Field(
+        None,
+        description=(
+            "Runs the pipe as a chain of segments, ie, the source, the map stages "
+            "following it and the final `to_underfolder` writer, each with its own "
+            "workers and connected by bounded queues, so that a few I/O threads can "
+            "keep many CPU workers busy. Then, `num_workers` is ignored. If None, "
+            "each worker runs the whole pipe on its samples."
+        ),
+    )
 
     def __call__(
         self,
@@ -49,6 +142,7 @@ class Grabber(pyd.BaseModel, extra="forbid", copy_on_model_validation="none"):
         size: t.Optional[int] = None,
         *,
         worker_init_fn: t.Optional[t.Tuple[t.Callable, t.Sequence]] = None,
+        reducer: t.Optional[t.Tuple[t.Callable, t.Callable]] = None,
     ) -> _GrabContext:
         return _GrabContext(
             self,
@@ -57,21 +151,415 @@ class Grabber(pyd.BaseModel, extra="forbid", copy_on_model_validation="none"):
             size=size,
             worker_init_fn=worker_init_fn,
             allow_nested_mp=self.allow_nested_mp,
+            reducer=reducer,
         )
 
 
 class _GrabWorker:
-    def __init__(self, sequence: pls.SamplesSequence):
-        self._sequence = sequence
+    """Runs the grabbing tasks on the worker processes. Since workers may be reused
+    across many grabbing operations, each task refers to a job file, ie, the pickled
+    sequence (or stage, for staged pipes) and user init function, which is installed
+    once per worker on first use. Then, tasks carry just a range of sample indexes
+    (or the samples to transform).
+    """
+
+    job_path: t.ClassVar[t.Optional[str]] = None
+    target: t.ClassVar[t.Any] = None
+    reducer: t.ClassVar[t.Optional[t.Tuple[t.Callable, t.Callable]]] = None
+    item_settings: t.ClassVar[t.Tuple[t.Dict, ...]] = ()
+    drain_barrier: t.ClassVar[t.Any] = None
+
+    @staticmethod
+    def _get_item_settings() -> t.Tuple[t.Dict, ...]:
+        from pipelime.items.base import ItemFactory
+
+        return (
+            dict(ItemFactory.ITEM_DATA_CACHE_MODE),
+            dict(ItemFactory.ITEM_SERIALIZATION_MODE),
+            dict(ItemFactory.ITEM_DISABLED_SERIALIZATION_MODES),
+            dict(ItemFactory.ITEM_MMAP_MODE),
+        )
+
+    @staticmethod
+    def _set_item_settings(settings: t.Tuple[t.Dict, ...]):
+        from pipelime.items.base import ItemFactory
+
+        for trg, src in zip(
+            (
+                ItemFactory.ITEM_DATA_CACHE_MODE,
+                ItemFactory.ITEM_SERIALIZATION_MODE,
+                ItemFactory.ITEM_DISABLED_SERIALIZATION_MODES,
+                ItemFactory.ITEM_MMAP_MODE,
+            ),
+            settings,
+        ):
+            trg.update(src)
+
+    @classmethod
+    def init(
+        cls,
+        item_data_cache: t.Mapping[t.Type["Item"], t.Optional[bool]],
+        extra_modules,
+        session_temp_dir,
+        data_cache_budget: t.Optional[int] = None,
+        item_mmap: t.Mapping[t.Type["Item"], t.Optional[bool]] = {},
+        drain_barrier: t.Any = None,
+    ):
+        from pipelime.choixe.utils.io import PipelimeTmp
+        from pipelime.cli.utils import PipelimeSymbolsHelper
+        from pipelime.items.base import ItemDataCache, ItemFactory
+
+        for item_cls, cache_mode in item_data_cache.items():
+            ItemFactory.set_data_cache_mode(item_cls, cache_mode)
+        ItemDataCache.set_budget(data_cache_budget)
+        for item_cls, mmap_mode in item_mmap.items():
+            ItemFactory.set_mmap_mode(item_cls, mmap_mode)
+
+        PipelimeTmp.SESSION_TMP_DIR = session_temp_dir
+        cls.drain_barrier = drain_barrier
+
+        PipelimeSymbolsHelper.set_extra_modules(extra_modules)
+        PipelimeSymbolsHelper.import_everything()
+
+        # the user init function of each job is run on top of these settings
+        cls.item_settings = cls._get_item_settings()
+
+    @classmethod
+    def install(cls, job_path: str):
+        if cls.job_path == job_path:
+            return
+
+        from pipelime.items.base import SharedItemCache
+
+        # drop any change made by the previous job
+        cls.job_path, cls.target, cls.reducer = None, None, None
+        cls._set_item_settings(cls.item_settings)
+
+        # NB: the sequence is unpickled here, ie, after importing all the extra
+        # modules, since they may define some of the sequence operators
+        with open(job_path, "rb") as fp:
+            target, user_init_fn, reducer, shared_items_folder = pickle.load(fp)
+
+        SharedItemCache.folder = shared_items_folder
+        if user_init_fn[0] is not None:
+            user_init_fn[0](*user_init_fn[1])
+        cls.job_path, cls.target, cls.reducer = job_path, target, reducer
+
+    @classmethod
+    def worker_fn(
+        cls,
+        job_path: str,
+        return_type: ReturnType,
+        shm_threshold: t.Optional[int],
+        idxs: range,
+    ) -> t.Union[t.List[t.Any], bytes]:
+        cls.install(job_path)
+        samples = _get_samples(
+            cls.target, return_type, idxs, cls.reducer  # type: ignore
+        )
+        if return_type == ReturnType.NO_RETURN:
+            return samples
+        return _dumps(samples, shm_threshold)
+
+    @classmethod
+    def transform_fn(
+        cls,
+        job_path: str,
+        shm_threshold: t.Optional[int],
+        chunk: t.Union[t.List[t.Tuple[int, pls.Sample]], bytes],
+    ) -> t.Union[t.List[t.Tuple[int, pls.Sample]], bytes]:
+        cls.install(job_path)
+        return _dumps(_transform_samples(cls.target, _loads(chunk)), shm_threshold)
+
+    @classmethod
+    def drain_fn(cls, fsync: bool, _: int):
+        from pipelime.sequences.pipes.writers import drain_pending_writes
+
+        # the worker waits for all the others, so that each one gets a single task
+        try:
+            drain_pending_writes(fsync)
+        finally:
+            cls.drain_barrier.wait()
+
+
+class _SharedMemoryPickler(pickle.Pickler):
+    """Pickles large numpy arrays as handles to shared memory blocks. The array data is
+    copied once into a new block, which is then unlinked by the receiver, so that
+    the memory is released when the unpickled array is garbage collected.
+    """
+
+    def __init__(self, file, threshold: int):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._threshold = threshold
+
+    def reducer_override(self, obj):
+        import numpy as np
+
+        if (
+            type(obj) is np.ndarray
+            and obj.nbytes > 0
+            and obj.nbytes >= self._threshold
+            and not obj.dtype.hasobject
+        ):
+            from multiprocessing.shared_memory import SharedMemory
+
+            shm = SharedMemory(create=True, size=obj.nbytes)
+            try:
+                np.ndarray(obj.shape, dtype=obj.dtype, buffer=shm.buf)[...] = obj
+            finally:
+                shm.close()
+            return _attach_shared_array, (shm.name, obj.shape, obj.dtype.str)
+        return NotImplemented
+
+
+def _dumps(obj: t.Any, shm_threshold: t.Optional[int]) -> t.Any:
+    if shm_threshold is None:
+        return obj
+
+    # large arrays are left in shared memory, the rest is pickled right now
+    with io.BytesIO() as buffer:
+        _SharedMemoryPickler(buffer, shm_threshold).dump(obj)
+        return buffer.getvalue()
+
+
+def _loads(obj: t.Any) -> t.Any:
+    return pickle.loads(obj) if isinstance(obj, bytes) else obj
+
 
-    def _worker_fn_no_return(self, idx) -> None:
-        _ = self._sequence[idx]
+class _SharedArrayOwner:
+    """Keeps the shared memory block mapped as long as some array refers to it."""
 
-    def _worker_fn_sample(self, idx) -> pls.Sample:
-        return self._sequence[idx]
+    def __init__(self, shm, shape: t.Tuple[int, ...], dtype: str):
+        import numpy as np
 
-    def _worker_fn_sample_and_index(self, idx) -> t.Tuple[int, pls.Sample]:
-        return idx, self._sequence[idx]
+        self._shm = shm
+        self._array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        self.__array_interface__ = self._array.__array_interface__
+
+    def __del__(self):
+        self._array = None
+        self._shm.close()
+
+
+def _attach_shared_array(name: str, shape: t.Tuple[int, ...], dtype: str):
+    from multiprocessing.shared_memory import SharedMemory
+
+    import numpy as np
+
+    shm = SharedMemory(name=name)
+
+    # the name is removed right now, the memory when the block is unmapped
+    shm.unlink()
+    return np.asarray(_SharedArrayOwner(shm, shape, dtype))
+
+
+class _PartialReduction:
+    def __init__(self, value: t.Any):
+        self.value = value
+
+
+def _get_samples(
+    sequence: pls.SamplesSequence,
+    return_type: ReturnType,
+    idxs: range,
+    reducer: t.Optional[t.Tuple[t.Callable, t.Callable]] = None,
+) -> t.List[t.Any]:
+    if return_type == ReturnType.REDUCTION:
+        # one accumulator per task, so that the progress is still tracked by sample
+        init, accumulate = reducer  # type: ignore
+        acc = init()
+        for idx in idxs:
+            acc = accumulate(acc, sequence[idx])
+        return [None] * (len(idxs) - 1) + [_PartialReduction(acc)]
+    if return_type == ReturnType.NO_RETURN:
+        for idx in idxs:
+            _ = sequence[idx]
+        return [None] * len(idxs)
+    if return_type == ReturnType.SAMPLE:
+        return [sequence[idx] for idx in idxs]
+    return [(idx, sequence[idx]) for idx in idxs]
+
+
+def _is_thread_safe(obj: t.Any) -> bool:
+    """Checks whether a sequence, a stage or any object referencing them can be
+    shared among multiple threads, ie, if no sequence and no stage found has been
+    marked with `thread_safe = False`.
+    """
+    from pipelime.stages import SampleStage
+
+    if isinstance(obj, pls.Sample):
+        return True
+    if isinstance(obj, (pls.SamplesSequence, SampleStage)) and not obj.thread_safe:
+        return False
+    if isinstance(obj, pyd.BaseModel):
+        return all(_is_thread_safe(getattr(obj, name)) for name in obj.__fields__)
+    if isinstance(obj, t.Mapping):
+        return all(_is_thread_safe(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return all(_is_thread_safe(v) for v in obj)
+    return True
+
+
+def _has_write_behind(obj: t.Any) -> bool:
+    """Checks whether a sequence, a stage or any object referencing them contains an
+    `UnderfolderWriter` writing in background.
+    """
+    from pipelime.sequences.pipes.writers import UnderfolderWriter
+
+    if isinstance(obj, UnderfolderWriter) and obj.write_behind > 0:
+        return True
+    if isinstance(obj, pyd.BaseModel):
+        return any(_has_write_behind(getattr(obj, name)) for name in obj.__fields__)
+    if isinstance(obj, t.Mapping):
+        return any(_has_write_behind(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(_has_write_behind(v) for v in obj)
+    return False
+
+
+def _split_pipe(
+    sequence: pls.SamplesSequence,
+) -> t.Tuple[pls.SamplesSequence, t.List[t.Any], t.Optional[t.Any]]:
+    """Splits a pipe into its source, the map stages following it and the final
+    writer, if any.
+    """
+    from pipelime.sequences.pipes.mapping import MappedSequence
+    from pipelime.sequences.pipes.writers import UnderfolderWriter
+
+    writer = None
+    if isinstance(sequence, UnderfolderWriter):
+        writer, sequence = sequence, sequence.source
+
+    stages = []
+    while isinstance(sequence, MappedSequence):
+        stages.append(sequence.stage)
+        sequence = sequence.source
+    return sequence, stages[::-1], writer
+
+
+def _load_item_data(sample: pls.Sample):
+    from pipelime.items import Item
+
+    for item in sample.values():
+        if item.cache_data or (
+            item.cache_data is None and Item.is_cache_enabled(type(item))
+        ):
+            _ = item()
+
+
+def _read_samples(
+    sequence: pls.SamplesSequence,
+    stage: t.Optional[t.Callable[[pls.Sample], pls.Sample]],
+    load_data: bool,
+    shm_threshold: t.Optional[int],
+    writer: t.Optional[t.Any],
+    idxs: range,
+) -> t.Any:
+    # the samples completed by a previous run are not read at all, while
+    # the writer returns them as they are on disk
+    chunk = [
+        (
+            idx,
+            None if writer is not None and writer.is_completed(idx) else sequence[idx],
+        )
+        for idx in idxs
+    ]
+    if stage is not None:
+        chunk = _transform_samples(stage, chunk)
+    if load_data:
+        # the I/O is done here, so that the transform workers just run the stages
+        for _, x in chunk:
+            if x is not None:
+                _load_item_data(x)
+    return _dumps(chunk, shm_threshold)
+
+
+def _transform_samples(
+    stage: t.Callable[[pls.Sample], pls.Sample],
+    chunk: t.List[t.Tuple[int, t.Optional[pls.Sample]]],
+) -> t.List[t.Tuple[int, t.Optional[pls.Sample]]]:
+    return [(idx, None if x is None else stage(x)) for idx, x in chunk]
+
+
+def _write_samples(writer: t.Any, chunk: t.Any) -> t.List[t.Tuple[int, pls.Sample]]:
+    return [(idx, writer.write_sample(idx, x)) for idx, x in _loads(chunk)]
+
+
+class _StagedPipe:
+    """Runs a pipe split into segments, each one on its own pool of workers. A chunk of
+    samples is submitted to the next segment as soon as it is done, while at most
+    `max_samples` samples can be in flight across the whole pipe: when the limit is
+    hit, no new chunk is read until a chunk is delivered, so that the faster
+    segments wait for the slower ones and the memory is bounded.
+    """
+
+    def __init__(
+        self,
+        segments: t.Sequence[t.Tuple[mp_pool.Pool, t.Callable]],
+        max_samples: int,
+        keep_order: bool,
+    ):
+        import queue
+
+        self._segments = segments
+        self._max_samples = max_samples
+        self._keep_order = keep_order
+        self._results = queue.SimpleQueue()
+        self._stopped = False
+
+    def _submit(self, segment: int, chunk: t.Any):
+        if self._stopped:
+            return
+        if segment == len(self._segments):
+            self._results.put(chunk)
+            return
+        pool, fn = self._segments[segment]
+        try:
+            pool.apply_async(
+                fn,
+                (chunk,),
+                callback=functools.partial(self._submit, segment + 1),
+                error_callback=self._results.put,
+            )
+        except ValueError as exc:  # pragma: no cover
+            # the pool may have been terminated on another thread
+            self._results.put(exc)
+
+    def run(self, tasks: t.Iterable[range]) -> t.Iterator[t.List[t.Tuple[int, t.Any]]]:
+        tasks = iter(tasks)
+        pending = {}
+        next_idx = 0
+        held = 0
+        exhausted = False
+        while True:
+            while not exhausted and held < self._max_samples:
+                task = next(tasks, None)
+                if task is None:
+                    exhausted = True
+                else:
+                    held += len(task)
+                    self._submit(0, task)
+            if held == 0:
+                return
+
+            chunk = self._results.get()
+            if isinstance(chunk, BaseException):
+                raise chunk
+            chunk = _loads(chunk)
+            if not self._keep_order:
+                held -= len(chunk)
+                yield chunk
+                continue
+
+            pending[chunk[0][0]] = chunk
+            while next_idx in pending:
+                chunk = pending.pop(next_idx)
+                next_idx += len(chunk)
+                held -= len(chunk)
+                yield chunk
+
+    def stop(self):
+        self._stopped = True
 
 
 class _NoDaemonSpawnProcess(mp_context.SpawnProcess):
@@ -88,6 +576,288 @@ class _NoDaemonSpawnContext(mp_context.SpawnContext):
     Process = _NoDaemonSpawnProcess
 
 
+class _SharedPool:
+    def __init__(self, key: t.Hashable, pool: mp_pool.Pool, num_workers: int):
+        self.key = key
+        self.pool = pool
+        self.num_workers = num_workers
+        self.refcount = 0
+        self._drain_lock = threading.Lock()
+
+    def drain_pending_writes(self, fsync: bool):
+        """Runs `drain_pending_writes` once on each worker."""
+        with self._drain_lock:
+            self.pool.map(
+                functools.partial(_GrabWorker.drain_fn, fsync),
+                range(self.num_workers),
+                chunksize=1,
+            )
+
+
+class _WorkerPoolRegistry:
+    """Worker pools are shared among grabbers with the same settings. A pool is
+    terminated when its last user releases it, unless `reuse_worker_pools` is active.
+    """
+
+    pools: t.ClassVar[t.Dict[t.Hashable, _SharedPool]] = {}
+    keep_alive: t.ClassVar[int] = 0
+    lock: t.ClassVar[threading.RLock] = threading.RLock()
+
+    @staticmethod
+    def pool_key(num_workers: int, allow_nested_mp: bool) -> t.Hashable:
+        from pipelime.choixe.utils.io import PipelimeTmp
+        from pipelime.cli.utils import PipelimeSymbolsHelper
+        from pipelime.items import Item, ItemDataCache
+
+        return (
+            num_workers,
+            allow_nested_mp,
+            tuple(PipelimeSymbolsHelper.extra_modules),
+            tuple(
+                (itc, mode)
+                for itc, mode in Item.ITEM_DATA_CACHE_MODE.items()
+                if mode is not None
+            ),
+            ItemDataCache.max_bytes,
+            tuple(
+                (itc, mode)
+                for itc, mode in Item.ITEM_MMAP_MODE.items()
+                if mode is not None
+            ),
+            PipelimeTmp.SESSION_TMP_DIR,
+        )
+
+    @classmethod
+    def acquire(cls, num_workers: int, allow_nested_mp: bool) -> _SharedPool:
+        from pipelime.choixe.utils.io import PipelimeTmp
+        from pipelime.cli.utils import PipelimeSymbolsHelper
+        from pipelime.items import Item, ItemDataCache
+
+        with cls.lock:
+            # the session folder is created now, so that it is shared with the workers
+            PipelimeTmp.make_session_dir()
+
+            key = cls.pool_key(num_workers, allow_nested_mp)
+            shared_pool = cls.pools.get(key)
+            if shared_pool is None:
+                if allow_nested_mp:
+                    # Spawn processes as non-daemon processes, to allow nested
+                    # multiprocessing. This is because (from the Python docs):
+                    # "...a daemonic process is not allowed to create child
+                    # processes. Otherwise a daemonic process would leave its
+                    # children orphaned if it gets terminated when its parent
+                    # process exits."
+                    # Thus, this option should be used with caution, as it may lead
+                    # to zombie processes and not released resources.
+                    context_cls = _NoDaemonSpawnContext
+                else:
+                    context_cls = mp_context.SpawnContext
+
+                context = context_cls()
+                pool_size = num_workers if num_workers > 0 else (os.cpu_count() or 1)
+                shared_pool = _SharedPool(
+                    key,
+                    mp_pool.Pool(
+                        pool_size,
+                        initializer=_GrabWorker.init,
+                        initargs=(
+                            Item.ITEM_DATA_CACHE_MODE,
+                            PipelimeSymbolsHelper.extra_modules,
+                            PipelimeTmp.SESSION_TMP_DIR,
+                            ItemDataCache.max_bytes,
+                            Item.ITEM_MMAP_MODE,
+                            context.Barrier(pool_size),
+                        ),
+                        context=context,
+                    ),
+                    pool_size,
+                )
+                cls.pools[key] = shared_pool
+            shared_pool.refcount += 1
+            return shared_pool
+
+    @classmethod
+    def release(cls, shared_pool: _SharedPool, discard: bool = False):
+        with cls.lock:
+            shared_pool.refcount -= 1
+            if (discard or cls.keep_alive == 0) and (
+                cls.pools.get(shared_pool.key) is shared_pool
+            ):
+                # NB: a discarded pool may still be running some tasks
+                del cls.pools[shared_pool.key]
+            if shared_pool.refcount == 0 and shared_pool.key not in cls.pools:
+                shared_pool.pool.terminate()
+
+    @classmethod
+    def discard_unused(cls, keys: t.Iterable[t.Hashable]):
+        """Terminates the pools with the given keys which are not in use."""
+        with cls.lock:
+            for key in keys:
+                shared_pool = cls.pools.get(key)
+                if shared_pool is not None and shared_pool.refcount == 0:
+                    del cls.pools[key]
+                    shared_pool.pool.terminate()
+
+    @classmethod
+    def release_unused(cls):
+        with cls.lock:
+            for key, shared_pool in list(cls.pools.items()):
+                if shared_pool.refcount == 0:
+                    del cls.pools[key]
+                    shared_pool.pool.terminate()
+
+
+class reuse_worker_pools(ContextDecorator):
+    """Use this class as context manager or function decorator to keep the worker
+    processes alive until exit, so that any grabbing operation with the same settings,
+    ie, number of workers, nested multiprocessing, extra modules and data cache modes,
+    reuses them instead of spawning new processes.
+
+    Examples:
+       # a single pool of workers is spawned
+       with reuse_worker_pools():
+           grab_all(Grabber(num_workers=4), seq_a)
+           grab_all(Grabber(num_workers=4), seq_b)
+    """
+
+    def __enter__(self):
+        with _WorkerPoolRegistry.lock:
+            _WorkerPoolRegistry.keep_alive += 1
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        with _WorkerPoolRegistry.lock:
+            _WorkerPoolRegistry.keep_alive -= 1
+            if _WorkerPoolRegistry.keep_alive == 0:
+                _WorkerPoolRegistry.release_unused()
+
+
+class _ReorderBuffer:
+    """Re-sequences the chunks of samples coming from unordered tasks. At most
+    `max_samples` samples can be in flight or waiting in the buffer: when the limit is
+    hit, the task generator blocks until the oldest chunk is delivered.
+    """
+
+    def __init__(self, max_samples: int):
+        self._max_samples = max_samples
+        self._held = 0
+        self._blocked = False
+        self._stopped = False
+        self._cond = threading.Condition()
+        self.tasks = 0
+        self.stalls = 0
+
+    def _has_room(self, size: int) -> bool:
+        return (
+            self._stopped or self._held == 0 or self._held + size <= self._max_samples
+        )
+
+    def throttle(self, tasks: t.Iterable[range]) -> t.Iterator[range]:
+        for task in tasks:
+            with self._cond:
+                if not self._has_room(len(task)):
+                    self._blocked = True
+                    self._cond.wait_for(lambda: self._has_room(len(task)))
+                    self._blocked = False
+                if self._stopped:
+                    return
+                self._held += len(task)
+                self.tasks += 1
+            yield task
+
+    def reorder(
+        self, chunks: t.Iterable[t.List[t.Tuple[int, t.Any]]]
+    ) -> t.Iterator[t.List[t.Tuple[int, t.Any]]]:
+        pending = {}
+        next_idx = 0
+        for chunk in chunks:
+            pending[chunk[0][0]] = chunk
+
+            # no new task can start until the oldest one is done
+            if next_idx not in pending and self._blocked:
+                self.stalls += 1
+
+            while next_idx in pending:
+                chunk = pending.pop(next_idx)
+                next_idx += len(chunk)
+                with self._cond:
+                    self._held -= len(chunk)
+                    self._cond.notify_all()
+                yield chunk
+
+    def stop(self):
+        # unblock the task generator, if needed
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+
+class _AdaptivePrefetch:
+    """Tunes the chunk size and the number of chunks in flight from the per-sample cost
+    measured on the workers. The first chunks are a pilot window of single samples,
+    one per worker. Then, each chunk is sized to last about `target_time` seconds
+    and `2 * num_workers` chunks are kept in flight, so that the workers are always
+    busy, while bounding the memory. The cost is a moving average, so the chunk size
+    follows any drift.
+    """
+
+    target_time: t.ClassVar[float] = 0.1
+    max_chunksize: t.ClassVar[int] = 1024
+    smoothing: t.ClassVar[float] = 0.25
+
+    def __init__(self, num_workers: int):
+        self._num_workers = num_workers
+        self._max_in_flight = num_workers
+        self._in_flight = 0
+        self._cost: t.Optional[float] = None
+        self._stopped = False
+        self._cond = threading.Condition()
+
+    @property
+    def chunksize(self) -> int:
+        if self._cost is None:
+            return 1
+        if self._cost <= 0:
+            return self.max_chunksize
+        return max(1, min(int(self.target_time / self._cost), self.max_chunksize))
+
+    def tasks(self, total: int) -> t.Iterator[range]:
+        start = 0
+        while start < total:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._stopped or self._in_flight < self._max_in_flight
+                )
+                if self._stopped:
+                    return
+                self._in_flight += 1
+                stop = min(start + self.chunksize, total)
+            yield range(start, stop)
+            start = stop
+
+    def update(self, elapsed: float, size: int):
+        with self._cond:
+            cost = elapsed / max(size, 1)
+            self._cost = (
+                cost
+                if self._cost is None
+                else (1 - self.smoothing) * self._cost + self.smoothing * cost
+            )
+            self._in_flight -= 1
+            self._max_in_flight = 2 * self._num_workers
+            self._cond.notify_all()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+
+def _timed_call(fn: t.Callable[[range], t.Any], idxs: range) -> t.Tuple[float, t.Any]:
+    start = time.perf_counter()
+    result = fn(idxs)
+    return time.perf_counter() - start, result
+
+
 class _GrabContext:
     def __init__(
         self,
@@ -97,102 +867,342 @@ class _GrabContext:
         size: t.Optional[int],
         worker_init_fn: t.Optional[t.Tuple[t.Callable, t.Sequence]],
         allow_nested_mp: bool = False,
+        reducer: t.Optional[t.Tuple[t.Callable, t.Callable]] = None,
     ):
         self._grabber = grabber
         self._sequence = sequence
         self._return_type = return_type
         self._size = size
-        self._pool = None
+        self._shared_pool = None
+        self._thread_pool = None
+        self._staged_pools = []
+        self._staged_pipe = None
+        self._reorder_buffer = None
+        self._adaptive_prefetch = None
+        self._job_path = None
+        self._shared_items_folder = None
+        self._completed = False
+        self._drain_workers = False
         self._worker_init_fn = (None, ()) if worker_init_fn is None else worker_init_fn
         self._allow_nested_mp = allow_nested_mp
+        self._reducer = reducer
+
+    def _iterate(self, results: t.Iterable[t.Any]) -> t.Iterator:
+        if self._adaptive_prefetch is not None:
+            results = self._track_cost(results)
+        chunks = (_loads(c) for c in results)
+        if self._reorder_buffer is not None:
+            chunks = self._reorder_buffer.reorder(chunks)
+            if self._return_type == ReturnType.SAMPLE:
+                chunks = ([x for _, x in c] for c in chunks)
+
+        for chunk in chunks:
+            yield from chunk
+        self._completed = True
+
+        if self._reorder_buffer is not None and self._reorder_buffer.stalls > 0:
+            logger.info(
+                f"Grabber stalled {self._reorder_buffer.stalls} times out of "
+                f"{self._reorder_buffer.tasks} tasks waiting for a slow sample, "
+                "consider increasing the reorder buffer."
+            )
+
+    def _reduce(self, samples: t.Iterable[pls.Sample]) -> t.Iterator:
+        init, accumulate = self._reducer  # type: ignore
+        acc, count = init(), 0
+        for sample in samples:
+            if count > 0:
+                yield None
+            acc = accumulate(acc, sample)
+            count += 1
+        if count > 0:
+            yield _PartialReduction(acc)
+
+    def _track_cost(
+        self, results: t.Iterable[t.Tuple[float, t.Any]]
+    ) -> t.Iterator[t.Any]:
+        for elapsed, chunk in results:
+            chunk = _loads(chunk)
+            self._adaptive_prefetch.update(elapsed, len(chunk))  # type: ignore
+            yield chunk
+
+    def _iterate_staged(self, chunks: t.Iterable[t.List[t.Tuple[int, t.Any]]]):
+        samples = (x for chunk in chunks for x in chunk)
+        if self._return_type == ReturnType.SAMPLE_AND_INDEX:
+            yield from samples
+        elif self._return_type == ReturnType.SAMPLE:
+            yield from (x for _, x in samples)
+        elif self._return_type == ReturnType.REDUCTION:
+            yield from self._reduce(x for _, x in samples)
+        else:
+            yield from (None for _ in samples)
+        self._completed = True
+
+    def _write_job(self, target: t.Any, with_reducer: bool = True) -> str:
+        import uuid
 
-    @staticmethod
-    def wrk_init(
-        item_data_cache: t.Mapping[t.Type["Item"], t.Optional[bool]],
-        extra_modules,
-        session_temp_dir,
-        user_init_fn,
-    ):
         from pipelime.choixe.utils.io import PipelimeTmp
-        from pipelime.cli.utils import PipelimeSymbolsHelper
-        from pipelime.items.base import ItemFactory
+        from pipelime.items.base import SharedItemCache
 
-        for item_cls, cache_mode in item_data_cache.items():
-            ItemFactory.set_data_cache_mode(item_cls, cache_mode)
+        if self._grabber.share_items and self._shared_items_folder is None:
+            self._shared_items_folder = SharedItemCache.make_folder()
 
-        PipelimeTmp.SESSION_TMP_DIR = session_temp_dir
+        # the target is pickled just once and loaded by each worker
+        job_name = f"grab-{uuid.uuid4().hex}.pkl"
+        self._job_path = PipelimeTmp.make_session_dir() / job_name
+        with self._job_path.open("wb") as fp:
+            pickle.dump(
+                (
+                    target,
+                    self._worker_init_fn,
+                    self._reducer if with_reducer else None,
+                    self._shared_items_folder,
+                ),
+                fp,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        return str(self._job_path)
 
-        PipelimeSymbolsHelper.set_extra_modules(extra_modules)
-        PipelimeSymbolsHelper.import_everything()
+    def _enter_staged(self, staged: StagedWorkers):
+        from pipelime.stages import StageCompose
 
-        if user_init_fn[0] is not None:
-            user_init_fn[0](*user_init_fn[1])
+        self._completed = False
+        total = len(self._sequence) if self._size is None else self._size
+        chunksize = 1 if self._grabber.prefetch == "auto" else self._grabber.prefetch
+        source, stages, writer = _split_pipe(self._sequence)
+        stage = None
+        if len(stages) == 1:
+            stage = stages[0]
+        elif stages:
+            stage = StageCompose(stages)
+
+        # the read and write threads share the objects of the main process
+        if self._worker_init_fn[0] is not None:
+            self._worker_init_fn[0](*self._worker_init_fn[1])
+
+        def _make_thread_pool(num_workers: int) -> mp_pool.Pool:
+            pool = mp_pool.ThreadPool(num_workers)
+            self._staged_pools.append(pool)
+            return pool
+
+        segments = []
+        read_stage = stage if staged.transform == 0 else None
+        num_readers = staged.read
+        if num_readers > 1 and not _is_thread_safe([source, read_stage]):
+            logger.warning("The source is not thread-safe, reading on a single thread.")
+            num_readers = 1
+
+        shm_threshold = None
+        if stage is not None and read_stage is None:
+            if self._use_threads(stage):
+                transform_pool = _make_thread_pool(
+                    staged.transform if staged.transform > 0 else os.cpu_count() or 1
+                )
+                transform_fn = functools.partial(_transform_samples, stage)
+            else:
+                if os.name != "nt":
+                    shm_threshold = self._grabber.shm_threshold
+                self._shared_pool = _WorkerPoolRegistry.acquire(
+                    staged.transform, self._allow_nested_mp
+                )
+                transform_pool = self._shared_pool.pool
+                # the reduction, if any, is done on the main process
+                transform_fn = functools.partial(
+                    _GrabWorker.transform_fn,
+                    self._write_job(stage, with_reducer=False),
+                    shm_threshold,
+                )
+        segments.append(
+            (
+                _make_thread_pool(num_readers),
+                functools.partial(
+                    _read_samples,
+                    source,
+                    read_stage,
+                    stage is not None and read_stage is None,
+                    shm_threshold,
+                    writer,
+                ),
+            )
+        )
+        if stage is not None and read_stage is None:
+            segments.append((transform_pool, transform_fn))
+        if writer is not None:
+            segments.append(
+                (
+                    _make_thread_pool(staged.write),
+                    functools.partial(_write_samples, writer),
+                )
+            )
+
+        self._staged_pipe = _StagedPipe(
+            segments, staged.max_samples, self._grabber.keep_order
+        )
+        return self._iterate_staged(
+            self._staged_pipe.run(
+                range(start, min(start + chunksize, total))
+                for start in range(0, total, chunksize)
+            )
+        )
 
     def __enter__(self):
-        from pipelime.choixe.utils.io import PipelimeTmp
-        from pipelime.cli.utils import PipelimeSymbolsHelper
-        from pipelime.items import Item
+        if self._grabber.staged is not None:
+            # STAGED PIPE
+            return self._enter_staged(self._grabber.staged)
 
         if self._grabber.num_workers == 0:
             # SINGLE PROCESS
-            self._pool = None
             it = iter(self._sequence)
             if self._worker_init_fn[0] is not None:
                 self._worker_init_fn[0](*self._worker_init_fn[1])
             if self._return_type == ReturnType.SAMPLE_AND_INDEX:
                 return enumerate(it)
+            if self._return_type == ReturnType.REDUCTION:
+                return self._reduce(it)
             return it
 
-        # MULTIPLE PROCESSES
-
-        if self._allow_nested_mp:
-            # Spawn processes as non-daemon processes, to allow nested multiprocessing.
-            # This is because (from the Python documentation):
-            # "...a daemonic process is not allowed to create child processes. Otherwise
-            # a daemonic process would leave its children orphaned if it gets terminated
-            # when its parent process exits."
-            # Thus, this option should be used with caution, as it may lead to zombie
-            # processes and not released resources.
-            context_cls = _NoDaemonSpawnContext
+        self._completed = False
+
+        # each task is a range of `prefetch` indexes
+        total = len(self._sequence) if self._size is None else self._size
+        if self._grabber.prefetch == "auto":
+            self._adaptive_prefetch = _AdaptivePrefetch(
+                self._grabber.num_workers
+                if self._grabber.num_workers > 0
+                else (os.cpu_count() or 1)
+            )
+            idx_ranges = self._adaptive_prefetch.tasks(total)
         else:
-            context_cls = mp_context.SpawnContext
-
-        self._pool = mp_pool.Pool(
-            self._grabber.num_workers if self._grabber.num_workers > 0 else None,
-            initializer=_GrabContext.wrk_init,
-            initargs=(
-                Item.ITEM_DATA_CACHE_MODE,
-                PipelimeSymbolsHelper.extra_modules,
-                PipelimeTmp.SESSION_TMP_DIR,
-                self._worker_init_fn,
-            ),
-            context=context_cls(),
-        )
-        runner = self._pool.__enter__()
+            chunksize = self._grabber.prefetch
+            idx_ranges = (
+                range(start, min(start + chunksize, total))
+                for start in range(0, total, chunksize)
+            )
 
-        worker = _GrabWorker(self._sequence)
-        if self._return_type == ReturnType.NO_RETURN:
-            fn = worker._worker_fn_no_return
-        elif self._return_type == ReturnType.SAMPLE:
-            fn = worker._worker_fn_sample
+        # keep the order through a bounded reorder buffer
+        task_return_type = self._return_type
+        if (
+            self._grabber.keep_order
+            and self._grabber.reorder_buffer is not None
+            and self._return_type in (ReturnType.SAMPLE, ReturnType.SAMPLE_AND_INDEX)
+        ):
+            self._reorder_buffer = _ReorderBuffer(self._grabber.reorder_buffer)
+            idx_ranges = self._reorder_buffer.throttle(idx_ranges)
+            task_return_type = ReturnType.SAMPLE_AND_INDEX
+
+        if self._use_threads(self._sequence):
+            # MULTIPLE THREADS
+            # the workers share the sequence, so the init function is run just once
+            if self._worker_init_fn[0] is not None:
+                self._worker_init_fn[0](*self._worker_init_fn[1])
+            self._thread_pool = mp_pool.ThreadPool(
+                self._grabber.num_workers if self._grabber.num_workers > 0 else None
+            )
+            runner = self._thread_pool
+            fn = functools.partial(
+                _get_samples,
+                self._sequence,
+                task_return_type,
+                reducer=self._reducer,
+            )
         else:
-            fn = worker._worker_fn_sample_and_index
+            # MULTIPLE PROCESSES
+            self._shared_pool = _WorkerPoolRegistry.acquire(
+                self._grabber.num_workers, self._allow_nested_mp
+            )
+            runner = self._shared_pool.pool
+            self._drain_workers = _has_write_behind(self._sequence)
+            fn = functools.partial(
+                _GrabWorker.worker_fn,
+                self._write_job(self._sequence),
+                task_return_type,
+                None if os.name == "nt" else self._grabber.shm_threshold,
+            )
 
-        if self._grabber.keep_order:
-            return runner.imap(
-                fn,
-                range(len(self._sequence) if self._size is None else self._size),
-                chunksize=self._grabber.prefetch,
+        if self._adaptive_prefetch is not None:
+            fn = functools.partial(_timed_call, fn)
+
+        if self._grabber.keep_order and self._reorder_buffer is None:
+            return self._iterate(runner.imap(fn, idx_ranges))
+        return self._iterate(runner.imap_unordered(fn, idx_ranges))
+
+    def _use_threads(self, target: t.Any) -> bool:
+        if self._grabber.backend == "process":
+            return False
+        if _is_thread_safe(target):
+            return True
+        if self._grabber.backend == "thread":
+            logger.warning(
+                "The sequence is not thread-safe, falling back to multiprocessing."
             )
-        return runner.imap_unordered(
-            fn,
-            range(len(self._sequence) if self._size is None else self._size),
-            chunksize=self._grabber.prefetch,
-        )
+        return False
 
     def __exit__(self, exc_type, exc_value, traceback):
-        if self._pool is not None:
-            self._pool.__exit__(exc_type, exc_value, traceback)  # type: ignore
+        from pipelime.sequences.pipes.writers import drain_pending_writes
+
+        if self._staged_pipe is not None:
+            self._staged_pipe.stop()
+            self._staged_pipe = None
+        for pool in self._staged_pools:
+            pool.terminate()
+        self._staged_pools = []
+        if self._reorder_buffer is not None:
+            self._reorder_buffer.stop()
+            self._reorder_buffer = None
+        if self._adaptive_prefetch is not None:
+            self._adaptive_prefetch.stop()
+            self._adaptive_prefetch = None
+        if self._thread_pool is not None:
+            self._thread_pool.terminate()
+            self._thread_pool = None
+
+        # wait for the items written in background, if any, then flush them to disk
+        # just once at the end of the grabbing
+        discard = exc_type is not None or not self._completed
+        try:
+            try:
+                if self._drain_workers and not discard:
+                    self._shared_pool.drain_pending_writes(  # type: ignore
+                        fsync=exc_type is None
+                    )
+            finally:
+                drain_pending_writes(fsync=exc_type is None)
+        except Exception:
+            if exc_type is None:
+                raise
+            logger.exception("Background writes failed while handling an error.")
+        finally:
+            self._release(discard)
+
+    def _release(self, discard: bool):
+        if self._shared_pool is not None:
+            # do not reuse the workers if the grabbing has not been completed
+            _WorkerPoolRegistry.release(self._shared_pool, discard=discard)
+            self._shared_pool = None
+        if self._job_path is not None:
+            self._job_path.unlink(missing_ok=True)
+            self._job_path = None
+        if self._shared_items_folder is not None:
+            # the arrays still mapped are released when garbage collected
+            shutil.rmtree(self._shared_items_folder, ignore_errors=True)
+            self._shared_items_folder = None
+
+
+def _get_worker_init_fn(
+    worker_init_fn: t.Union[t.Callable, t.Tuple[t.Callable, t.Sequence], None],
+) -> t.Optional[t.Tuple[t.Callable, t.Sequence]]:
+    if isinstance(worker_init_fn, t.Sequence):
+        if len(worker_init_fn) == 1:
+            return (worker_init_fn[0], ())
+        elif len(worker_init_fn) != 2:
+            raise ValueError(
+                "The worker_init_fn argument must be a callable or a tuple of "
+                "a callable and its arguments."
+            )
+        return tuple(worker_init_fn)  # type: ignore
+    elif worker_init_fn is not None:
+        return (worker_init_fn, ())
+    return None
 
 
 def grab_all(
@@ -228,24 +1238,12 @@ def grab_all(
     if grab_context_manager is None:
         grab_context_manager = contextlib.nullcontext()
 
-    if isinstance(worker_init_fn, t.Sequence):
-        if len(worker_init_fn) == 1:
-            worker_init_fn = (worker_init_fn[0], ())
-        elif len(worker_init_fn) != 2:
-            raise ValueError(
-                "The worker_init_fn argument must be a callable or a tuple of "
-                "a callable and its arguments."
-            )
-        worker_init_fn = tuple(worker_init_fn)
-    elif worker_init_fn is not None:
-        worker_init_fn = (worker_init_fn, ())
-
     with grab_context_manager:
         ctx = grabber(
             sequence,
             return_type=return_type,
             size=size,
-            worker_init_fn=worker_init_fn,
+            worker_init_fn=_get_worker_init_fn(worker_init_fn),
         )
         if return_type == ReturnType.SAMPLE_AND_INDEX:
             with ctx as gseq:
@@ -255,3 +1253,273 @@ def grab_all(
             with ctx as gseq:
                 for sample in track_fn(gseq):  # type: ignore
                     sample_fn(sample)  # type: ignore
+
+
+def grab_reduce(
+    grabber: Grabber,
+    sequence: pls.SamplesSequence,
+    init: t.Callable[[], t.Any],
+    accumulate: t.Callable[[t.Any, pls.Sample], t.Any],
+    merge: t.Callable[[t.Any, t.Any], t.Any],
+    *,
+    track_fn: t.Optional[t.Callable[[t.Iterable], t.Iterable]] = None,
+    size: t.Optional[int] = None,
+    grab_context_manager: t.Optional[t.ContextManager] = None,
+    worker_init_fn: t.Union[t.Callable, t.Tuple[t.Callable, t.Sequence], None] = None,
+) -> t.Any:
+    """Reduces a sequence to a single value. Each task creates its own accumulator
+    calling `init`, then feeds it with its samples through `accumulate`. The partial
+    results are sent back to the main process and combined by `merge`. Since the
+    tasks may complete in any order, `merge` should be associative and commutative.
+
+    Args:
+        grabber (Grabber): the grabber options.
+        sequence (SamplesSequence): the sequence to reduce.
+        init (t.Callable[[], t.Any]): a callable returning a new accumulator.
+        accumulate (t.Callable[[t.Any, Sample], t.Any]): a callable updating an
+            accumulator with a sample and returning it.
+        merge (t.Callable[[t.Any, t.Any], t.Any]): a callable merging two
+            accumulators and returning the result.
+        track_fn (t.Optional[t.Callable[[t.Iterable], t.Iterable]], optional): a
+            callable wrapping the iterable, one element per sample, eg, to show the
+            progress. Defaults to None.
+        size (t.Optional[int], optional): the size of the sequence. If not given,
+            `len(sequence)` is evaluated. Defaults to None.
+        grab_context_manager (t.Optional[t.ContextManager], optional): a context
+            manager wrapping the whole operation on the main process. Defaults to None.
+        worker_init_fn (optional): a callable or a tuple (callable, args) to run
+            on each worker. Defaults to None.
+
+    Returns:
+        t.Any: the final accumulator.
+    """
+    import contextlib
+
+    if track_fn is None:
+        track_fn = lambda x: x  # noqa: E731
+    if grab_context_manager is None:
+        grab_context_manager = contextlib.nullcontext()
+
+    result = init()
+    with grab_context_manager:
+        ctx = grabber(
+            sequence,
+            return_type=ReturnType.REDUCTION,
+            size=size,
+            worker_init_fn=_get_worker_init_fn(worker_init_fn),
+            reducer=(init, accumulate),
+        )
+        with ctx as gseq:
+            for partial in track_fn(gseq):  # type: ignore
+                if partial is not None:
+                    result = merge(result, partial.value)
+    return result
+
+
+def _calibration_key(grabber: Grabber, sequence: pls.SamplesSequence) -> str:
+    import hashlib
+    import json
+
+    definition = json.dumps(
+        {
+            "pipe": sequence.to_pipe(),
+            "backend": grabber.backend,
+            "cpu_count": os.cpu_count(),
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(definition.encode()).hexdigest()
+
+
+def _load_calibrations() -> t.Dict[str, t.Dict[str, int]]:
+    import json
+
+    from pipelime.cli.utils import PipelimeUserAppDir
+
+    try:
+        with PipelimeUserAppDir.grabber_calibration_path().open() as fp:
+            calibrations = json.load(fp)
+        return calibrations if isinstance(calibrations, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _store_calibration(key: str, num_workers: int, prefetch: int):
+    import json
+
+    from pipelime.cli.utils import PipelimeUserAppDir
+
+    calibrations = _load_calibrations()
+    calibrations[key] = {"num_workers": num_workers, "prefetch": prefetch}
+    try:
+        path = PipelimeUserAppDir.grabber_calibration_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w") as fp:
+            json.dump(calibrations, fp, indent=2)
+    except OSError as exc:  # pragma: no cover
+        logger.warning(f"Cannot store the grabber calibration: {exc}")
+
+
+def _calibration_sequence(
+    sequence: pls.SamplesSequence,
+) -> t.Optional[pls.SamplesSequence]:
+    """Returns the pipe to run during the calibration, ie, the final writer, if any,
+    is moved to a temporary folder. If some writer cannot be moved, None is returned.
+    """
+    from pipelime.choixe.utils.io import PipelimeTmp
+    from pipelime.sequences.pipes import PipedSequenceBase
+    from pipelime.sequences.pipes.writers import UnderfolderWriter
+
+    calib_seq = sequence
+    if isinstance(sequence, UnderfolderWriter):
+        calib_seq = UnderfolderWriter(
+            folder=PipelimeTmp.make_subdir() / "calibration",
+            source=sequence.source,
+            zfill=sequence.zfill,
+            key_serialization_mode=sequence.key_serialization_mode,
+            exists_ok=True,
+        )
+        sequence = sequence.source
+
+    while isinstance(sequence, PipedSequenceBase):
+        if isinstance(sequence, UnderfolderWriter):
+            return None
+        sequence = sequence.source
+    return calib_seq
+
+
+def calibrate_grabber(
+    grabber: Grabber,
+    sequence: pls.SamplesSequence,
+    *,
+    samples_per_step: int = 16,
+    size: t.Optional[int] = None,
+    grab_context_manager: t.Optional[t.ContextManager] = None,
+    worker_init_fn: t.Union[t.Callable, t.Tuple[t.Callable, t.Sequence], None] = None,
+    use_cache: bool = True,
+) -> Grabber:
+    """Tunes the number of workers and the prefetch on a few samples of the actual
+    pipe. The throughput is measured with 0, 1, 2, 4 and so on workers, up to the
+    number of (logical) cpu cores, until it stops improving. Then, the prefetch is
+    set so that each task lasts about 0.1 seconds. The result is logged and cached
+    in the user app directory, keyed by the pipe definition.
+    NB: the final writer, if any, writes the calibration samples to a temporary
+    folder. The calibration is skipped with a warning if any other writer is found
+    in the pipe.
+    NB: wrap both the calibration and the actual grabbing in `reuse_worker_pools`
+    to reuse the worker processes spawned during the calibration.
+
+    Args:
+        grabber (Grabber): the grabber to tune, the other options are kept.
+        sequence (SamplesSequence): the pipe to run.
+        samples_per_step (int, optional): the minimum number of samples grabbed to
+            measure the throughput of each worker count. Defaults to 16.
+        size (t.Optional[int], optional): the size of the sequence. If not given,
+            `len(sequence)` is evaluated. Defaults to None.
+        grab_context_manager (t.Optional[t.ContextManager], optional): a context
+            manager wrapping each calibration run. Defaults to None.
+        worker_init_fn (optional): a callable or a tuple (callable, args) to run
+            on each worker. Defaults to None.
+        use_cache (bool, optional): if False, the calibration is run even if a
+            cached result is found. Defaults to True.
+
+    Returns:
+        Grabber: a copy of `grabber` with the new `num_workers` and `prefetch`.
+    """
+    import copy
+
+    key = _calibration_key(grabber, sequence)
+    cached = _load_calibrations().get(key) if use_cache else None
+    if cached is not None:
+        logger.info(
+            f"Using the cached grabber calibration: {cached['num_workers']} workers, "
+            f"prefetch {cached['prefetch']}."
+        )
+        return grabber.copy(update=cached)
+
+    total = len(sequence) if size is None else size
+    calib_seq = _calibration_sequence(sequence)
+    if calib_seq is None:
+        logger.warning(
+            "Grabber calibration skipped, since the pipe writes to an underfolder "
+            "before its last step: running on a single process. "
+            "Please set the number of workers explicitly."
+        )
+        return grabber.copy(update={"num_workers": 0})
+    if total < 2 * samples_per_step:
+        logger.info("Grabber calibration skipped, running on a single process.")
+        return grabber.copy(update={"num_workers": 0})
+
+    def _grab(num_workers: int, prefetch: int, start: int, count: int) -> float:
+        start = start % total
+        stop = min(start + count, total)
+        begin = time.perf_counter()
+        grab_all(
+            grabber.copy(
+                update={
+                    "num_workers": num_workers,
+                    "prefetch": prefetch,
+                    "keep_order": False,
+                    "staged": None,
+                }
+            ),
+            calib_seq[start:stop],  # type: ignore
+            grab_context_manager=copy.deepcopy(grab_context_manager),
+            worker_init_fn=worker_init_fn,
+        )
+        return (stop - start) / max(time.perf_counter() - begin, 1e-9)
+
+    max_workers = os.cpu_count() or 1
+    candidates = [0] + [2**i for i in range(max_workers.bit_length())]
+    if candidates[-1] != max_workers:
+        candidates.append(max_workers)
+
+    best_workers, best_throughput, best_cost = 0, 0.0, 0.0
+    start = 0
+    with _WorkerPoolRegistry.lock:
+        prev_pools = set(_WorkerPoolRegistry.pools)
+    with reuse_worker_pools():
+        for num_workers in candidates:
+            if num_workers > 0:
+                # spawn the workers before measuring
+                _grab(num_workers, 1, start, num_workers)
+            count = max(samples_per_step, 4 * num_workers)
+            throughput = _grab(num_workers, 2, start, count)
+            start += count
+            logger.debug(
+                f"Grabber calibration: {num_workers} workers, "
+                f"{throughput:.1f} samples/s."
+            )
+
+            if throughput < 1.1 * best_throughput:
+                break
+            best_workers, best_throughput = num_workers, throughput
+            best_cost = max(num_workers, 1) / throughput
+
+        # only the pool of the chosen worker count is kept for the actual grabbing
+        best_key = _WorkerPoolRegistry.pool_key(best_workers, grabber.allow_nested_mp)
+        with _WorkerPoolRegistry.lock:
+            _WorkerPoolRegistry.discard_unused(
+                [
+                    key
+                    for key in _WorkerPoolRegistry.pools
+                    if key not in prev_pools and key != best_key
+                ]
+            )
+
+    # each task should last about `target_time`, but every worker gets some tasks
+    best_prefetch = max(
+        1,
+        min(
+            int(_AdaptivePrefetch.target_time / best_cost),
+            total // (4 * max(best_workers, 1)),
+            _AdaptivePrefetch.max_chunksize,
+        ),
+    )
+    logger.info(
+        f"Grabber calibration: {best_workers} workers, prefetch {best_prefetch} "
+        f"({best_throughput:.1f} samples/s)."
+    )
+    _store_calibration(key, best_workers, best_prefetch)
+    return grabber.copy(update={"num_workers": best_workers, "prefetch": best_prefetch})
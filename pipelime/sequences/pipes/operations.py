@@ -436,10 +436,21 @@ class CachedSequence(PipedSequenceBase, title="cache"):
 class EnableItemDataCache(PipedSequenceBase, title="data_cache"):
     """Enables item data caching on previous pipeline steps."""
 
+    # the data cache mode is a global setting
+    thread_safe: t.ClassVar[bool] = False
+
     items: t.Union[ItemType, t.Sequence[ItemType]] = pyd.Field(
         default_factory=list,
         description="One or more item classes where data cache should be enabled.",
     )
+    max_bytes: t.Optional[pyd.ByteSize] = pyd.Field(
+        None,
+        description=(
+            "The byte budget of the process-wide item data cache, eg, `512MB` or "
+            "`2GiB`. The least recently used data is dropped when exceeded. "
+            "If None, the current budget is kept."
+        ),
+    )
 
     _item_cls: list = pyd.PrivateAttr()
 
@@ -455,7 +466,7 @@ class EnableItemDataCache(PipedSequenceBase, title="data_cache"):
     def get_sample(self, idx: int) -> pls.Sample:
         from pipelime.items import data_cache
 
-        with data_cache(*self._item_cls):  # type: ignore
+        with data_cache(*self._item_cls, max_bytes=self.max_bytes):  # type: ignore
             return super().get_sample(idx)
 
 
@@ -463,6 +474,9 @@ class EnableItemDataCache(PipedSequenceBase, title="data_cache"):
 class DisableItemDataCache(PipedSequenceBase, title="no_data_cache"):
     """Disables item data caching on previous pipeline steps."""
 
+    # the data cache mode is a global setting
+    thread_safe: t.ClassVar[bool] = False
+
     items: t.Union[ItemType, t.Sequence[ItemType]] = pyd.Field(
         default_factory=list,
         description="One or more item classes where data cache should be disabled.",
@@ -1,14 +1,20 @@
+import os
 import re
+import threading
 import typing as t
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 
 import pydantic.v1 as pyd
-from filelock import FileLock, Timeout
+from loguru import logger
 
 import pipelime.sequences as pls
 from pipelime.items import Item, SerializationMode
 from pipelime.sequences.pipes import PipedSequenceBase
 
+# the name of a data file, ie, `<index>_<key>.<extension>`
+_DATA_FILE_RX = re.compile(r"^(\d+)_(.+)\.[a-zA-Z]+$")
+
 
 class _serialization_mode_override:
     """Changes the serialization mode of a specific item."""
@@ -27,6 +33,210 @@ class _serialization_mode_override:
             self._item.serialization_mode = self._prev_mode
 
 
+def _fsync_paths(paths: t.Sequence[Path]):
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            # eg, the item has not been serialized or directories on Windows
+            continue
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class _WriteBehindPool:
+    """A per-process pool of threads serializing the items in background. The number
+    of pending jobs is bounded, so that the samples waiting to be written do not pile
+    up in memory. Failures are reported by `drain` in submission order.
+    """
+
+    FSYNC_BATCH_SIZE: t.ClassVar[int] = 256
+    JOBS_PER_THREAD: t.ClassVar[int] = 4
+
+    _instance: t.ClassVar[t.Optional["_WriteBehindPool"]] = None
+    _instance_lock: t.ClassVar[threading.Lock] = threading.Lock()
+
+    def __init__(self, num_threads: int):
+        self.num_threads = num_threads
+        self._executor = ThreadPoolExecutor(
+            num_threads, thread_name_prefix="pipelime-write-behind"
+        )
+        self._slots = threading.BoundedSemaphore(num_threads * self.JOBS_PER_THREAD)
+        self._lock = threading.Lock()
+        self._pending: t.List[t.Tuple[Future, str]] = []
+
+    @classmethod
+    def get(cls, num_threads: int) -> "_WriteBehindPool":
+        with cls._instance_lock:
+            # NB: a live pool is never replaced, since its pending jobs must be
+            # drained by the grabber, so any later request uses the same threads
+            if cls._instance is None:
+                cls._instance = _WriteBehindPool(num_threads)
+            return cls._instance
+
+    @classmethod
+    def drain_all(cls, fsync: bool = True):
+        with cls._instance_lock:
+            pool = cls._instance
+        if pool is not None:
+            pool.drain(fsync)
+
+    def submit(self, description: str, fn: t.Callable[[], t.Sequence[Path]]):
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(fn)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        with self._lock:
+            self._pending.append((future, description))
+
+    def drain(self, fsync: bool = True):
+        """Waits for the pending jobs, then flushes the written files to disk in
+        batches. If any job failed, the error of the first one submitted is raised.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+
+        written, error = [], None
+        for future, description in pending:
+            exc = future.exception()
+            if exc is None:
+                written.extend(future.result())
+            elif error is None:
+                error = RuntimeError(f"Cannot write {description}: {exc}")
+                error.__cause__ = exc
+            else:
+                logger.error(f"Cannot write {description}: {exc}")
+
+        if fsync and written:
+            folders = list({p.parent for p in written})
+            batches = [
+                written[i : i + self.FSYNC_BATCH_SIZE]
+                for i in range(0, len(written), self.FSYNC_BATCH_SIZE)
+            ]
+            for _ in self._executor.map(_fsync_paths, batches + [folders]):
+                pass
+
+        if error is not None:
+            raise error
+
+
+def drain_pending_writes(fsync: bool = True):
+    """Waits for the items being written in background by any `UnderfolderWriter`
+    of this process, then flushes the written files to disk. If some items could not
+    be written, the error of the first one is raised. The grabber calls this function
+    on the main process and on each worker when the grabbing is over.
+    """
+    _WriteBehindPool.drain_all(fsync)
+
+
+class _CompletionJournal:
+    """An append-only log of the samples completely written to an underfolder, stored
+    in `<folder>/.pipelime/journal`. Each line holds the index of a sample followed by
+    the name, size and modification time of its data files, so that a resumed writer
+    can skip the samples whose files are unchanged. Each line is appended with a single
+    write to a file opened in append mode, so the journal can be shared by many
+    processes, while a truncated last line, eg, after a crash, is just ignored.
+    NB: the file descriptor is not pickled, so each process opens its own.
+    """
+
+    FILE_NAME: t.ClassVar[str] = "journal"
+
+    def __init__(self, root_folder: Path, data_folder: Path):
+        from pipelime.sequences.sources.readers import UnderfolderManifest
+
+        self._init_fd()
+        self.path = root_folder / UnderfolderManifest.FOLDER_NAME / self.FILE_NAME
+        self.data_folder = data_folder
+
+    def _init_fd(self):
+        self._fd: t.Optional[int] = None
+        self._lock = threading.Lock()
+
+    def recover(self) -> t.Dict[int, t.List[str]]:
+        """Reads the journal and verifies the recorded files. A truncated last line
+        is terminated, so that the new entries are appended on their own lines.
+
+        Returns:
+            t.Dict[int, t.List[str]]: the data file names of the samples whose files
+                still have the recorded size and modification time.
+        """
+        try:
+            data = self.path.read_bytes()
+            if data and not data.endswith(b"\n"):
+                with self.path.open("ab") as fp:
+                    fp.write(b"\n")
+        except OSError:
+            return {}
+        lines = data.split(b"\n")[:-1]
+
+        # the last entry of a sample wins, since it may have been written again
+        entries: t.Dict[int, t.List[str]] = {}
+        for line in lines:
+            fields = line.decode("utf-8", errors="replace").split("\t")
+            if len(fields) % 3 != 1:
+                continue
+            try:
+                entries[int(fields[0])] = fields[1:]
+            except ValueError:
+                continue
+
+        completed = {}
+        for idx, fields in entries.items():
+            names = fields[::3]
+            try:
+                stats = [os.stat(self.data_folder / n) for n in names]
+                if all(
+                    st.st_size == int(size) and st.st_mtime_ns == int(mtime)
+                    for st, size, mtime in zip(stats, fields[1::3], fields[2::3])
+                ):
+                    completed[idx] = names
+            except (OSError, ValueError):
+                continue
+        return completed
+
+    def append(self, idx: int, paths: t.Sequence[Path]):
+        """Records the data files of a sample. Call this method when all its files
+        have been written.
+        """
+        fields = [str(idx)]
+        for p in paths:
+            if "\t" in p.name or "\n" in p.name:  # pragma: no cover
+                # the sample will be written again when resuming
+                return
+            st = os.stat(p)
+            fields += [p.name, str(st.st_size), str(st.st_mtime_ns)]
+        line = ("\t".join(fields) + "\n").encode("utf-8")
+
+        with self._lock:
+            if self._fd is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._fd = os.open(
+                    self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666
+                )
+            os.write(self._fd, line)
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def __del__(self):
+        self.close()
+
+    def __getstate__(self):
+        return {"path": self.path, "data_folder": self.data_folder}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_fd()
+
+
 @pls.piped_sequence
 class UnderfolderWriter(
     PipedSequenceBase, title="to_underfolder", underscore_attrs_are_private=True
@@ -43,78 +253,252 @@ class UnderfolderWriter(
     exists_ok: bool = pyd.Field(
         False, description="If False raises an error when `folder` exists."
     )
+    manifest: bool = pyd.Field(
+        False,
+        description=(
+            "If True, the dataset keeps an index of its data files in "
+            "`.pipelime/manifest`, which is built by the first reader after "
+            "writing and loaded by the next ones instead of scanning the data folder."
+        ),
+    )
+    write_behind: pyd.NonNegativeInt = pyd.Field(
+        0,
+        description=(
+            "If positive, the items are serialized in background by this number of "
+            "threads per process, so that encoding and writing overlap with reading "
+            "the next samples. The pending writes are flushed to disk and any error "
+            "is raised when the grabbing is over or "
+            "when calling `drain_pending_writes`."
+        ),
+    )
+    resume: bool = pyd.Field(
+        False,
+        description=(
+            "If True, the completed samples are logged in `.pipelime/journal`, so "
+            "that a later run with `resume=True` skips the samples whose files have "
+            "not changed since, without reading them from the source. "
+            "NB: `exists_ok` is implied."
+        ),
+    )
 
     _data_folder: Path
     _effective_zfill: int
-    _temp_folder: Path
+    _existing_items: t.Dict[t.Tuple[int, str], t.List[str]]
+    _shared_keys: t.Set[str]
+    _journal: t.Optional[_CompletionJournal]
+    _completed: t.Dict[int, t.List[str]]
+    _completed_shared: t.Dict[str, str]
 
-    @pyd.validator("exists_ok", always=True)
+    @pyd.validator("resume", always=True)
     def _check_folder_exists(cls, v: bool, values: t.Mapping[str, t.Any]) -> bool:
-        if not v and "folder" in values and values["folder"].exists():
+        if (
+            not v
+            and not values.get("exists_ok", True)
+            and "folder" in values
+            and values["folder"].exists()
+        ):
             raise ValueError(
                 f"Trying to overwrite an existing dataset: `{values['folder']}`. "
-                "Please use `exists_ok=True` to overwrite."
+                "Please use `exists_ok=True` to overwrite or `resume=True` to "
+                "complete it."
             )
         return v
 
     def __init__(self, folder: Path, **data):
-        from pipelime.choixe.utils.io import PipelimeTmp
+        from pipelime.sequences.sources.readers import UnderfolderManifest
 
         super().__init__(folder=folder, **data)  # type: ignore
 
-        self._data_folder = self.folder / "data"
+        # the folder is resolved once, so that the items read back can trust the paths
+        root_folder = self.folder.resolve()
+        self._data_folder = root_folder / "data"
         self._effective_zfill = (
             self.source.best_zfill() if self.zfill is None else self.zfill
         )
         if self.key_serialization_mode is None:
             self.key_serialization_mode = {}
+        if self.resume:
+            # the files of the samples to write again must be replaced
+            self.exists_ok = True
 
         self._data_folder.mkdir(parents=True, exist_ok=True)
+        self._existing_items = self._index_existing_items() if self.exists_ok else {}
+        if self.manifest:
+            # NB: samples are written by many workers with no final step, so the
+            # manifest is marked as stale and the first reader will update it
+            UnderfolderManifest.invalidate(self.folder)
 
-        # will be automatically deleted
-        self._temp_folder = PipelimeTmp.make_subdir()
+        # the shared items already written by this process
+        self._shared_keys = set()
+
+        # NB: the completed samples are verified once and sent to the worker
+        # processes along with the writer
+        journal = _CompletionJournal(root_folder, self._data_folder)
+        if self.resume:
+            self._journal, self._completed = journal, journal.recover()
+        else:
+            # the samples are going to be overwritten
+            journal.path.unlink(missing_ok=True)
+            self._journal, self._completed = None, {}
+        self._completed_shared = (
+            self._index_shared_items(root_folder) if self._completed else {}
+        )
+
+    def is_completed(self, idx: int) -> bool:
+        """Returns True if the `idx`-th sample has been written by a previous run
+        and it will be skipped.
+        """
+        return idx in self._completed
 
     def get_sample(self, idx: int) -> pls.Sample:
-        sample = self.source[idx]
+        if self.is_completed(idx):
+            return self._read_completed(idx)
+        return self.write_sample(idx, self.source[idx])
+
+    def write_sample(self, idx: int, sample: pls.Sample) -> pls.Sample:
+        """Writes a sample as the `idx`-th of the output dataset.
+        NB: `get_sample` writes the samples taken from the source, while this method
+        lets a staged grabber write a sample created elsewhere.
+        """
+        if self.is_completed(idx):
+            return self._read_completed(idx)
 
         id_str_nofill = str(idx)
         id_str = id_str_nofill.zfill(self._effective_zfill)
 
+        items = []
         for k, v in sample.items():
-            with _serialization_mode_override(
-                v, self.key_serialization_mode.get(k)  # type: ignore
-            ):
-                if v.is_shared:
-                    filepath = self.folder / k
-                    if not any(f.exists() for f in v.get_all_names(filepath)):
-                        lock = FileLock(str(Path(self._temp_folder / (k + ".~lock"))))
-                        try:
-                            with lock.acquire(timeout=1):
-                                # check again to avoid races
-                                if not any(  # pragma: no branch
-                                    f.exists() for f in v.get_all_names(filepath)
-                                ):
-                                    v.serialize(filepath)
-                        except Timeout:  # pragma: no cover
-                            pass
-                else:
-                    # when overwriting, check for existing items with the same name
-                    if self.exists_ok:
-                        if self._check_existing_items(v, id_str_nofill, k):
-                            continue
-                    v.serialize(self._data_folder / f"{id_str}_{k}")
+            if v.is_shared:
+                if k not in self._shared_keys:
+                    self._write_shared_item(v, k)
+            else:
+                items.append((k, v))
+
+        if self.write_behind > 0:
+            _WriteBehindPool.get(self.write_behind).submit(
+                f"sample {idx}",
+                lambda: self._write_sample_items(items, idx, id_str, id_str_nofill),
+            )
+        else:
+            self._write_sample_items(items, idx, id_str, id_str_nofill)
 
         return sample
 
-    def _check_existing_items(self, item: Item, id_nofill: str, key: str):
+    def _read_completed(self, idx: int) -> pls.Sample:
+        """Returns a sample lazily loading the files written by a previous run,
+        including the shared items, as a newly written sample would.
+        """
+        sample = {
+            key: Item.get_trusted_instance(path, shared_item=True)
+            for key, path in self._completed_shared.items()
+        }
+        data_path = str(self._data_folder)
+        for name in self._completed[idx]:
+            match = _DATA_FILE_RX.fullmatch(name)
+            if match is not None:
+                sample[match[2]] = Item.get_trusted_instance(
+                    os.path.join(data_path, name), shared_item=False
+                )
+        return pls.Sample(sample)
+
+    @staticmethod
+    def _index_shared_items(root_folder: Path) -> t.Dict[str, str]:
+        """Maps the keys of the shared items already in the root folder to their
+        paths. Hidden files, eg, temporary files, are skipped.
+        """
+        shared = {}
+        with os.scandir(str(root_folder)) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.startswith("."):
+                    key = entry.name.partition(".")[0]
+                    if key:
+                        shared[key] = entry.path
+        return shared
+
+    def _write_sample_items(
+        self,
+        items: t.Sequence[t.Tuple[str, Item]],
+        idx: int,
+        id_str: str,
+        id_nofill: str,
+    ) -> t.List[Path]:
+        paths = [self._write_item(v, k, id_str, id_nofill) for k, v in items]
+
+        # the sample is logged only when all its files are complete
+        if self._journal is not None:
+            self._journal.append(idx, paths)
+        return paths
+
+    def _write_shared_item(self, item: Item, key: str):
+        with _serialization_mode_override(
+            item, self.key_serialization_mode.get(key)  # type: ignore
+        ):
+            filepath = self.folder / key
+            if not any(f.exists() for f in item.get_all_names(filepath)):
+                # concurrent writers may both get here, but the file is renamed
+                # when complete, so no one sees partial data
+                item.serialize_atomic(filepath)
+        self._shared_keys.add(key)
+
+    def _write_item(self, item: Item, key: str, id_str: str, id_nofill: str) -> Path:
+        with _serialization_mode_override(
+            item, self.key_serialization_mode.get(key)  # type: ignore
+        ):
+            # when overwriting, check for existing items with the same name
+            if self.exists_ok:
+                name = self._check_existing_items(item, id_nofill, key)
+                if name is not None:
+                    return self._data_folder / name
+            filepath = self._data_folder / f"{id_str}_{key}"
+            item.serialize(filepath)
+            filepath = item.as_default_name(filepath)
+            if self.exists_ok:
+                self._existing_items[(int(id_nofill), key)] = [filepath.name]
+            return filepath
+
+    def _index_existing_items(self) -> t.Dict[t.Tuple[int, str], t.List[str]]:
+        """Maps the sample index and key of the files already in the data folder to
+        their names, so that each item is checked in constant time when overwriting.
+        NB: the index is built once and sent to the worker processes along with the
+        writer, then each process updates its own copy as it writes.
+        """
+        from pipelime.sequences.sources.readers import UnderfolderManifest
+
+        manifest = (
+            UnderfolderManifest.load(self.folder, self._data_folder)
+            if self.manifest
+            else None
+        )
+        names = (
+            manifest[2]
+            if manifest is not None
+            else UnderfolderManifest.scan(self._data_folder)[2]
+        )
+
+        index: t.Dict[t.Tuple[int, str], t.List[str]] = {}
+        for name in names:
+            match = _DATA_FILE_RX.fullmatch(name)
+            if match is not None:
+                index.setdefault((int(match[1]), match[2]), []).append(name)
+        return index
+
+    def _check_existing_items(
+        self, item: Item, id_nofill: str, key: str
+    ) -> t.Optional[str]:
+        """Removes the existing files of an item, but the one the item is read from,
+        if any, whose name is returned, so that the item is not serialized again.
+        """
+        names = self._existing_items.pop((int(id_nofill), key), None)
+        if not names:
+            return None
+
         local_srcs = item.local_sources
-        skip_serialization = False
-        x = re.compile(r"^(0)*{}_{}\.[a-zA-Z]+$".format(id_nofill, key))
-        for p in self._data_folder.glob(f"*{id_nofill}_{key}.*"):
-            if x.fullmatch(p.name):
-                p = p.resolve().absolute()
-                if p in local_srcs:
-                    skip_serialization = True
-                else:
-                    p.unlink()
-        return skip_serialization
+        source_name = None
+        for name in names:
+            p = self._data_folder / name
+            if p.resolve().absolute() in local_srcs:
+                source_name = name
+                self._existing_items[(int(id_nofill), key)] = [name]
+            else:
+                p.unlink(missing_ok=True)
+        return source_name
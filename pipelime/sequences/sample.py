@@ -101,10 +101,14 @@ class Sample(t.Mapping[str, Item]):
         py_.set_(new_value, path, value)
         return x.set_value(key, new_value)
 
-    def deep_get(self, key_path: str, default: t.Any = None) -> t.Any:
+    def deep_get(
+        self, key_path: str, default: t.Any = None, probe_images: bool = False
+    ) -> t.Any:
         r"""Gets a value from the Sample through a key path similar to `pydash.get`.
         The path is built by splitting the mapping keys by `.` and enclosing list
         indexes within `[]`. Use `\` to escape the `.` character.
+        If `probe_images` is True, image items are replaced by their header properties
+        (cfr. `ImageItem.probe`), eg, `image.width`, so that pixels are not decoded.
 
         Example::
 
@@ -113,26 +117,36 @@ class Sample(t.Mapping[str, Item]):
         """
         import pydash as py_
 
-        return py_.get(self.direct_access(), key_path, default)
+        return py_.get(self.direct_access(probe_images), key_path, default)
 
-    def match(self, query: str) -> bool:
+    def match(self, query: str, probe_images: bool = False) -> bool:
         """Match the Sample against a query
         (cfr. https://github.com/cyberlis/dictquery).
+        If `probe_images` is True, image items are replaced by their header properties
+        (cfr. `ImageItem.probe`), eg, `image.width`, so that pixels are not decoded.
         """
         import dictquery as dq
 
-        return dq.match(self.direct_access(), query)
+        return dq.match(self.direct_access(probe_images), query)
 
-    def direct_access(self) -> t.Mapping[str, t.Any]:
+    def direct_access(self, probe_images: bool = False) -> t.Mapping[str, t.Any]:
         """Returns a mapping of the keys to the item values, ie, you directly get the
-        value of the items without having to `__call__()` them."""
+        value of the items without having to `__call__()` them. If `probe_images` is
+        True, image items are mapped to their header properties as returned by
+        `ImageItem.probe`, ie, `shape`, `dtype`, `format`, `height`, `width` and
+        `channels`."""
+        from pipelime.items import ImageItem
 
         class _DirectAccess(t.Mapping[str, t.Any]):
             def __init__(self, data: t.Mapping[str, Item]):
                 self._data = data
 
             def __getitem__(self, key: str) -> t.Any:
-                return self._data[key]()
+                item = self._data[key]
+                if probe_images and isinstance(item, ImageItem):
+                    probe = item.probe()
+                    return None if probe is None else probe.as_dict()
+                return item()
 
             def __iter__(self) -> t.Iterator[str]:
                 return iter(self._data)
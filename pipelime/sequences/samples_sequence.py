@@ -80,8 +80,14 @@ class SamplesSequence(
 
     NB: when defining a pipe, the `source` sample sequence must be bound to a pydantic
     Field with `pipe_source=True`.
+
+    NB: sequences are assumed to be thread-safe, ie, `get_sample` may be called
+    concurrently by many threads. If this is not the case, set the class variable
+    `thread_safe = False`, so that the grabber will always use multiple processes.
     """
 
+    thread_safe: t.ClassVar[bool] = True
+
     _sources: t.ClassVar[t.Dict[str, t.Type[SamplesSequence]]] = {}
     _pipes: t.ClassVar[t.Dict[str, t.Type[SamplesSequence]]] = {}
     _operator_path: t.ClassVar[str] = ""
@@ -165,8 +171,9 @@ class SamplesSequence(
         self,
         *,
         num_workers: int = 0,
-        prefetch: int = 2,
+        prefetch: t.Union[int, t.Literal["auto"]] = 2,
         track_fn: t.Union[bool, str, t.Callable[[t.Iterable], t.Iterable], None] = True,
+        shm_threshold: t.Optional[int] = None,
     ):
         """Goes through all the samples of the sequence, optionally using multiple
         processes and returns a new sequence holding the processed samples.
@@ -175,13 +182,17 @@ class SamplesSequence(
         Args:
             num_workers (int, optional): The number of processes to spawn. If negative,
                 the number of (logical) cpu cores is used  (Default to 0)
-            prefetch (int, optional): The number of samples loaded in advanced
-                by each worker  (Default to 2)
+            prefetch (t.Union[int, t.Literal["auto"]], optional): The number of
+                samples loaded in advanced by each worker, or `auto` to tune it on
+                the time spent on each sample  (Default to 2)
             track_fn (track_fn: t.Union[bool, str, t.Callable[
                 [t.Iterable], t.Iterable], None], optional): if True, a rich trackbar
                 is shown; if a string is passed, it is set as the message for the
                 default rich trackbar; otherwise you should provide your own callable
                 to track the progress, defaults to True  (Default to True)
+            shm_threshold (t.Optional[int], optional): numpy arrays larger than this
+                number of bytes are sent from the worker processes through shared
+                memory instead of being pickled  (Default to None)
         """
         samples: t.List[Sample] = []
 
@@ -196,6 +207,7 @@ class SamplesSequence(
             keep_order=False,
             sample_fn=_store_sample,
             track_fn=track_fn,
+            shm_threshold=shm_threshold,
         )
 
         return SamplesSequence.from_list(samples)
@@ -204,12 +216,13 @@ class SamplesSequence(
         self,
         *,
         num_workers: int = 0,
-        prefetch: int = 2,
+        prefetch: t.Union[int, t.Literal["auto"]] = 2,
         keep_order: bool = False,
         sample_fn: t.Union[
             t.Callable[[Sample], None], t.Callable[[Sample, int], None], None
         ] = None,
         track_fn: t.Union[bool, str, t.Callable[[t.Iterable], t.Iterable], None] = True,
+        shm_threshold: t.Optional[int] = None,
     ):
         """Goes through all the samples of the sequence, optionally using multiple
         processes and applying `sample_fn` to each sample. Also, a `track_fn` can be
@@ -218,8 +231,9 @@ class SamplesSequence(
         Args:
             num_workers (int, optional): The number of processes to spawn. If negative,
                 the number of (logical) cpu cores is used  (Default to 0)
-            prefetch (int, optional): The number of samples loaded in advanced
-                by each worker  (Default to 2)
+            prefetch (t.Union[int, t.Literal["auto"]], optional): The number of
+                samples loaded in advanced by each worker, or `auto` to tune it on
+                the time spent on each sample  (Default to 2)
             keep_order (bool, optional): Whether to retrieve the samples in the original
                 order  (Default to False)
             sample_fn (t.Optional[t.Callable[[Sample], None]], optional): a callable to
@@ -229,9 +243,76 @@ class SamplesSequence(
                 is shown; if a string is passed, it is set as the message for the
                 default trackbar; otherwise you should provide your own callable
                 to track the progress  (Default to True)
+            shm_threshold (t.Optional[int], optional): numpy arrays larger than this
+                number of bytes are sent from the worker processes through shared
+                memory instead of being pickled  (Default to None)
         """
         from pipelime.sequences import Grabber, grab_all
 
+        grabber = Grabber(
+            num_workers=num_workers,
+            prefetch=prefetch,
+            keep_order=keep_order,
+            shm_threshold=shm_threshold,
+        )
+        grab_all(
+            grabber,
+            self,
+            sample_fn=sample_fn,
+            track_fn=self._get_track_fn(track_fn),
+        )  # type: ignore
+
+    def reduce(
+        self,
+        init: t.Callable[[], t.Any],
+        accumulate: t.Callable[[t.Any, Sample], t.Any],
+        merge: t.Callable[[t.Any, t.Any], t.Any],
+        *,
+        num_workers: int = 0,
+        prefetch: t.Union[int, t.Literal["auto"]] = 2,
+        track_fn: t.Union[bool, str, t.Callable[[t.Iterable], t.Iterable], None] = True,
+    ) -> t.Any:
+        """Reduces the sequence to a single value, optionally using multiple processes.
+        Each worker task gets its own accumulator from `init` and updates it through
+        `accumulate`, then the partial results are combined on the main process by
+        `merge`, which should be associative and commutative.
+
+        Args:
+            init (t.Callable[[], t.Any]): a callable returning a new accumulator.
+            accumulate (t.Callable[[t.Any, Sample], t.Any]): a callable updating an
+                accumulator with a sample and returning it.
+            merge (t.Callable[[t.Any, t.Any], t.Any]): a callable merging two
+                accumulators and returning the result.
+            num_workers (int, optional): The number of processes to spawn. If negative,
+                the number of (logical) cpu cores is used  (Default to 0)
+            prefetch (t.Union[int, t.Literal["auto"]], optional): The number of
+                samples loaded in advanced by each worker, or `auto` to tune it on
+                the time spent on each sample  (Default to 2)
+            track_fn (track_fn: t.Union[bool, str, t.Callable[
+                [t.Iterable], t.Iterable], None], optional): if True, a trackbar
+                is shown; if a string is passed, it is set as the message for the
+                default trackbar; otherwise you should provide your own callable
+                to track the progress  (Default to True)
+
+        Returns:
+            t.Any: the final accumulator.
+        """
+        from pipelime.sequences import Grabber, grab_reduce
+
+        grabber = Grabber(num_workers=num_workers, prefetch=prefetch)
+        return grab_reduce(
+            grabber,
+            self,
+            init,
+            accumulate,
+            merge,
+            track_fn=self._get_track_fn(track_fn),
+        )  # type: ignore
+
+    def _get_track_fn(
+        self,
+        track_fn: t.Union[bool, str, t.Callable[[t.Iterable], t.Iterable], None],
+    ) -> t.Optional[t.Callable[[t.Iterable], t.Iterable]]:
         if isinstance(track_fn, (bool, str)):
             if track_fn:
                 from pipelime.piper.progress.tracker.base import TqdmTask
@@ -243,14 +324,9 @@ class SamplesSequence(
                         iterable=x, total=len(self), message=message
                     )
 
-                track_fn = _tqdm_track_fn
-            else:
-                track_fn = None
-
-        grabber = Grabber(
-            num_workers=num_workers, prefetch=prefetch, keep_order=keep_order
-        )
-        grab_all(grabber, self, sample_fn=sample_fn, track_fn=track_fn)  # type: ignore
+                return _tqdm_track_fn
+            return None
+        return track_fn
 
     def to_pipe(
         self, recursive: bool = True, objs_to_str: bool = True
@@ -287,6 +363,8 @@ class SamplesSequence(
                     # NB: do not unfold sub-pydantic models, since it may not be
                     # straightforward to de-serialize them when subclasses are used
                     field_value = field_value.dict()
+            elif isinstance(field_value, (str, bytes)):
+                pass
             elif isinstance(field_value, t.Sequence):
                 field_value = [_maybe_go_deeper(x) for x in field_value]
             elif isinstance(field_value, t.Mapping):
@@ -355,6 +433,7 @@ class SamplesSequence(
         merge_root_items: bool = True,
         must_exist: bool = True,
         watch: bool = False,
+        use_manifest: bool = True,
     ) -> SamplesSequence:
         """A SamplesSequence loading data from an Underfolder dataset.
         Run `pipelime help from_underfolder` to read the complete documentation.
@@ -531,7 +610,9 @@ class SamplesSequence(
 
     @samples_sequence_stub
     def data_cache(
-        self, *items: t.Union[t.Type["pipelime.items.Item"], str]  # type: ignore # noqa: E602,F821
+        self,
+        *items: t.Union[t.Type["pipelime.items.Item"], str],  # type: ignore # noqa: E602,F821
+        max_bytes: t.Union[int, str, None] = None,
     ) -> SamplesSequence:
         """Enables item data caching on previous pipeline steps.
         Run `pipelime help data_cache` to read the complete documentation.
@@ -557,6 +638,9 @@ class SamplesSequence(
             ]
         ] = None,
         exists_ok: bool = False,
+        manifest: bool = False,
+        write_behind: int = 0,
+        resume: bool = False,
     ) -> SamplesSequence:
         """Writes samples to an underfolder dataset while iterating over them.
         Run `pipelime help to_underfolder` to read the complete documentation.
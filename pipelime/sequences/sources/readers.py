@@ -3,11 +3,312 @@ import typing as t
 from pathlib import Path
 
 from loguru import logger
-from pydantic.v1 import Field, PrivateAttr, validator
+from pydantic.v1 import Field, PositiveInt, PrivateAttr, validator
 
 from pipelime.sequences import Sample, SamplesSequence, source_sequence
 
 
+class UnderfolderManifest:
+    """An on-disk index of the files in the data folder of an Underfolder dataset,
+    stored in `<folder>/.pipelime/manifest`, so that readers do not have to scan
+    the data folder. The manifest is valid as long as the modification time of the
+    data folder is unchanged and it has been written at least `SETTLE_TIME_NS`
+    after the last change, since file systems may update the modification time with
+    a coarse resolution.
+    NB: the data folder is never listed to validate the manifest, so changes are
+    detected only through its modification time. The number of names stored in the
+    header just guards against a truncated manifest file.
+    """
+
+    FOLDER_NAME: t.ClassVar[str] = ".pipelime"
+    FILE_NAME: t.ClassVar[str] = "manifest"
+    VERSION: t.ClassVar[int] = 1
+    SETTLE_TIME_NS: t.ClassVar[int] = 2_000_000_000
+
+    @classmethod
+    def path(cls, root_folder: Path) -> Path:
+        return root_folder / cls.FOLDER_NAME / cls.FILE_NAME
+
+    @staticmethod
+    def scan(data_folder: Path) -> t.Tuple[int, int, t.List[str]]:
+        """Lists the files in the data folder.
+
+        Returns:
+            t.Tuple[int, int, t.List[str]]: the modification time of the folder, the
+                time the scan started and the file names, all times in nanoseconds.
+        """
+        import time
+
+        # NB: both times are taken before the scan, so that any change during
+        # the scan makes the result stale
+        scan_time = time.time_ns()
+        mtime = os.stat(data_folder).st_mtime_ns
+        with os.scandir(str(data_folder)) as it:
+            names = [entry.name for entry in it if entry.is_file()]
+        return mtime, scan_time, names
+
+    @classmethod
+    def is_valid(cls, data_folder: Path, mtime: int, scan_time: int) -> bool:
+        """Checks whether a scan made at `scan_time` is still up to date."""
+        try:
+            current = os.stat(data_folder).st_mtime_ns
+        except OSError:
+            return False
+        return current == mtime and scan_time - mtime >= cls.SETTLE_TIME_NS
+
+    @classmethod
+    def load(
+        cls, root_folder: Path, data_folder: Path
+    ) -> t.Optional[t.Tuple[int, int, t.List[str]]]:
+        """Loads the manifest if it exists, it is complete, ie, it has as many names
+        as recorded in its header, and the data folder has not changed since.
+
+        Returns:
+            t.Optional[t.Tuple[int, int, t.List[str]]]: the same values returned by
+                `scan`, or None.
+        """
+        import mmap
+
+        try:
+            with (
+                cls.path(root_folder).open("rb") as fp,
+                mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+            ):
+                header_end = mm.find(b"\n")
+                version, mtime, scan_time, count = (
+                    int(v) for v in mm[:header_end].split()
+                )
+                if version != cls.VERSION or not cls.is_valid(
+                    data_folder, mtime, scan_time
+                ):
+                    return None
+                names = mm[header_end + 1 :].decode("utf-8").split("\n")[:-1]
+        except (OSError, ValueError):
+            return None
+        return (mtime, scan_time, names) if len(names) == count else None
+
+    @classmethod
+    def store(cls, root_folder: Path, mtime: int, scan_time: int, names: t.List[str]):
+        """Writes the manifest, replacing the old one, if any."""
+        if any("\n" in n for n in names):  # pragma: no cover
+            return
+
+        path = cls.path(root_folder)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with tmp_path.open("w", encoding="utf-8", newline="\n") as fp:
+            fp.write(f"{cls.VERSION} {mtime} {scan_time} {len(names)}\n")
+            fp.writelines(n + "\n" for n in names)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def invalidate(cls, root_folder: Path):
+        """Writes an empty stale manifest, to be refreshed by the first reader."""
+        cls.store(root_folder, 0, 0, [])
+
+
+class _DirectoryWatcher:
+    """Collects the names of the files changed in a directory through inotify.
+    On other platforms, or if inotify cannot be used, it is never started.
+    NB: the watch is not pickled, so it has to be restarted in the worker processes.
+    """
+
+    # IN_MODIFY is not watched, since a file may be written in many chunks
+    _IN_CLOSE_WRITE: t.ClassVar[int] = 0x8
+    _IN_MOVED_FROM: t.ClassVar[int] = 0x40
+    _IN_MOVED_TO: t.ClassVar[int] = 0x80
+    _IN_CREATE: t.ClassVar[int] = 0x100
+    _IN_DELETE: t.ClassVar[int] = 0x200
+    _IN_DELETE_SELF: t.ClassVar[int] = 0x400
+    _IN_MOVE_SELF: t.ClassVar[int] = 0x800
+    _IN_Q_OVERFLOW: t.ClassVar[int] = 0x4000
+    _IN_IGNORED: t.ClassVar[int] = 0x8000
+    _IN_ISDIR: t.ClassVar[int] = 0x40000000
+
+    _libc: t.ClassVar[t.Any] = None
+
+    def __init__(self, path: Path):
+        self._path = path
+        self._fd: t.Optional[int] = None
+
+    @classmethod
+    def _get_libc(cls) -> t.Any:
+        import ctypes
+        import ctypes.util
+        import sys
+
+        if cls._libc is None:
+            cls._libc = False
+            if sys.platform.startswith("linux"):
+                try:
+                    libc = ctypes.CDLL(
+                        ctypes.util.find_library("c") or "libc.so.6", use_errno=True
+                    )
+                    _ = libc.inotify_init1, libc.inotify_add_watch
+                    cls._libc = libc
+                except (OSError, AttributeError):  # pragma: no cover
+                    pass
+        return cls._libc
+
+    def start(self) -> bool:
+        """(Re)starts watching the directory. Returns False if inotify is not
+        available.
+        """
+        self.close()
+
+        libc = self._get_libc()
+        if not libc:
+            return False  # pragma: no cover
+
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:  # pragma: no cover
+            return False
+        mask = (
+            self._IN_CLOSE_WRITE
+            | self._IN_MOVED_FROM
+            | self._IN_MOVED_TO
+            | self._IN_CREATE
+            | self._IN_DELETE
+            | self._IN_DELETE_SELF
+            | self._IN_MOVE_SELF
+        )
+        if libc.inotify_add_watch(fd, os.fsencode(self._path), mask) < 0:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def changes(self) -> t.Optional[t.Set[str]]:
+        """Returns the names of the files changed since the last call or None if
+        the whole directory must be scanned again, eg, when the watch is not active
+        or some events have been lost.
+        """
+        import struct
+
+        if self._fd is None:
+            return None
+
+        names = set()
+        while True:
+            try:
+                buffer = os.read(self._fd, 1 << 16)
+            except BlockingIOError:
+                return names
+            except OSError:  # pragma: no cover
+                self.close()
+                return None
+
+            offset = 0
+            while offset < len(buffer):
+                _, mask, _, length = struct.unpack_from("iIII", buffer, offset)
+                offset += 16
+                name = buffer[offset : offset + length].rstrip(b"\0")
+                offset += length
+
+                if mask & (
+                    self._IN_Q_OVERFLOW
+                    | self._IN_IGNORED
+                    | self._IN_DELETE_SELF
+                    | self._IN_MOVE_SELF
+                ):
+                    self.close()
+                    return None
+                if name and not mask & self._IN_ISDIR:
+                    names.add(os.fsdecode(name))
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __del__(self):
+        self.close()
+
+    def __getstate__(self):
+        return {"_path": self._path, "_fd": None}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+
+class _SampleCache:
+    """Keeps the samples created by a reader according to a cache policy, ie,
+    `none` (no sample is kept), `all` (every sample is kept) or a positive integer `n`
+    (the `n` most recently used samples are kept). The file paths stored by the reader
+    are the ground truth, so cached samples are dropped when pickled.
+    """
+
+    def __init__(self, policy: t.Union[str, int]):
+        from collections import OrderedDict
+
+        self._max_size = (
+            0 if policy == "none" else (None if policy == "all" else int(policy))
+        )
+        self._samples: t.Dict[int, Sample] = (
+            {} if self._max_size is None else OrderedDict()
+        )
+        self._init_lock()
+
+    def _init_lock(self):
+        import threading
+
+        self._lock = threading.Lock()
+
+    def get(self, idx: int) -> t.Optional[Sample]:
+        if self._max_size is None:
+            return self._samples.get(idx)
+        with self._lock:
+            sample = self._samples.get(idx)
+            if sample is not None:
+                self._samples.move_to_end(idx)  # type: ignore
+            return sample
+
+    def put(self, idx: int, sample: Sample):
+        if self._max_size is None:
+            self._samples[idx] = sample
+        elif self._max_size > 0:
+            with self._lock:
+                self._samples[idx] = sample
+                self._samples.move_to_end(idx)  # type: ignore
+                if len(self._samples) > self._max_size:
+                    self._samples.popitem(last=False)  # type: ignore
+
+    def discard(self, idx: int):
+        with self._lock:
+            self._samples.pop(idx, None)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def __getstate__(self):
+        return {"_max_size": self._max_size, "_samples": type(self._samples)()}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_lock()
+
+
+def _parse_sample_cache(v):
+    # `lru(n)` is an alias of `n`
+    if isinstance(v, str):
+        v = v.strip().lower()
+        if v.startswith("lru(") and v.endswith(")"):
+            return v[4:-1]
+    return v
+
+
+_SAMPLE_CACHE_DESCRIPTION = (
+    "The samples kept in memory once created: `none`, `all` or `lru(n)`, ie, the "
+    "`n` most recently used samples, also given as a plain integer. With `none` or "
+    "`lru(n)` the memory used by the sequence is bounded, even if item data caching "
+    "is enabled, at the cost of creating the samples again on each request."
+)
+
+
 @source_sequence
 class UnderfolderReader(SamplesSequence, title="from_underfolder"):
     """A SamplesSequence loading data from an Underfolder dataset."""
@@ -26,14 +327,30 @@ class UnderfolderReader(SamplesSequence, title="from_underfolder"):
     watch: bool = Field(
         False,
         description=(
-            "If True, the dataset is scanned every time a new Sample is requested."
+            "If True, the dataset is kept up to date every time a new Sample is "
+            "requested. On Linux, only the files changed since the last request are "
+            "updated through inotify, otherwise the data folder is scanned again if "
+            "its modification time has changed. NB: a watching reader is not "
+            "thread-safe, so the grabber always uses multiple processes."
         ),
     )
-
-    _samples: t.List[t.Union[Sample, t.Dict[str, str]]] = PrivateAttr(
-        default_factory=list
+    use_manifest: bool = Field(
+        True,
+        description=(
+            "If True, the data file names are loaded from `.pipelime/manifest`, if "
+            "valid, instead of scanning the data folder. When the manifest exists "
+            "but it is stale, it is rebuilt after the scan."
+        ),
+    )
+    sample_cache: t.Union[t.Literal["none", "all"], PositiveInt] = Field(
+        "all", description=_SAMPLE_CACHE_DESCRIPTION
     )
+
+    _sample_files: t.List[t.Dict[str, str]] = PrivateAttr(default_factory=list)
+    _sample_cache: _SampleCache = PrivateAttr(None)
+    _watcher: t.Optional[_DirectoryWatcher] = PrivateAttr(None)
     _root_sample: t.Optional[t.Union[Sample, t.Dict[str, str]]] = PrivateAttr(None)
+    _data_stamp: t.Optional[t.Tuple[int, int]] = PrivateAttr(None)
 
     @validator("must_exist", always=True)
     def check_folder_exists(cls, v, values):
@@ -47,17 +364,27 @@ class UnderfolderReader(SamplesSequence, title="from_underfolder"):
                 raise ValueError(f"Data folder {data_folder} does not exist.")
         return v
 
+    _parse_sample_cache = validator("sample_cache", pre=True, allow_reuse=True)(
+        _parse_sample_cache
+    )
+
     @classmethod
     def data_path(cls, root_folder: Path) -> Path:
         return root_folder / "data"
 
     def __init__(self, folder: Path, **data):
         super().__init__(folder=folder, **data)  # type: ignore
+        self._sample_cache = _SampleCache(self.sample_cache)
 
         if not self.watch:
             self._scan_root_files()
             self._scan_sample_files()
 
+    @property
+    def thread_safe(self) -> bool:  # type: ignore
+        # in watch mode, the file list is updated on each request with no lock
+        return not self.watch
+
     @property
     def data_folder(self) -> Path:
         return self.data_path(self.folder)
@@ -73,7 +400,7 @@ class UnderfolderReader(SamplesSequence, title="from_underfolder"):
         if not isinstance(self._root_sample, Sample):
             self._root_sample = Sample(
                 {
-                    k: Item.get_instance(v, shared_item=True)
+                    k: Item.get_trusted_instance(v, shared_item=True)
                     for k, v in self._root_sample.items()  # type: ignore
                 }
             )
@@ -83,6 +410,8 @@ class UnderfolderReader(SamplesSequence, title="from_underfolder"):
         return name.partition(".")[0]
 
     def _extract_id_key(self, name: str) -> t.Optional[t.Tuple[int, str]]:
+        if name.startswith("."):
+            return None
         id_key_split = name.partition("_")
         if not id_key_split[2]:  # pragma: no cover
             logger.warning(
@@ -100,9 +429,11 @@ class UnderfolderReader(SamplesSequence, title="from_underfolder"):
     def _scan_root_files(self):
         if self.folder.exists():
             root_items: t.Dict[str, str] = {}
-            with os.scandir(str(self.folder)) as it:
+            # the folder is resolved once, so that items can trust the file paths
+            with os.scandir(str(self.folder.resolve().absolute())) as it:
                 for entry in it:
-                    if entry.is_file():
+                    # hidden files, eg, temporary files, are not items
+                    if entry.is_file() and not entry.name.startswith("."):
                         key = self._extract_key(entry.name)
                         if key:
                             root_items[key] = entry.path
@@ -113,46 +444,121 @@ class UnderfolderReader(SamplesSequence, title="from_underfolder"):
             )
             self._root_sample = Sample()
 
+    def _list_sample_files(self, data_folder: Path) -> t.Tuple[int, int, t.List[str]]:
+        if self.use_manifest:
+            manifest = UnderfolderManifest.load(self.folder, data_folder)
+            if manifest is not None:
+                return manifest
+
+        mtime, scan_time, names = UnderfolderManifest.scan(data_folder)
+        if self.use_manifest and UnderfolderManifest.path(self.folder).exists():
+            try:
+                UnderfolderManifest.store(self.folder, mtime, scan_time, names)
+            except OSError as exc:  # pragma: no cover
+                logger.debug(f"{self.__class__}: cannot update the manifest `{exc}`")
+        return mtime, scan_time, names
+
     def _scan_sample_files(self):
         data_folder = self.data_folder
         if data_folder.exists():
+            if self.watch:
+                # start watching before the scan, so that no change is lost
+                if self._watcher is None:
+                    self._watcher = _DirectoryWatcher(data_folder)
+                if not self._watcher.start():
+                    self._watcher = None  # pragma: no cover
+
+            mtime, scan_time, names = self._list_sample_files(data_folder)
+            data_path = str(data_folder.resolve().absolute())
             samples = []
-            with os.scandir(str(data_folder)) as it:
-                for entry in it:
-                    if entry.is_file():
-                        id_key = self._extract_id_key(entry.name)
-                        if id_key:
-                            samples.extend(
-                                ({} for _ in range(id_key[0] - len(samples) + 1))
-                            )
-                            samples[id_key[0]][id_key[1]] = entry.path
-            self._samples = samples
+            for name in names:
+                id_key = self._extract_id_key(name)
+                if id_key:
+                    samples.extend(({} for _ in range(id_key[0] - len(samples) + 1)))
+                    samples[id_key[0]][id_key[1]] = os.path.join(data_path, name)
+            self._sample_files = samples
+            self._sample_cache.clear()
+            self._data_stamp = (mtime, scan_time)
         else:  # pragma: no cover
             logger.warning(
                 f"{self.__class__}: data folder `{data_folder}` does not exist"
             )
-            self._samples = []
+            self._sample_files = []
+            self._sample_cache.clear()
+            self._data_stamp = None
+
+    def _update_sample_files(self, names: t.Iterable[str]):
+        data_path = str(self.data_folder.resolve().absolute())
+        for name in names:
+            id_key = self._extract_id_key(name)
+            if not id_key:
+                continue
+
+            idx, key = id_key
+            path = os.path.join(data_path, name)
+            if os.path.isfile(path):
+                for _ in range(idx - len(self._sample_files) + 1):
+                    self._sample_files.append({})
+                self._sample_files[idx][key] = path
+            elif (
+                idx < len(self._sample_files)
+                and self._sample_files[idx].get(key) == path
+            ):
+                del self._sample_files[idx][key]
+            else:
+                continue
+
+            # the sample is created again on the next request
+            self._sample_cache.discard(idx)
+
+        while self._sample_files and not self._sample_files[-1]:
+            self._sample_files.pop()
+
+    def _refresh_sample_files(self):
+        if self._watcher is not None:
+            changes = self._watcher.changes()
+            if changes is not None:
+                self._update_sample_files(changes)
+                return
+
+        # rescan only if the data folder may have changed
+        if (
+            self._watcher is not None
+            or self._data_stamp is None
+            or not UnderfolderManifest.is_valid(self.data_folder, *self._data_stamp)
+        ):
+            self._scan_sample_files()
 
     def size(self) -> int:
         if self.watch:
-            self._scan_sample_files()
+            self._refresh_sample_files()
 
-        return len(self._samples)
+        return len(self._sample_files)
 
     def get_sample(self, idx: int) -> Sample:
         from pipelime.items import Item
 
         if self.watch:
-            self._scan_sample_files()
+            self._refresh_sample_files()
 
-        sample = self._samples[idx]
-        if not isinstance(sample, Sample):
+        # negative indexes and out-of-range errors are handled by the list
+        sample_files = self._sample_files[idx]
+        idx = idx % len(self._sample_files)
+        sample = self._sample_cache.get(idx)
+        if sample is None:
             sample = Sample(
-                {k: Item.get_instance(v, shared_item=False) for k, v in sample.items()}
+                {
+                    k: Item.get_trusted_instance(v, shared_item=False)
+                    for k, v in sample_files.items()
+                }
             )
-            if self.merge_root_items:
+            if self.merge_root_items and not self.watch:
                 sample = self.root_sample.merge(sample)
-            self._samples[idx] = sample
+            self._sample_cache.put(idx, sample)
+
+        # root items may change as well
+        if self.merge_root_items and self.watch:
+            sample = self.root_sample.merge(sample)
         return sample
 
 
@@ -171,8 +577,12 @@ class SequenceFromImageFolders(SamplesSequence, title="from_images"):
         False, description="If True, read the files in sorted order."
     )
     recursive: bool = Field(True, description="If True, scan the `folder` recursively.")
+    sample_cache: t.Union[t.Literal["none", "all"], PositiveInt] = Field(
+        "all", description=_SAMPLE_CACHE_DESCRIPTION
+    )
 
-    _samples: t.List[t.Union[str, Sample]] = PrivateAttr(default_factory=list)
+    _samples: t.List[str] = PrivateAttr(default_factory=list)
+    _sample_cache: _SampleCache = PrivateAttr(None)
 
     @validator("must_exist", always=True)
     def check_folder_exists(cls, v, values):
@@ -181,13 +591,19 @@ class SequenceFromImageFolders(SamplesSequence, title="from_images"):
             raise ValueError(f"Root folder {p} does not exist.")
         return v
 
+    _parse_sample_cache = validator("sample_cache", pre=True, allow_reuse=True)(
+        _parse_sample_cache
+    )
+
     def __init__(self, folder: Path, **data):
         from pipelime.items import ImageItem, Item
 
         super().__init__(folder=folder, **data)  # type: ignore
         self._samples = []
+        self._sample_cache = _SampleCache(self.sample_cache)
         self._scan_folder(
-            self.folder.as_posix(),
+            # the folder is resolved once, so that items can trust the file paths
+            self.folder.resolve().absolute().as_posix(),
             # grab all the extensions of the ImageItem subclasses
             {
                 ext
@@ -220,11 +636,14 @@ class SequenceFromImageFolders(SamplesSequence, title="from_images"):
     def get_sample(self, idx: int) -> Sample:
         from pipelime.items import Item
 
-        sample = self._samples[idx]
-        if not isinstance(sample, Sample):
-            image_item = Item.get_instance(sample, shared_item=False)  # type: ignore
-            sample = Sample({self.image_key: image_item})
-            self._samples[idx] = sample
+        filepath = self._samples[idx]
+        idx = idx % len(self._samples)
+        sample = self._sample_cache.get(idx)
+        if sample is None:
+            sample = Sample(
+                {self.image_key: Item.get_trusted_instance(filepath, shared_item=False)}
+            )
+            self._sample_cache.put(idx, sample)
         return sample
 
 
@@ -232,6 +651,9 @@ class SequenceFromImageFolders(SamplesSequence, title="from_images"):
 class SamplesFromVideo(SamplesSequence, title="from_video"):
     """Loads samples from frames of a video file."""
 
+    # the video reader is shared
+    thread_safe: t.ClassVar[bool] = False
+
     video: Path = Field(..., description="The video file.")
     must_exist: bool = Field(
         True, description="If True raises an error when `video` does not exist."
@@ -6,6 +6,7 @@ import numpy as np
 import pydantic.v1 as pyd
 from pydantic.v1.color import Color
 
+from pipelime.items import ImageItem, NumpyItem
 from pipelime.stages import SampleStage
 
 if t.TYPE_CHECKING:
@@ -136,8 +137,18 @@ class StageResize(SampleStage, title="resize-images"):
     output_key_format: str = pyd.Field(
         "*", description=("How to format the output keys.")
     )
+    reduced_decoding: bool = pyd.Field(
+        False,
+        description=(
+            "If the images support it, eg, JPEG files, and no mask is present, decode "
+            "them at the smallest resolution larger than the target size, then resize "
+            "just the residual. The output size is the same of a full-resolution "
+            "resize, but the pixel values may slightly differ."
+        ),
+    )
 
     _wrapped: StageAlbumentations = pyd.PrivateAttr()
+    _interp: int = pyd.PrivateAttr()
 
     def __init__(self, **data) -> None:
         import cv2
@@ -154,6 +165,7 @@ class StageResize(SampleStage, title="resize-images"):
             "bicubic": cv2.INTER_CUBIC,
         }
         interp = interp_map[self.interpolation]
+        self._interp = interp
         if self.size[0] == "max":
             resize_tr = A.LongestMaxSize(max_size=self.size[1], interpolation=interp)
         elif self.size[0] == "min":
@@ -174,7 +186,50 @@ class StageResize(SampleStage, title="resize-images"):
         )
 
     def __call__(self, x: "Sample") -> "Sample":
-        return self._wrapped(x)
+        import cv2
+
+        # masks cannot be decoded at a reduced resolution
+        if not self.reduced_decoding or any(k in x for k in self.masks):
+            return self._wrapped(x)
+
+        items = {k: x[k] for k in self.images if k in x}
+        if not items or not all(isinstance(v, ImageItem) for v in items.values()):
+            return self._wrapped(x)
+
+        # the same scale is applied to all the images, so they must have the same size
+        probes = [v.probe() for v in items.values()]  # type: ignore
+        if any(p is None for p in probes) or len(
+            {(p.height, p.width) for p in probes}  # type: ignore
+        ) != 1:
+            return self._wrapped(x)
+        target_h, target_w = self._target_size(
+            probes[0].height, probes[0].width  # type: ignore
+        )
+
+        reduced = {}
+        for key, item in items.items():
+            value = item.read_reduced(target_h, target_w)  # type: ignore
+            if value is None:
+                return self._wrapped(x)
+            reduced[key] = value
+
+        # the residual resize outputs the same size of a full-resolution resize
+        for key, value in reduced.items():
+            resized = cv2.resize(value, (target_w, target_h), interpolation=self._interp)
+            if resized.ndim < value.ndim:
+                resized = resized[..., np.newaxis]
+            x = x.set_value_as(self.output_key_format.replace("*", key), key, resized)
+        return x
+
+    def _target_size(self, height: int, width: int) -> t.Tuple[int, int]:
+        if self.size[0] == "max":
+            scale = self.size[1] / max(height, width)
+        elif self.size[0] == "min":
+            scale = self.size[1] / min(height, width)
+        else:
+            return self.size  # type: ignore
+        # NB: the same rounding of albumentations
+        return max(1, round(height * scale)), max(1, round(width * scale))
 
 
 class StageCropAndPad(SampleStage, title="crop-and-pad-images"):
@@ -235,10 +290,16 @@ class StageCropAndPad(SampleStage, title="crop-and-pad-images"):
 
         for inkey, outkey, pad_col in zip(img_keys, out_keys, colors):
             if inkey in x:
-                image: np.ndarray = x[inkey]()  # type: ignore
+                item = x[inkey]
 
-                from_right = self.width and (self.x + self.width - image.shape[1])
-                from_bottom = self.height and (self.y + self.height - image.shape[0])
+                # when the item can read just a region, avoid decoding the full image
+                shape = item.read_shape() if isinstance(item, NumpyItem) else None
+                if shape is None:
+                    image: np.ndarray = item()  # type: ignore
+                    shape = image.shape
+
+                from_right = self.width and (self.x + self.width - shape[1])
+                from_bottom = self.height and (self.y + self.height - shape[0])
 
                 cv_border = {
                     "constant": cv2.BORDER_CONSTANT,
@@ -252,23 +313,17 @@ class StageCropAndPad(SampleStage, title="crop-and-pad-images"):
                 crop_right = abs(min(0, from_right))
                 crop_bottom = abs(min(0, from_bottom))
 
-                outimg = image[
-                    crop_top : max(0, image.shape[0] - crop_bottom),
-                    crop_left : max(0, image.shape[1] - crop_right),
-                ]
-
-                pad_left = (
-                    abs(min(0, self.x)) if crop_right < image.shape[1] else self.width
-                )
-                pad_top = (
-                    abs(min(0, self.y)) if crop_bottom < image.shape[0] else self.height
-                )
-                pad_right = (
-                    max(0, from_right) if crop_left < image.shape[1] else self.width
-                )
-                pad_bottom = (
-                    max(0, from_bottom) if crop_top < image.shape[0] else self.height
-                )
+                crop_y = (crop_top, max(0, shape[0] - crop_bottom))
+                crop_x = (crop_left, max(0, shape[1] - crop_right))
+                if isinstance(item, NumpyItem):
+                    outimg = item.read_region(*crop_y, *crop_x)
+                else:
+                    outimg = image[slice(*crop_y), slice(*crop_x)]
+
+                pad_left = abs(min(0, self.x)) if crop_right < shape[1] else self.width
+                pad_top = abs(min(0, self.y)) if crop_bottom < shape[0] else self.height
+                pad_right = max(0, from_right) if crop_left < shape[1] else self.width
+                pad_bottom = max(0, from_bottom) if crop_top < shape[0] else self.height
 
                 outimg = cv2.copyMakeBorder(
                     src=outimg.copy(),
@@ -19,7 +19,14 @@ class SampleStage(
     copy_on_model_validation="none",
     allow_population_by_field_name=True,
 ):
-    """Base class for all sample stages."""
+    """Base class for all sample stages.
+
+    NB: stages are assumed to be thread-safe, ie, they may be called concurrently by
+    many threads. If this is not the case, set the class variable `thread_safe = False`,
+    so that the grabber will always use multiple processes.
+    """
+
+    thread_safe: t.ClassVar[bool] = True
 
     @abstractmethod
     def __call__(self, x: "Sample") -> "Sample":
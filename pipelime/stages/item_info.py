@@ -21,28 +21,49 @@ class ItemInfo(pyd.BaseModel):
 
 class StageItemInfo(SampleStage, title="item-info"):
     """Collects item infos from samples.
-    WARNING: this stage CANNOT be combined with MULTIPROCESSING.
+    WARNING: this stage CANNOT be combined with MULTIPROCESSING. To collect the infos
+    in parallel, use `update` and `merge` to reduce the sequence, eg::
+
+        infos = seq.reduce(
+            StageItemInfo, StageItemInfo.update, StageItemInfo.merge, num_workers=4
+        )
     """
 
+    thread_safe: t.ClassVar[bool] = False
+
     _items_info: t.MutableMapping[str, ItemInfo] = pyd.PrivateAttr(default_factory=dict)
 
     @property
     def items_info(self):
         return self._items_info
 
+    def _add_info(self, key: str, item_type: t.Type[Item], is_shared: bool, count: int):
+        if key in self._items_info:
+            if self._items_info[key].item_type != item_type:
+                raise ValueError(
+                    f"Key {key} has multiple types: "
+                    f"{self._items_info[key].item_type} and {item_type}."
+                )
+            if self._items_info[key].is_shared != is_shared:
+                raise ValueError(f"Key {key} is not always shared or not shared.")
+            self._items_info[key].count_ += count
+        else:
+            self._items_info[key] = ItemInfo(
+                item_type=item_type, is_shared=is_shared, count=count
+            )  # type: ignore
+
     def __call__(self, x: "Sample") -> "Sample":
         for k, v in x.items():
-            if k in self._items_info:
-                if self._items_info[k].item_type != v.__class__:
-                    raise ValueError(
-                        f"Key {k} has multiple types: "
-                        f"{self._items_info[k].item_type} and {v.__class__}."
-                    )
-                if self._items_info[k].is_shared != v.is_shared:
-                    raise ValueError(f"Key {k} is not always shared or not shared.")
-                self._items_info[k].count_ += 1
-            else:
-                self._items_info[k] = ItemInfo(
-                    item_type=v.__class__, is_shared=v.is_shared
-                )  # type: ignore
+            self._add_info(k, v.__class__, v.is_shared, 1)
         return x
+
+    def update(self, x: "Sample") -> "StageItemInfo":
+        """Collects the item infos of a sample and returns this stage."""
+        self(x)
+        return self
+
+    def merge(self, other: "StageItemInfo") -> "StageItemInfo":
+        """Adds the infos collected by another stage and returns this stage."""
+        for k, info in other.items_info.items():
+            self._add_info(k, info.item_type, info.is_shared, info.count_)
+        return self
@@ -220,6 +220,30 @@ class TestCliBase:
         # NB: must be set on ItemFactory, not on the Item class
         ItemFactory.ITEM_DATA_CACHE_MODE = default_item_cache
 
+    @pytest.mark.parametrize(
+        ("cache_size", "max_bytes"),
+        [("2MiB", 2 * 2**20), ("1.5kB", 1500), (None, None)],
+    )
+    def test_set_data_cache_size(self, cache_size, max_bytes) -> None:
+        from pipelime.items import ItemDataCache
+
+        args = [
+            "-m",
+            f"{os.path.realpath(__file__)}",
+            "simple-command",
+            "+simple_list",
+            "a",
+            "b",
+        ]
+        if cache_size is not None:
+            args += ["--data-cache-size", cache_size]
+
+        try:
+            self._base_launch(args)
+            assert ItemDataCache.max_bytes == max_bytes
+        finally:
+            ItemDataCache.set_budget(None)
+
     @pytest.mark.parametrize(
         ["cmd_line", "parsed_cfg", "parsed_ctx", "should_fail"],
         [
@@ -11,10 +11,20 @@ class TestFilter(TestGeneralCommandsBase):
         from pipelime.commands import FilterCommand
         from pipelime.sequences import SamplesSequence
 
+        import numpy as np
+
+        expected = [
+            x
+            for x in SamplesSequence.from_underfolder(minimnist_dataset["path"])
+            if x.deep_get("metadata.double") == 6
+        ]
+
         def _check_output(path):
             outseq = SamplesSequence.from_underfolder(path)
-            for x in outseq:
+            assert len(outseq) == len(expected)
+            for x, y in zip(outseq, expected):
                 assert x.deep_get("metadata.double") == 6
+                assert np.array_equal(x["image"](), y["image"]())  # type: ignore
 
         params = {
             "input": minimnist_dataset["path"].as_posix(),
@@ -42,3 +52,27 @@ class TestFilter(TestGeneralCommandsBase):
             del params["filter_fn"]
             with pytest.raises(ValueError):
                 cmd = FilterCommand.parse_obj(params)
+
+    def test_filter_probe_images(self, minimnist_dataset, tmp_path):
+        from pipelime.commands import FilterCommand
+        from pipelime.sequences import SamplesSequence
+
+        inseq = SamplesSequence.from_underfolder(minimnist_dataset["path"])
+        width = inseq[0]["image"]().shape[1]  # type: ignore
+
+        for query, expected in [
+            (f"`image.width` == {width} AND `metadata.double` == 6", 1),
+            (f"`image.width` > {width}", 0),
+        ]:
+            output = tmp_path / f"output_{expected}"
+            cmd = FilterCommand.parse_obj(
+                {
+                    "input": minimnist_dataset["path"].as_posix(),
+                    "output": output.as_posix(),
+                    "filter_query": query,
+                    "probe_images": True,
+                }
+            )
+            cmd()
+            outseq = SamplesSequence.from_underfolder(output)
+            assert len(outseq) == expected
@@ -48,6 +48,7 @@ class TestFilterDuplicates(TestGeneralCommandsBase):
     ):
         from pipelime.commands import FilterDuplicatesCommand
         from pipelime.sequences import SamplesSequence
+        from pipelime.stages import StageSampleHash
 
         params = {
             "input": minimnist_dataset["path"].as_posix(),
@@ -62,6 +63,15 @@ class TestFilterDuplicates(TestGeneralCommandsBase):
         seq = SamplesSequence.from_underfolder(params["output"])
         assert len(seq) == expected_length
 
+        # the first sample of each group of duplicates is kept, in the original order
+        stage = StageSampleHash(algorithm=algorithm, keys=keys, hash_key="hash_")
+        expected_hashes = []
+        for x in SamplesSequence.from_underfolder(params["input"]):
+            h = stage(x)["hash_"]()
+            if h not in expected_hashes:
+                expected_hashes.append(h)
+        assert [stage(x)["hash_"]() for x in seq] == expected_hashes
+
     @pytest.mark.parametrize("keys", ["image"])
     @pytest.mark.parametrize(
         "algorithm,raises",
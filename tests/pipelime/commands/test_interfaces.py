@@ -177,6 +177,30 @@ class TestGrabberInterface(TestInterface):
         with pytest.raises(ValueError):
             plint.GrabberInterface.validate([1, 2, 3])
 
+    @pytest.mark.parametrize("backend", ["process", "thread", "auto"])
+    def test_backend(self, backend: str):
+        grabber = plint.GrabberInterface.validate(f"4,2,false,{backend}")
+        assert grabber.num_workers == 4
+        assert grabber.prefetch == 2
+        assert not grabber.allow_nested_mp
+        assert grabber.backend == backend
+
+        with pytest.raises(ValueError):
+            plint.GrabberInterface.validate("4,2,false,fiber")
+
+    def test_auto_prefetch(self):
+        assert plint.GrabberInterface.validate("4,auto").prefetch == "auto"
+        assert plint.GrabberInterface.validate({"prefetch": "auto"}).prefetch == "auto"
+        with pytest.raises(ValueError):
+            plint.GrabberInterface.validate("4,fast")
+
+    def test_auto_num_workers(self):
+        assert plint.GrabberInterface.validate("auto").num_workers == "auto"
+        assert plint.GrabberInterface.validate("AUTO,4").prefetch == 4
+        assert plint.GrabberInterface.validate({"num_workers": -1}).num_workers == -1
+        with pytest.raises(ValueError):
+            plint.GrabberInterface.validate("many")
+
 
 class TestInputDataset(TestInterface):
     @pytest.mark.parametrize(
@@ -382,6 +406,19 @@ class TestOutputDataset(TestInterface):
         with pytest.raises(ValueError):
             plint.OutputDatasetInterface.validate([1, 2, 3])
 
+    def test_resume(self, tmp_path: Path):
+        from pipelime.sequences.pipes.writers import UnderfolderWriter
+        from pipelime.sequences.sources.toy_dataset import ToyDataset
+
+        with pytest.raises(ValueError, match="resume=True"):
+            plint.OutputDatasetInterface(folder=tmp_path)
+
+        writer = plint.OutputDatasetInterface(
+            folder=tmp_path, resume=True
+        ).append_writer(ToyDataset(10))
+        assert isinstance(writer, UnderfolderWriter)
+        assert writer.resume and writer.exists_ok
+
 
 class TestInterval(TestInterface):
     @pytest.mark.parametrize("start", [None, -11, 0, 7])
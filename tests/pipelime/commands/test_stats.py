@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from .test_general_base import TestGeneralCommandsBase
+
+
+class TestStats(TestGeneralCommandsBase):
+    @pytest.mark.parametrize("nproc", [0, 2])
+    @pytest.mark.parametrize("keys", [None, "image", ["image", "label"]])
+    def test_stats(self, minimnist_dataset, nproc, keys):
+        from pipelime.commands import StatsCommand
+        from pipelime.sequences import SamplesSequence
+
+        params = {
+            "input": minimnist_dataset["path"].as_posix(),
+            "grabber": f"{nproc},3",
+            "keys": keys,
+        }
+        cmd = StatsCommand.parse_obj(params)
+        cmd()
+
+        assert cmd.output_stats is not None
+        stats = cmd.output_stats.stats
+        if keys is None:
+            assert "image" in stats and "label" in stats
+            assert not set(stats) & set(minimnist_dataset["root_keys"])
+        else:
+            assert set(stats) == ({keys} if isinstance(keys, str) else set(keys))
+
+        seq = SamplesSequence.from_underfolder(minimnist_dataset["path"])
+        images = np.stack([x["image"]() for x in seq]).astype(np.float64)
+        assert stats["image"]["samples"] == len(seq)
+        assert stats["image"]["values"] == images.size
+        assert stats["image"]["min"] == images.min()
+        assert stats["image"]["max"] == images.max()
+        assert stats["image"]["mean"] == pytest.approx(images.mean())
+        assert stats["image"]["std"] == pytest.approx(images.std())
+        assert "mean" in repr(cmd.output_stats)
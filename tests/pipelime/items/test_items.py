@@ -271,6 +271,82 @@ class TestItems:
         assert dest_path.stat().st_nlink == 2
         assert source_path.stat().st_nlink == 2
 
+    def test_reflink_and_kernel_copy(self, tmp_path: Path, monkeypatch):
+        import pipelime.items.base as plb
+
+        text = "random data"
+        source_path = tmp_path / "source.unk"
+        source_path.write_text(text)
+        source_path.chmod(0o640)
+
+        def _serialize(name, mode, disabled=()):
+            item = pli.UnknownItem(source_path)
+            item.serialization_mode = mode
+            with pli.item_disabled_serialization_modes(list(disabled)):
+                item.serialize(tmp_path / name)
+            target = tmp_path / name
+            assert target.read_text() == text
+            assert not target.is_symlink()
+            return target.stat()
+
+        # the clone is an independent file, otherwise a hard link is created
+        st = _serialize("reflink.unk", "REFLINK")
+        assert st.st_ino != source_path.stat().st_ino or st.st_nlink == 2
+
+        # a failed clone must not leave any file behind
+        monkeypatch.setattr(plb, "_FICLONE", 0)
+        with pytest.raises(OSError):
+            plb._reflink_file(str(source_path), str(tmp_path / "failed.unk"))
+        assert not (tmp_path / "failed.unk").exists()
+        st = _serialize("nolink.unk", "REFLINK", ["HARD_LINK"])
+        assert st.st_nlink == 1
+        assert (st.st_mode & 0o777) == 0o640
+
+        # in-kernel copies and their fallback to userspace copies
+        assert _serialize("copy.unk", "DEEP_COPY").st_nlink == 1
+        monkeypatch.setattr(plb.os, "copy_file_range", lambda *args: 0, raising=False)
+        assert _serialize("shortcopy.unk", "DEEP_COPY").st_nlink == 1
+        monkeypatch.delattr(plb.os, "copy_file_range", raising=False)
+        st = _serialize("slowcopy.unk", "DEEP_COPY")
+        assert st.st_nlink == 1
+        assert (st.st_mode & 0o777) == 0o640
+
+    def test_reflink_mode_rank(self):
+        from pipelime.items.base import ItemFactory
+
+        smode = pli.SerializationMode
+        with pli.item_serialization_mode(smode.REFLINK, pli.ImageItem):
+            assert ItemFactory.get_serialization_mode(pli.PngImageItem) is smode.REFLINK
+            with pli.item_serialization_mode(smode.DEEP_COPY, pli.NumpyItem):
+                assert (
+                    ItemFactory.get_serialization_mode(pli.PngImageItem)
+                    is smode.DEEP_COPY
+                )
+        with pli.item_serialization_mode(smode.REFLINK):
+            with pli.item_serialization_mode(smode.SYM_LINK, pli.PngImageItem):
+                assert (
+                    ItemFactory.get_serialization_mode(pli.PngImageItem)
+                    is smode.REFLINK
+                )
+
+    def test_serialize_atomic(self, tmp_path: Path):
+        item = pli.NpyNumpyItem(np.arange(6))
+        target = item.serialize_atomic(tmp_path / "value")
+        assert target == tmp_path / "value.npy"
+        assert item.local_sources == [target]
+        assert np.array_equal(np.load(target), np.arange(6))
+
+        # the file is replaced as a whole, leaving no temporary file
+        other = pli.NpyNumpyItem(np.arange(3))
+        assert other.serialize_atomic(target) == target
+        assert np.array_equal(np.load(target), np.arange(3))
+        assert sorted(p.name for p in tmp_path.iterdir()) == [".pipelime", "value.npy"]
+        assert not any((tmp_path / ".pipelime").iterdir())
+
+        assert pli.NpyNumpyItem().serialize_atomic(tmp_path / "empty.npy") is None
+        assert sorted(p.name for p in tmp_path.iterdir()) == [".pipelime", "value.npy"]
+        assert not any((tmp_path / ".pipelime").iterdir())
+
     def test_data_cache(self, items_folder: Path, tmp_path: Path):
         for v in pli.Item.ITEM_DATA_CACHE_MODE.values():
             assert v is None
@@ -318,6 +394,214 @@ class TestItems:
                 _check((None, None, None, None), (False, True, False, True))
                 _check((None, None, None, None), (False, True, False, True))
 
+    def test_data_cache_budget(self, items_folder: Path):
+        from pipelime.items import ItemDataCache
+
+        def _load(n):
+            items = [pli.Item.get_instance(items_folder / "1.npy") for _ in range(n)]
+            for it in items:
+                it.cache_data = True
+                _ = it()
+            return items
+
+        nbytes = _load(1)[0]().nbytes  # type: ignore
+        ItemDataCache.reset_stats()
+        try:
+            with pli.data_cache(max_bytes=2 * nbytes):
+                items = _load(3)
+                stats = ItemDataCache.stats()
+                assert (stats.misses, stats.evictions) == (3, 1)
+                assert (stats.count, stats.nbytes) == (2, 2 * nbytes)
+                assert stats.max_bytes == 2 * nbytes
+
+                # the least recently used data is dropped, then loaded again
+                assert [it._data_cache is None for it in items] == [True, False, False]
+                _ = items[1]()
+                _ = items[0]()
+                assert [it._data_cache is None for it in items] == [False, False, True]
+                stats = ItemDataCache.stats()
+                assert (stats.hits, stats.misses, stats.evictions) == (1, 4, 2)
+
+            # the previous budget is restored and user data is not tracked
+            assert ItemDataCache.max_bytes is None
+            _ = pli.NpyNumpyItem(np.zeros(10))()
+            assert ItemDataCache.stats().count == 2
+
+            # released items do not count
+            del items
+            assert ItemDataCache.stats().count == 0
+            assert ItemDataCache.stats().nbytes == 0
+        finally:
+            ItemDataCache.set_budget(None)
+            ItemDataCache.clear()
+
+    def test_shared_item_cache(self, items_folder: Path, tmp_path: Path):
+        from pipelime.items import SharedItemCache
+
+        def _load(shared):
+            item = pli.Item.get_instance(items_folder / "1.npy", shared_item=shared)
+            item.cache_data = False
+            return item()
+
+        SharedItemCache.folder = tmp_path
+        try:
+            # the first shared item publishes the data, the others map it
+            for _ in range(2):
+                value = _load(True)
+                assert not value.flags.writeable  # type: ignore
+                assert len(list(tmp_path.glob("*.npy"))) == 1
+            assert np.array_equal(value, _load(False))  # type: ignore
+            assert _load(False).flags.writeable  # type: ignore
+
+            # non-array data is just decoded
+            item = pli.Item.get_instance(items_folder / "3.json", shared_item=True)
+            assert isinstance(item(), dict)
+            assert len(list(tmp_path.iterdir())) == 1
+        finally:
+            SharedItemCache.folder = None
+
+    def test_mmap_data(self, items_folder: Path, tmp_path: Path):
+        import io
+
+        npy_path = items_folder / "1.npy"
+        ref = np.load(npy_path)
+
+        def _load():
+            item = pli.Item.get_instance(npy_path)
+            item.cache_data = False
+            return item()
+
+        assert _load().flags.writeable  # type: ignore
+        with pli.mmap_data(pli.NpyNumpyItem):
+            value = _load()
+            assert isinstance(value.base, np.memmap)  # type: ignore
+            assert not value.flags.writeable  # type: ignore
+            assert np.array_equal(value, ref)  # type: ignore
+
+            # fortran-ordered arrays, empty arrays and in-memory streams
+            fortran_path = tmp_path / "fortran.npy"
+            np.save(fortran_path, np.asfortranarray(ref.reshape(2, -1)))
+            value = pli.NpyNumpyItem(fortran_path)()
+            assert isinstance(value.base, np.memmap)  # type: ignore
+            assert np.array_equal(value, ref.reshape(2, -1))  # type: ignore
+
+            empty_path = tmp_path / "empty.npy"
+            np.save(empty_path, np.zeros((0, 3)))
+            assert pli.NpyNumpyItem(empty_path)().shape == (0, 3)  # type: ignore
+
+            with npy_path.open("rb") as fp:
+                value = pli.NpyNumpyItem(io.BytesIO(fp.read()))()
+                assert value.flags.writeable  # type: ignore
+
+            # other items are decoded as usual
+            with pli.mmap_data():
+                assert isinstance(
+                    pli.Item.get_instance(items_folder / "2.txt")(), np.ndarray
+                )
+
+        assert not pli.Item.is_mmap_enabled(pli.NpyNumpyItem)
+
+    @pytest.mark.parametrize("ext", [".png", ".jpg", ".bmp", ".tiff"])
+    @pytest.mark.parametrize(
+        ["shape", "dtype"],
+        [((24, 32, 3), np.uint8), ((24, 32), np.uint8), ((24, 32), np.uint16)],
+    )
+    def test_probe(self, tmp_path: Path, ext, shape, dtype):
+        if dtype == np.uint16 and ext in (".jpg", ".bmp"):
+            pytest.skip("16-bit images not supported")
+
+        filepath = tmp_path / f"image{ext}"
+        item_cls = pli.Item.get_instance(filepath).__class__
+        value = np.random.randint(0, 255, shape).astype(dtype)
+        item_cls(value).serialize(filepath)
+
+        item = item_cls(filepath)
+        probe = item.probe()
+        assert isinstance(probe, pli.ImageProbe)
+        assert probe.shape == shape
+        assert probe.dtype == dtype
+        assert probe.format == ext[1:] if ext != ".jpg" else probe.format == "jpeg"
+        assert probe.channels == (shape[2] if len(shape) > 2 else 1)
+        assert item._data_cache is None
+        assert item.probe() is probe
+
+        decoded = item()
+        assert decoded.shape == probe.shape  # type: ignore
+        assert decoded.dtype == probe.dtype  # type: ignore
+
+        # in-memory data
+        assert item_cls(value).probe() == (shape, np.dtype(dtype), probe.format)
+
+    def test_read_reduced(self, tmp_path: Path):
+        value = np.random.randint(0, 255, (401, 603, 3), dtype=np.uint8)
+        pli.JpegImageItem(value).serialize(tmp_path / "image.jpg")
+        pli.PngImageItem(value).serialize(tmp_path / "image.png")
+
+        item = pli.JpegImageItem(tmp_path / "image.jpg")
+        assert item.read_reduced(401, 603) is None
+        assert item.read_reduced(200, 300).shape == (201, 302, 3)  # type: ignore
+        assert item.read_reduced(100, 10).shape == (101, 151, 3)  # type: ignore
+        assert item.read_reduced(0, 0).shape == (51, 76, 3)  # type: ignore
+        assert item._data_cache is None
+
+        item()
+        assert item.read_reduced(100, 100) is None
+        assert pli.PngImageItem(tmp_path / "image.png").read_reduced(100, 100) is None
+
+    @pytest.mark.parametrize(
+        ["ext", "save_kwargs"],
+        [
+            (".npy", {}),
+            (".tiff", {"tile": (32, 48), "compression": "zlib"}),
+            (".tiff", {"rowsperstrip": 7, "compression": "zlib"}),
+            (".tiff", {"planarconfig": "separate", "rowsperstrip": 10}),
+        ],
+    )
+    @pytest.mark.parametrize("channels", [0, 3])
+    def test_read_region(self, tmp_path: Path, ext, save_kwargs, channels, monkeypatch):
+        shape = (100, 130, channels) if channels else (100, 130)
+        ref = np.random.randint(0, 255, shape, dtype=np.uint8)
+        if save_kwargs.get("planarconfig") == "separate":
+            if channels == 0:
+                pytest.skip("planar config requires more than one sample")
+            ref = np.moveaxis(ref, -1, 0)
+
+        import tifffile
+
+        filepath = tmp_path / f"image{ext}"
+        if ext == ".npy":
+            np.save(filepath, ref)
+        else:
+            tifffile.imwrite(filepath, ref, **save_kwargs)
+
+        item = pli.Item.get_instance(filepath)
+        assert item.read_shape() == ref.shape
+
+        # the partial read must not fall back to a full decode, eg, if the
+        # tifffile api changes, while planar images are fully decoded
+        planar = save_kwargs.get("planarconfig") == "separate"
+        if not planar:
+
+            def _full_decode(cls, fp):
+                raise AssertionError("the whole file has been decoded")
+
+            monkeypatch.setattr(type(item), "decode", classmethod(_full_decode))
+
+        for region in [
+            (5, 60, 10, 100),
+            (0, 100, 0, 130),
+            (99, 200, 129, 300),
+            (50, 10, 0, 5),
+            (-20, -1, 3, -3),
+        ]:
+            expected = ref[region[0] : region[1], region[2] : region[3]]
+            assert np.array_equal(item.read_region(*region), expected)
+
+        # once decoded, the cached data is sliced
+        monkeypatch.undo()
+        item()
+        assert np.array_equal(item.read_region(5, 60, 10, 100), ref[5:60, 10:100])
+
     def test_set_data_twice(self):
         with pytest.raises(ValueError):
             _ = pli.NpyNumpyItem(np.random.rand(3, 4), np.random.rand(3, 4))
@@ -352,6 +636,15 @@ class TestItems:
             assert gt.shape == ref.shape
             assert np.all(gt - ref < 1e-6)  # type: ignore
 
+    def test_trusted_instance(self, items_folder: Path):
+        for fp in items_folder.resolve().iterdir():
+            ref_item = pli.Item.get_instance(fp)
+            trusted_item = pli.Item.get_trusted_instance(str(fp), shared_item=True)
+            assert type(trusted_item) is type(ref_item)
+            assert trusted_item.local_sources == ref_item.local_sources
+            assert trusted_item.is_shared
+            assert not ref_item.is_shared
+
     def test_invalid_ext(self):
         with pytest.raises(ValueError):
             _ = pli.NpyNumpyItem(Path("foo.bar"))
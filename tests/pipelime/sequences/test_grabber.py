@@ -1,4 +1,6 @@
 import multiprocessing.pool as mp_pool
+import os
+import typing as t
 from pathlib import Path
 
 import numpy as np
@@ -7,13 +9,31 @@ import pytest
 import pipelime.items as pli
 import pipelime.sequences as pls
 from pipelime.sequences import Sample
-from pipelime.stages import SampleStage
+from pipelime.sequences.pipes import PipedSequenceBase
+from pipelime.stages import SampleStage, StageLambda
 
 
 def _square(x: int) -> int:
     return x**2
 
 
+def _set_pid(x: Sample) -> Sample:
+    return x.set_item("pid", pli.TxtNumpyItem([os.getpid()]))
+
+
+def _sleep_on_first(x: Sample) -> Sample:
+    import time
+
+    if int(x["label"]()[0]) == 0:  # type: ignore
+        time.sleep(0.5)
+    return x
+
+
+def _set_shared_readonly(x: Sample) -> Sample:
+    readonly = not x["numbers"]().flags.writeable  # type: ignore
+    return x.set_item("readonly", pli.TxtNumpyItem([int(readonly)]))
+
+
 class _MpStage(SampleStage):
     def __call__(self, sample: Sample) -> Sample:
         label = int(sample["label"]()[0])  # type: ignore
@@ -27,6 +47,21 @@ class _MpStage(SampleStage):
         return sample
 
 
+class _NotThreadSafeStage(SampleStage):
+    thread_safe: t.ClassVar[bool] = False
+
+    def __call__(self, sample: Sample) -> Sample:
+        return _set_pid(sample)
+
+
+class _PickleCounterSequence(PipedSequenceBase):
+    pickle_count: t.ClassVar[int] = 0
+
+    def __getstate__(self):
+        _PickleCounterSequence.pickle_count += 1
+        return super().__getstate__()
+
+
 class TestGrabber:
     def _run_grabber(
         self,
@@ -36,6 +71,7 @@ class TestGrabber:
         keep_order: bool,
         prefetch: int,
         sample_fn=None,
+        backend: str = "process",
     ):
         from copy import deepcopy
 
@@ -53,6 +89,7 @@ class TestGrabber:
             keep_order=keep_order,
             prefetch=prefetch,
             allow_nested_mp=False,
+            backend=backend,
         )
 
         itm_sm = pli.item_serialization_mode(
@@ -88,13 +125,16 @@ class TestGrabber:
         return len(proc)
 
     @pytest.mark.parametrize(
-        ["num_workers", "keep_order", "prefetch"],
+        ["num_workers", "keep_order", "prefetch", "backend"],
         [
-            (0, False, 2),
-            (1, False, 2),
-            (4, False, 4),
-            (4, True, 4),
-            (-1, False, 20),
+            (0, False, 2, "process"),
+            (1, False, 2, "process"),
+            (4, False, 4, "process"),
+            (4, True, 4, "process"),
+            (-1, False, 20, "process"),
+            (4, False, 4, "thread"),
+            (4, True, 2, "thread"),
+            (-1, True, 4, "auto"),
         ],
     )
     def test_grabber(
@@ -102,6 +142,7 @@ class TestGrabber:
         num_workers: int,
         keep_order: bool,
         prefetch: int,
+        backend: str,
         minimnist_dataset: dict,
         tmp_path: Path,
     ):
@@ -111,6 +152,7 @@ class TestGrabber:
             num_workers,
             keep_order,
             prefetch,
+            backend=backend,
         )
 
         counter = 0
@@ -126,6 +168,7 @@ class TestGrabber:
             keep_order,
             prefetch,
             _counter_fn,
+            backend=backend,
         )
         assert counter == total_count
 
@@ -142,6 +185,7 @@ class TestGrabber:
             keep_order,
             prefetch,
             _iota_fn,
+            backend=backend,
         )
         assert counter == sum(range(total_count))
 
@@ -171,3 +215,395 @@ class TestGrabber:
             label = int(sample["label"]()[0])  # type: ignore
             results = np.asarray(sample["results"]())
             assert np.array_equal(results, np.array([label**2, label**2]))
+
+    @pytest.mark.parametrize("keep_order", [True, False])
+    def test_grabber_pickles_sequence_once(self, keep_order: bool):
+        source = pls.SamplesSequence.from_list(
+            [Sample({"label": pli.TxtNumpyItem([i])}) for i in range(20)]
+        )
+        seq = _PickleCounterSequence(source=source)  # type: ignore
+        grabber = pls.Grabber(num_workers=2, prefetch=2, keep_order=keep_order)
+
+        _PickleCounterSequence.pickle_count = 0
+        labels = []
+        pls.grab_all(
+            grabber, seq, sample_fn=lambda x: labels.append(int(x["label"]()[0]))
+        )
+
+        assert _PickleCounterSequence.pickle_count == 1
+        assert len(labels) == 20
+        if keep_order:
+            assert labels == list(range(20))
+        else:
+            assert sorted(labels) == list(range(20))
+
+    def test_grabber_reuse_worker_pools(self):
+        from pipelime.sequences.grabber import _WorkerPoolRegistry
+
+        seq = pls.SamplesSequence.from_list([Sample() for _ in range(8)]).map(
+            StageLambda(_set_pid)
+        )
+
+        def _grab_pids():
+            pids = set()
+            pls.grab_all(
+                pls.Grabber(num_workers=2, prefetch=1),
+                seq,
+                sample_fn=lambda x: pids.add(int(x["pid"]()[0])),
+            )
+            return pids
+
+        # new workers are spawned every time
+        first, second = _grab_pids(), _grab_pids()
+        assert first.isdisjoint(second)
+        assert not _WorkerPoolRegistry.pools
+
+        # the same workers are reused
+        with pls.reuse_worker_pools():
+            first, second = _grab_pids(), _grab_pids()
+            assert len(_WorkerPoolRegistry.pools) == 1
+        assert len(first | second) <= 2
+        assert not _WorkerPoolRegistry.pools
+
+    @pytest.mark.parametrize(
+        ["backend", "stage", "same_process"],
+        [
+            ("thread", StageLambda(_set_pid), True),
+            ("auto", StageLambda(_set_pid), True),
+            ("process", StageLambda(_set_pid), False),
+            ("thread", _NotThreadSafeStage(), False),
+            ("auto", _NotThreadSafeStage(), False),
+        ],
+    )
+    def test_grabber_backend(
+        self, backend: str, stage: SampleStage, same_process: bool
+    ):
+        seq = pls.SamplesSequence.from_list(
+            [Sample({"label": pli.TxtNumpyItem([i])}) for i in range(10)]
+        ).map(stage)
+
+        pids, labels = set(), []
+
+        def _sample_fn(x):
+            pids.add(int(x["pid"]()[0]))
+            labels.append(int(x["label"]()[0]))
+
+        pls.grab_all(
+            pls.Grabber(num_workers=2, prefetch=2, keep_order=True, backend=backend),
+            seq,
+            sample_fn=_sample_fn,
+        )
+
+        assert labels == list(range(10))
+        assert (pids == {os.getpid()}) is same_process
+
+    @pytest.mark.skipif(os.name == "nt", reason="Shared memory is not used on Windows")
+    @pytest.mark.parametrize("keep_order", [True, False])
+    def test_grabber_shared_memory(self, keep_order: bool):
+        from pipelime.sequences.grabber import _SharedArrayOwner
+
+        seq = pls.SamplesSequence.from_list(
+            [
+                Sample(
+                    {
+                        "small": pli.NpyNumpyItem(np.full(4, i, dtype=np.uint8)),
+                        "large": pli.NpyNumpyItem(np.full((64, 64), i, dtype=np.int32)),
+                    }
+                )
+                for i in range(10)
+            ]
+        )
+
+        samples = {}
+        pls.grab_all(
+            pls.Grabber(
+                num_workers=2, prefetch=3, keep_order=keep_order, shm_threshold=1024
+            ),
+            seq,
+            sample_fn=lambda x, idx: samples.__setitem__(idx, x),
+        )
+
+        assert sorted(samples) == list(range(10))
+        for idx, sample in samples.items():
+            small, large = sample["small"](), sample["large"]()
+            assert np.array_equal(small, seq[idx]["small"]())  # type: ignore
+            assert np.array_equal(large, seq[idx]["large"]())  # type: ignore
+            assert not isinstance(small.base, _SharedArrayOwner)  # type: ignore
+            assert isinstance(large.base, _SharedArrayOwner)  # type: ignore
+
+    @pytest.mark.parametrize("share_items", [True, False])
+    def test_grabber_share_items(
+        self, minimnist_dataset: dict, share_items: bool, monkeypatch
+    ):
+        from pipelime.items import SharedItemCache
+
+        folders = []
+        make_folder = SharedItemCache.make_folder
+        monkeypatch.setattr(
+            SharedItemCache,
+            "make_folder",
+            staticmethod(lambda: folders.append(make_folder()) or folders[-1]),
+        )
+
+        seq = pls.SamplesSequence.from_underfolder(minimnist_dataset["path"]).map(
+            StageLambda(_set_shared_readonly)
+        )
+        samples = []
+        pls.grab_all(
+            pls.Grabber(num_workers=2, share_items=share_items),
+            seq,
+            sample_fn=samples.append,
+        )
+
+        assert len(samples) == minimnist_dataset["len"]
+        for sample in samples:
+            assert int(sample["readonly"]()[0]) == int(share_items)  # type: ignore
+            assert np.array_equal(sample["numbers"](), seq[0]["numbers"]())
+
+        # the published data is removed at the end
+        assert len(folders) == int(share_items)
+        assert all(not f.exists() for f in folders)
+
+    @pytest.mark.parametrize("backend", ["process", "thread"])
+    @pytest.mark.parametrize("reorder_buffer", [1, 3, 8])
+    def test_grabber_reorder_buffer(self, backend: str, reorder_buffer: int):
+        seq = pls.SamplesSequence.from_list(
+            [Sample({"label": pli.TxtNumpyItem([i])}) for i in range(20)]
+        ).map(StageLambda(_sleep_on_first))
+
+        labels = []
+        pls.grab_all(
+            pls.Grabber(
+                num_workers=3,
+                prefetch=2,
+                keep_order=True,
+                reorder_buffer=reorder_buffer,
+                backend=backend,
+            ),
+            seq,
+            sample_fn=lambda x: labels.append(int(x["label"]()[0])),
+        )
+        assert labels == list(range(20))
+
+    def test_reorder_buffer_backpressure(self):
+        from pipelime.sequences.grabber import _ReorderBuffer
+
+        reorder_buffer = _ReorderBuffer(max_samples=6)
+        tasks = reorder_buffer.throttle(range(i, i + 2) for i in range(0, 10, 2))
+        in_flight = [next(tasks) for _ in range(3)]
+        assert not reorder_buffer._has_room(2)  # the next task would block
+
+        reorder_buffer._blocked = True
+        chunks = {rng.start: [(i, i) for i in rng] for rng in in_flight}
+        delivered = reorder_buffer.reorder(iter([chunks[2], chunks[4], chunks[0]]))
+        assert [i for c in delivered for i, _ in c] == list(range(6))
+        assert reorder_buffer.stalls == 2
+        assert reorder_buffer._has_room(6)
+
+        reorder_buffer._blocked = False
+        assert next(tasks) == range(6, 8)
+        reorder_buffer.stop()
+        assert next(tasks, None) is None
+
+    def test_adaptive_prefetch(self):
+        from pipelime.sequences.grabber import _AdaptivePrefetch
+
+        prefetch = _AdaptivePrefetch(num_workers=2)
+        tasks = prefetch.tasks(10000)
+
+        # pilot window: one sample per worker
+        assert [next(tasks), next(tasks)] == [range(0, 1), range(1, 2)]
+        assert prefetch._in_flight == prefetch._max_in_flight
+
+        # chunks are sized on the measured cost
+        prefetch.update(prefetch.target_time / 10, 1)
+        assert prefetch.chunksize == 10
+        assert next(tasks) == range(2, 12)
+
+        # and follow its drift
+        for _ in range(50):
+            prefetch.update(prefetch.target_time / 2, 1)
+        assert prefetch.chunksize == 2
+
+        prefetch.stop()
+        assert next(tasks, None) is None
+
+    @pytest.mark.parametrize("backend", ["process", "thread"])
+    @pytest.mark.parametrize(
+        ["keep_order", "reorder_buffer"], [(False, None), (True, None), (True, 4)]
+    )
+    def test_grabber_auto_prefetch(
+        self, backend: str, keep_order: bool, reorder_buffer: t.Optional[int]
+    ):
+        seq = pls.SamplesSequence.from_list(
+            [Sample({"label": pli.TxtNumpyItem([i])}) for i in range(50)]
+        )
+
+        labels = []
+        pls.grab_all(
+            pls.Grabber(
+                num_workers=2,
+                prefetch="auto",
+                keep_order=keep_order,
+                reorder_buffer=reorder_buffer,
+                backend=backend,
+            ),
+            seq,
+            sample_fn=lambda x: labels.append(int(x["label"]()[0])),
+        )
+        if keep_order:
+            assert labels == list(range(50))
+        else:
+            assert sorted(labels) == list(range(50))
+
+    def test_split_pipe(self, tmp_path: Path):
+        from pipelime.sequences.grabber import _split_pipe
+
+        source = pls.SamplesSequence.from_list([Sample() for _ in range(4)])
+        seq = source.map(_NotThreadSafeStage()).map(StageLambda(_sleep_on_first))
+        seq = seq.to_underfolder(tmp_path / "output")
+
+        src, stages, writer = _split_pipe(seq)
+        assert src is source
+        assert [type(s.__root__) for s in stages] == [_NotThreadSafeStage, StageLambda]
+        assert writer is seq
+
+        src, stages, writer = _split_pipe(seq.source)
+        assert src is source
+        assert [type(s.__root__) for s in stages] == [_NotThreadSafeStage, StageLambda]
+        assert writer is None
+
+    @pytest.mark.parametrize(
+        ["backend", "transform", "same_process"],
+        [("process", 2, False), ("thread", 2, True), ("process", 0, True)],
+    )
+    @pytest.mark.parametrize("keep_order", [True, False])
+    def test_grabber_staged(
+        self,
+        backend: str,
+        transform: int,
+        same_process: bool,
+        keep_order: bool,
+        minimnist_dataset: dict,
+        tmp_path: Path,
+    ):
+        source = pls.SamplesSequence.from_underfolder(minimnist_dataset["path"])
+        seq = source.map(StageLambda(_sleep_on_first)).map(StageLambda(_set_pid))
+        seq = seq.to_underfolder(tmp_path / "output")
+
+        pids, idxs = set(), []
+
+        def _sample_fn(x, idx):
+            pids.add(int(x["pid"]()[0]))
+            idxs.append(idx)
+
+        pls.grab_all(
+            pls.Grabber(
+                prefetch=2,
+                keep_order=keep_order,
+                backend=backend,
+                staged=pls.StagedWorkers(
+                    read=2, transform=transform, write=2, max_samples=6
+                ),
+            ),
+            seq,
+            sample_fn=_sample_fn,
+        )
+
+        if keep_order:
+            assert idxs == list(range(len(source)))
+        else:
+            assert sorted(idxs) == list(range(len(source)))
+        assert (pids == {os.getpid()}) is same_process
+
+        dest = pls.SamplesSequence.from_underfolder(tmp_path / "output")
+        assert len(dest) == len(source)
+        for src_smpl, dst_smpl in zip(source, dest):
+            assert set(dst_smpl.keys()) == set(src_smpl.keys()) | {"pid"}
+            assert np.array_equal(
+                src_smpl["label"](), dst_smpl["label"]()  # type: ignore
+            )
+
+    def test_grabber_staged_reduce(self):
+        seq = pls.SamplesSequence.from_list(
+            [Sample({"label": pli.TxtNumpyItem([i])}) for i in range(20)]
+        ).map(StageLambda(_set_pid))
+
+        total = pls.grab_reduce(
+            pls.Grabber(staged=pls.StagedWorkers(transform=2, max_samples=4)),
+            seq,
+            lambda: 0,
+            lambda acc, x: acc + int(x["label"]()[0]),
+            lambda a, b: a + b,
+        )
+        assert total == sum(range(20))
+
+    def test_calibrate_grabber(
+        self, minimnist_dataset: dict, tmp_path: Path, monkeypatch
+    ):
+        from pipelime.cli.utils import PipelimeUserAppDir
+
+        monkeypatch.setattr(
+            PipelimeUserAppDir, "base_path", classmethod(lambda cls: tmp_path / "app")
+        )
+
+        seq = (
+            pls.SamplesSequence.from_underfolder(minimnist_dataset["path"])
+            .repeat(4)
+            .to_underfolder(tmp_path / "output")
+        )
+
+        grabber = pls.calibrate_grabber(
+            pls.Grabber(backend="thread"), seq, samples_per_step=8
+        )
+        assert grabber.backend == "thread"
+        assert 0 <= grabber.num_workers <= (os.cpu_count() or 1)
+        assert grabber.prefetch >= 1  # type: ignore
+
+        # the calibration does not write to the output folder
+        assert not any((tmp_path / "output").glob("data/*"))
+
+        # the result is cached
+        assert PipelimeUserAppDir.grabber_calibration_path().is_file()
+        monkeypatch.setattr(pls.grabber, "grab_all", None)
+        cached = pls.calibrate_grabber(
+            pls.Grabber(backend="thread"), seq, samples_per_step=8
+        )
+        assert cached == grabber
+
+        # a sequence too short is not calibrated
+        assert (
+            pls.calibrate_grabber(
+                pls.Grabber(num_workers=4), seq.source[:4], use_cache=False
+            ).num_workers
+            == 0
+        )
+
+    def test_calibrate_grabber_pools(
+        self, minimnist_dataset: dict, tmp_path: Path, monkeypatch
+    ):
+        from pipelime.cli.utils import PipelimeUserAppDir
+        from pipelime.sequences.grabber import _WorkerPoolRegistry
+
+        monkeypatch.setattr(
+            PipelimeUserAppDir, "base_path", classmethod(lambda cls: tmp_path / "app")
+        )
+        monkeypatch.setattr(os, "cpu_count", lambda: 2)
+
+        seq = pls.SamplesSequence.from_underfolder(minimnist_dataset["path"]).repeat(
+            2
+        )
+        with pls.reuse_worker_pools():
+            grabber = pls.calibrate_grabber(
+                pls.Grabber(backend="process"), seq, samples_per_step=8
+            )
+            # only the pool of the chosen worker count is kept alive
+            assert len(_WorkerPoolRegistry.pools) == min(grabber.num_workers, 1)
+        assert not _WorkerPoolRegistry.pools
+
+        # a writer in the middle of the pipe prevents the calibration
+        seq = seq.to_underfolder(tmp_path / "output").map(StageLambda(lambda x: x))
+        assert (
+            pls.calibrate_grabber(pls.Grabber(), seq, use_cache=False).num_workers
+            == 0
+        )
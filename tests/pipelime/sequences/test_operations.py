@@ -342,6 +342,35 @@ class TestSamplesSequenceOperations:
             assert sample["label"]._data_cache is not None
             assert sample["metadata"]._data_cache is None
 
+    def test_item_data_cache_budget(self, minimnist_dataset: dict):
+        from pipelime.items import ItemDataCache
+        from pipelime.stages import StageLambda
+
+        def _load_data(x):
+            _ = x["image"]()
+            return x
+
+        source = (
+            pls.SamplesSequence.from_underfolder(folder=minimnist_dataset["path"])
+            .map(StageLambda(_load_data))
+            .data_cache("ImageItem", max_bytes="10kB")
+        )
+        assert source.max_bytes == 10000  # type: ignore
+
+        ItemDataCache.reset_stats()
+        try:
+            samples = list(source)
+            stats = ItemDataCache.stats()
+            assert stats.misses == len(samples)
+            assert stats.evictions > 0
+            assert 0 < stats.nbytes <= 10000
+            assert sum(s["image"]._data_cache is not None for s in samples) == (
+                stats.count
+            )
+            assert ItemDataCache.max_bytes is None
+        finally:
+            ItemDataCache.clear()
+
     @pytest.mark.parametrize("bsize,should_fail", [(3, False), (5, False), (0, True)])
     @pytest.mark.parametrize("drop_last", [True, False])
     @pytest.mark.parametrize("key_list", [None, ["image", "metadata"]])
@@ -216,6 +216,30 @@ class TestSample:
         sample, data = self._mixed_sample()
         assert sample.match(f"`c.foo` == '{data['c']()['foo']}'")
 
+    def test_probe_images(self, tmp_path):
+        import numpy as np
+
+        import pipelime.items as pli
+
+        pli.PngImageItem(np.zeros((20, 30, 3), dtype=np.uint8)).serialize(
+            tmp_path / "image.png"
+        )
+        sample = pls.Sample(
+            {
+                "image": pli.PngImageItem(tmp_path / "image.png"),
+                "meta": pli.JsonMetadataItem({"width": 10}),
+            }
+        )
+
+        assert sample.deep_get("image.width", probe_images=True) == 30
+        assert sample.deep_get("image.shape[0]", probe_images=True) == 20
+        assert sample.deep_get("meta.width", probe_images=True) == 10
+        assert sample.match(
+            "`image.channels` == 3 AND `image.dtype` == 'uint8'", probe_images=True
+        )
+        assert sample["image"]._data_cache is None
+        assert sample.deep_get("image.shape") == (20, 30, 3)
+
     def test_change_key_invalid(self):
         sample, _ = self._np_sample()
         other_sample = sample.change_key("__", "--", False)
@@ -1,9 +1,16 @@
+import operator
+
 import pytest
 import pipelime.sequences as pls
 from ... import TestUtils, TestAssert
 import tqdm
 
 
+def _append_label(acc: list, x: pls.Sample) -> list:
+    acc.append(int(x["label"]()[0]))  # type: ignore
+    return acc
+
+
 class TestSamplesSequences:
     def test_name(self):
         from pipelime.sequences.pipes import PipedSequenceBase
@@ -74,6 +81,8 @@ class TestSamplesSequences:
                     "merge_root_items": True,
                     "must_exist": False,
                     "watch": False,
+                    "use_manifest": True,
+                    "sample_cache": "all",
                 }
             },
             {"slice": {"start": 10, "stop": None, "step": None}},
@@ -96,6 +105,8 @@ class TestSamplesSequences:
                         "merge_root_items": True,
                         "must_exist": False,
                         "watch": False,
+                        "use_manifest": True,
+                        "sample_cache": "all",
                     }
                 },
                 {"shuffle": {"seed": None}},
@@ -238,6 +249,23 @@ class TestSamplesSequences:
             track_fn=track_fn,
         )
 
+    @pytest.mark.parametrize("num_workers", [0, 2])
+    @pytest.mark.parametrize("prefetch", [3, "auto"])
+    def test_reduce(self, minimnist_dataset: dict, num_workers, prefetch):
+        sseq = pls.SamplesSequence.from_underfolder(folder=minimnist_dataset["path"])
+        labels = sseq.reduce(
+            list,
+            _append_label,
+            operator.add,
+            num_workers=num_workers,
+            prefetch=prefetch,
+            track_fn=False,
+        )
+        assert sorted(labels) == sorted(int(x["label"]()[0]) for x in sseq)
+
+        empty = pls.SamplesSequence.from_list([])
+        assert empty.reduce(list, _append_label, operator.add, track_fn=False) == []
+
     @pytest.mark.skipif(not TestUtils.has_torch(), reason="PyTorch not installed")
     def test_torch_dataset(self, minimnist_dataset: dict):
         from torch.utils.data import Dataset
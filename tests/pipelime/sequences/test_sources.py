@@ -1,4 +1,5 @@
 import contextlib
+import sys
 import typing as t
 from pathlib import Path
 
@@ -22,12 +23,10 @@ class TestSamplesSequencesSources:
         root_sample = sseq.root_sample  # type: ignore
         assert isinstance(root_sample, pls.Sample)
 
-        sample_list = sseq._samples  # type: ignore
-        assert isinstance(sample_list, t.Sequence)
-        assert minimnist_dataset["len"] == len(sample_list)
-        assert isinstance(sample_list[0], pls.Sample)
-
-        for sample, raw_sample in zip(sseq, sample_list):
+        for idx, sample in enumerate(sseq):
+            # samples are cached by default
+            raw_sample = sseq._sample_cache.get(idx)  # type: ignore
+            assert isinstance(raw_sample, pls.Sample)
             for k, v in raw_sample.items():
                 assert sample[k] is v
             for k in minimnist_dataset["root_keys"]:
@@ -42,6 +41,46 @@ class TestSamplesSequencesSources:
                 assert k in sample
                 assert not sample[k].is_shared
 
+    def test_from_underfolder_hidden_files(self, minimnist_private_dataset: dict):
+        folder = Path(minimnist_private_dataset["path"])
+        (folder / ".cfg.1234.tmp.yaml").write_text("a: 1")
+        (folder / "data" / ".000000_image.tmp.png").write_bytes(b"")
+
+        sseq = pls.SamplesSequence.from_underfolder(folder=folder)
+        assert len(sseq) == minimnist_private_dataset["len"]
+        assert set(sseq.root_sample.keys()) == set(  # type: ignore
+            minimnist_private_dataset["root_keys"]
+        )
+        assert set(sseq[0].keys()) == set(
+            minimnist_private_dataset["root_keys"]
+            + minimnist_private_dataset["item_keys"]
+        )
+
+    @pytest.mark.parametrize(
+        ["sample_cache", "expected"], [["none", 0], ["all", 20], ["lru(3)", 3], [5, 5]]
+    )
+    def test_from_underfolder_sample_cache(
+        self, minimnist_dataset: dict, sample_cache, expected: int
+    ):
+        import pickle
+
+        sseq = pls.SamplesSequence.from_underfolder(
+            folder=minimnist_dataset["path"], sample_cache=sample_cache
+        )
+        samples = list(sseq)
+        assert len(sseq._sample_cache) == expected  # type: ignore
+
+        # the most recently used samples are kept
+        for i, sample in reversed(list(enumerate(samples))):
+            cached = sseq._sample_cache.get(i)  # type: ignore
+            assert (cached is sample) == (i >= len(samples) - expected)
+
+        # cached samples are not pickled
+        sseq = pickle.loads(pickle.dumps(sseq))
+        assert len(sseq._sample_cache) == 0  # type: ignore
+        assert len(sseq) == minimnist_dataset["len"]
+        assert sseq[-1].keys() == samples[-1].keys()
+
     @pytest.mark.parametrize(
         "root_folder", [Path("no-path"), Path(__file__).parent.resolve()]
     )
@@ -57,6 +96,124 @@ class TestSamplesSequencesSources:
                 folder=root_folder, must_exist=True
             )
 
+    def test_from_underfolder_manifest(
+        self, minimnist_dataset: dict, tmp_path: Path, monkeypatch
+    ):
+        import os
+        import shutil
+
+        from pipelime.sequences.sources.readers import UnderfolderManifest
+
+        folder = tmp_path / "dataset"
+        pls.SamplesSequence.from_underfolder(minimnist_dataset["path"]).to_underfolder(
+            folder, manifest=True
+        ).run()
+        manifest_path = UnderfolderManifest.path(folder)
+        assert manifest_path.is_file()
+
+        # the data folder must be older than the settle time
+        data_mtime = (folder / "data").stat().st_mtime_ns - 10**10
+        os.utime(folder / "data", ns=(data_mtime, data_mtime))
+
+        # the first reader builds the manifest, which is not a root item
+        first = pls.SamplesSequence.from_underfolder(folder)
+        assert UnderfolderManifest.load(folder, folder / "data") is not None
+        assert ".pipelime" not in first[0]
+
+        # the next readers do not scan the data folder
+        monkeypatch.setattr(UnderfolderManifest, "scan", None)
+        second = pls.SamplesSequence.from_underfolder(folder)
+        assert len(second) == len(first) == minimnist_dataset["len"]
+        for x, y in zip(first, second):
+            assert x.keys() == y.keys()
+            for k in x:
+                assert x[k].local_sources == y[k].local_sources
+        monkeypatch.undo()
+
+        # any change invalidates the manifest
+        shutil.copy(
+            first[0]["image"].local_sources[0], folder / "data" / "999_image.png"
+        )
+        assert UnderfolderManifest.load(folder, folder / "data") is None
+        assert len(pls.SamplesSequence.from_underfolder(folder)) == 1000
+
+    def test_from_underfolder_watch_polling(
+        self, minimnist_dataset: dict, tmp_path: Path, monkeypatch
+    ):
+        import os
+        import shutil
+
+        from pipelime.sequences.sources.readers import (
+            UnderfolderManifest,
+            _DirectoryWatcher,
+        )
+
+        monkeypatch.setattr(_DirectoryWatcher, "_libc", False)
+
+        folder = tmp_path / "dataset"
+        shutil.copytree(minimnist_dataset["path"], folder)
+        data_mtime = (folder / "data").stat().st_mtime_ns - 10**10
+        os.utime(folder / "data", ns=(data_mtime, data_mtime))
+
+        sseq = pls.SamplesSequence.from_underfolder(
+            folder, watch=True, use_manifest=False
+        )
+        assert len(sseq) == minimnist_dataset["len"]
+
+        # the data folder has not changed, so it is not scanned again
+        with monkeypatch.context() as m:
+            m.setattr(UnderfolderManifest, "scan", None)
+            assert len(sseq) == minimnist_dataset["len"]
+            image_path = sseq[0]["image"].local_sources[0]
+
+        # the data folder has just changed, so it is always scanned
+        shutil.copy(image_path, folder / "data" / "999_image.png")
+        assert len(sseq) == 1000
+        stamp = sseq._data_stamp  # type: ignore
+        assert len(sseq) == 1000
+        assert sseq._data_stamp != stamp  # type: ignore
+
+    @pytest.mark.skipif(
+        not sys.platform.startswith("linux"), reason="inotify is available on Linux"
+    )
+    def test_from_underfolder_watch_events(
+        self, minimnist_dataset: dict, tmp_path: Path, monkeypatch
+    ):
+        import shutil
+
+        from pipelime.sequences.sources.readers import UnderfolderManifest
+
+        folder = tmp_path / "dataset"
+        shutil.copytree(minimnist_dataset["path"], folder)
+        sseq = pls.SamplesSequence.from_underfolder(folder, watch=True)
+        assert len(sseq) == minimnist_dataset["len"]
+
+        # the file list is updated with no lock, so threads cannot share the reader
+        assert not sseq.thread_safe
+        assert pls.SamplesSequence.from_underfolder(folder).thread_safe
+
+        first = sseq[0]["image"]
+        assert sseq[0]["image"] is first
+
+        # only the changed files are updated
+        monkeypatch.setattr(UnderfolderManifest, "scan", None)
+        image_path = first.local_sources[0]
+        shutil.copy(image_path, folder / "data" / "999_image.png")
+        assert len(sseq) == 1000
+        assert sseq[999].keys() == {"image"} | sseq.root_sample.keys()
+        assert sseq[0]["image"] is first
+
+        shutil.copy(image_path, folder / "data" / "999_label.txt")
+        assert sseq[999].keys() == {"image", "label"} | sseq.root_sample.keys()
+
+        # a file rewritten in place creates a new sample
+        shutil.copyfile(folder / "data" / "999_image.png", image_path)
+        assert sseq[0]["image"] is not first
+
+        for p in (folder / "data").glob("999_*"):
+            p.unlink()
+        assert len(sseq) == minimnist_dataset["len"]
+
     def test_from_list(self, minimnist_dataset: dict):
         source = pls.SamplesSequence.from_underfolder(
             folder=minimnist_dataset["path"], merge_root_items=False
@@ -118,6 +275,15 @@ class TestSamplesSequencesSources:
                     assert set(sample.keys()) == {"image"}
                     assert isinstance(sample["image"](), np.ndarray)
 
+    @pytest.mark.parametrize("sample_cache", ["none", "all", "lru(2)"])
+    def test_from_images_sample_cache(self, raw_images: Path, sample_cache):
+        sseq = pls.SamplesSequence.from_images(
+            folder=raw_images, sample_cache=sample_cache
+        )
+        assert (sseq[0] is sseq[0]) == (sample_cache != "none")
+        assert sseq[-1]["image"].local_sources == sseq[-1]["image"].local_sources
+        assert sseq.sample_cache == (2 if sample_cache == "lru(2)" else sample_cache)
+
     @pytest.mark.parametrize("must_exist", [True, False])
     def test_from_images_must_exist(self, must_exist: bool):
         cm = pytest.raises(ValueError) if must_exist else contextlib.nullcontext()
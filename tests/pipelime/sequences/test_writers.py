@@ -5,6 +5,12 @@ import pipelime.sequences as pls
 import typing as t
 
 
+def _image_to_npy(x: pls.Sample) -> pls.Sample:
+    import pipelime.items as pli
+
+    return x.set_item("image", pli.NpyNumpyItem(x["image"]()))
+
+
 class TestSamplesSequenceWriters:
     def _read_write_data(
         self, source_dataset, out_folder, **writer_kwargs
@@ -129,3 +135,187 @@ class TestSamplesSequenceWriters:
                 minimnist_dataset, tmp_path / "outfolder"
             )
         self._check_data_and_outputs(source, dest, lambda key: 1)
+
+    @pytest.mark.parametrize("num_workers", [0, 2])
+    def test_write_behind(
+        self, minimnist_private_dataset: dict, tmp_path: Path, num_workers: int
+    ):
+        import pipelime.items as pli
+
+        item_key = minimnist_private_dataset["item_keys"][0]
+        source = pls.SamplesSequence.from_underfolder(
+            folder=minimnist_private_dataset["path"], merge_root_items=True
+        )
+        with pli.item_serialization_mode(pli.SerializationMode.HARD_LINK):
+            source.to_underfolder(
+                folder=tmp_path / "outfolder",
+                key_serialization_mode={item_key: pli.SerializationMode.DEEP_COPY},
+                write_behind=2,
+            ).run(num_workers=num_workers, track_fn=None)
+        dest = pls.SamplesSequence.from_underfolder(
+            folder=tmp_path / "outfolder", merge_root_items=True
+        )
+        self._check_data_and_outputs(
+            source, dest, lambda key: 1 if key == item_key else 2
+        )
+
+    def test_write_behind_errors(
+        self, minimnist_dataset: dict, tmp_path: Path, monkeypatch
+    ):
+        from pipelime.sequences.pipes.writers import (
+            UnderfolderWriter,
+            drain_pending_writes,
+        )
+
+        write_item = UnderfolderWriter._write_item
+
+        def _write_item(self, item, key, id_str, id_nofill):
+            if key == "image" and int(id_nofill) % 2 == 1:
+                raise OSError(f"disk failure on {id_nofill}")
+            return write_item(self, item, key, id_str, id_nofill)
+
+        monkeypatch.setattr(UnderfolderWriter, "_write_item", _write_item)
+
+        seq = pls.SamplesSequence.from_underfolder(minimnist_dataset["path"])
+        with pytest.raises(RuntimeError, match="sample 1: disk failure"):
+            seq.to_underfolder(tmp_path / "outfolder", write_behind=4).run(
+                track_fn=None
+            )
+
+        # the failed jobs are not reported again
+        drain_pending_writes()
+
+    def test_write_behind_pool_reuse(self):
+        from pipelime.sequences.pipes.writers import _WriteBehindPool
+
+        pool = _WriteBehindPool.get(1)
+        assert _WriteBehindPool.get(1) is pool
+        assert _WriteBehindPool.get(8) is pool
+
+    @pytest.mark.parametrize("num_workers", [0, 2])
+    @pytest.mark.parametrize("manifest", [True, False])
+    def test_overwrite(
+        self,
+        minimnist_dataset: dict,
+        tmp_path: Path,
+        num_workers: int,
+        manifest: bool,
+    ):
+        from pipelime.stages import StageLambda
+
+        out_folder = tmp_path / "outfolder"
+        source = pls.SamplesSequence.from_underfolder(minimnist_dataset["path"])
+        source.to_underfolder(out_folder, manifest=manifest).run(track_fn=None)
+        data_files = sorted((out_folder / "data").iterdir())
+        inodes = [p.stat().st_ino for p in data_files]
+
+        # re-exporting in place keeps the files as they are
+        dest = pls.SamplesSequence.from_underfolder(out_folder)
+        dest.to_underfolder(out_folder, exists_ok=True, manifest=manifest).run(
+            num_workers=num_workers, track_fn=None
+        )
+        assert sorted((out_folder / "data").iterdir()) == data_files
+        assert [p.stat().st_ino for p in data_files] == inodes
+
+        # items saved with a different extension replace the old files
+        source = source.map(StageLambda(_image_to_npy))  # type: ignore
+        source.to_underfolder(out_folder, exists_ok=True, manifest=manifest).run(
+            num_workers=num_workers, track_fn=None
+        )
+        image_files = sorted((out_folder / "data").glob("*_image.*"))
+        assert len(image_files) == len(source)
+        assert all(p.suffix == ".npy" for p in image_files)
+        self._check_data(source, pls.SamplesSequence.from_underfolder(out_folder))
+
+    @pytest.mark.parametrize("num_workers", [0, 2])
+    def test_shared_items(
+        self, minimnist_dataset: dict, tmp_path: Path, num_workers: int, monkeypatch
+    ):
+        from pipelime.sequences.pipes.writers import UnderfolderWriter
+
+        calls = []
+        write_shared_item = UnderfolderWriter._write_shared_item
+
+        def _write_shared_item(self, item, key):
+            calls.append(key)
+            return write_shared_item(self, item, key)
+
+        monkeypatch.setattr(UnderfolderWriter, "_write_shared_item", _write_shared_item)
+
+        source, dest = self._read_write_data(minimnist_dataset, tmp_path / "out_seq")
+        self._check_data(source, dest)
+        shared_keys = [k for k, v in source[0].items() if v.is_shared]
+        assert shared_keys
+        assert sorted(calls) == sorted(shared_keys)
+
+        source.to_underfolder(tmp_path / "out_mp").run(
+            num_workers=num_workers, track_fn=None
+        )
+        root_files = [p.name for p in (tmp_path / "out_mp").iterdir() if p.is_file()]
+        assert sorted(p.split(".")[0] for p in root_files) == sorted(shared_keys)
+
+    @pytest.mark.parametrize("staged", [False, True])
+    def test_resume(
+        self,
+        minimnist_private_dataset: dict,
+        tmp_path: Path,
+        staged: bool,
+        monkeypatch,
+    ):
+        import os
+
+        from pipelime.sequences.sources.readers import UnderfolderReader
+
+        out_folder = tmp_path / "outfolder"
+        source = pls.SamplesSequence.from_underfolder(minimnist_private_dataset["path"])
+        source.to_underfolder(out_folder, resume=True).run(track_fn=None)
+
+        # simulate an interrupted run: half of the samples are not in the journal,
+        # the last line is truncated and the files of another sample have changed
+        journal = out_folder / ".pipelime" / "journal"
+        lines = journal.read_text().splitlines(keepends=True)
+        assert len(lines) == len(source)
+        lines.sort(key=lambda line: int(line.split("\t")[0]))
+        half = len(lines) // 2
+        journal.write_text("".join(lines[:half]) + lines[half][:10])
+        os.utime(sorted((out_folder / "data").glob("*_image.*"))[0], ns=(0, 0))
+
+        read_idxs = []
+        get_sample = UnderfolderReader.get_sample
+
+        def _get_sample(self, idx):
+            read_idxs.append(idx)
+            return get_sample(self, idx)
+
+        monkeypatch.setattr(UnderfolderReader, "get_sample", _get_sample)
+
+        # the skipped samples are read back from the output dataset, with the same
+        # keys, shared items included, and absolute paths even if the folder is not
+        out_samples = []
+        seq = pls.SamplesSequence.from_underfolder(minimnist_private_dataset["path"])
+        monkeypatch.chdir(tmp_path)
+        pls.grab_all(
+            pls.Grabber(staged=pls.StagedWorkers(read=2, write=2) if staged else None),
+            seq.to_underfolder(Path(out_folder.name), resume=True),
+            sample_fn=out_samples.append,
+        )
+        assert sorted(read_idxs) == [0] + list(range(half, len(source)))
+        assert len(out_samples) == len(source)
+        ref_sample = source[0]
+        for x in out_samples:
+            assert x.keys() == ref_sample.keys()
+            for k, v in x.items():
+                assert v.is_shared == ref_sample[k].is_shared
+                assert all(p.is_absolute() for p in v.local_sources)
+        self._check_data(source, pls.SamplesSequence.from_underfolder(out_folder))
+
+        # now all the samples are completed
+        read_idxs.clear()
+        seq.to_underfolder(out_folder, resume=True).run(track_fn=None)
+        assert read_idxs == []
+
+        # overwriting drops the journal
+        with pytest.raises(ValueError, match="resume=True"):
+            seq.to_underfolder(out_folder)
+        seq.to_underfolder(out_folder, exists_ok=True).run(track_fn=None)
+        assert not journal.exists()
@@ -175,6 +175,44 @@ class TestResize:
             if len(resized_image.shape) == 3:
                 assert resized_image.shape[2] == orig_image.shape[2]
 
+    @pytest.mark.parametrize(
+        "size", [(60, 90), ("max", 100), ("min", 50), ("min", 67), (500, 500)]
+    )
+    @pytest.mark.parametrize("output_key_format", ["*", "*_resized"])
+    def test_reduced_decoding(self, tmp_path, size, output_key_format) -> None:
+        from pipelime.stages import StageResize
+        import pipelime.items as pli
+        import numpy as np
+
+        image = np.random.randint(0, 255, (401, 603, 3), dtype=np.uint8)
+        pli.JpegImageItem(image).serialize(tmp_path / "image.jpg")
+
+        def _resize(reduced_decoding):
+            stage = StageResize(
+                size=size,
+                images="image",
+                output_key_format=output_key_format,
+                reduced_decoding=reduced_decoding,
+            )  # type: ignore
+            item = pli.JpegImageItem(tmp_path / "image.jpg")
+            item.cache_data = True
+            return stage(Sample({"image": item}))
+
+        sample = _resize(True)
+        expected = _resize(False)
+        if output_key_format != "*":
+            # the input image is decoded only when upsampling
+            assert (sample["image"]._data_cache is None) == (size != (500, 500))
+            assert sample["image"]().shape == image.shape
+
+        out_key = output_key_format.replace("*", "image")
+        resized, full = sample[out_key](), expected[out_key]()
+        assert resized.shape == full.shape
+        if isinstance(size[0], int):
+            assert resized.shape[:2] == size
+        else:
+            assert (max if size[0] == "max" else min)(resized.shape[:2]) == size[1]
+
 
 class TestCropAndPad:
     @pytest.mark.parametrize(
@@ -225,3 +263,25 @@ class TestCropAndPad:
             if len(cropped_image.shape) == 3:
                 assert cropped_image.shape[2] == orig_image.shape[2]
             assert cropped_image.shape[:2] == (h, w)
+
+    @pytest.mark.parametrize(
+        ["x", "y", "w", "h"], [(10, 20, 40, 30), (-5, 60, 130, 80), (200, 0, 10, 10)]
+    )
+    @pytest.mark.parametrize("ext", [".tiff", ".npy", ".png"])
+    def test_region_read(self, tmp_path, x, y, w, h, ext) -> None:
+        from pipelime.stages import StageCropAndPad
+        import pipelime.items as pli
+        import numpy as np
+
+        image = np.random.randint(0, 255, (100, 120, 3), dtype=np.uint8)
+        item_cls = pli.Item.get_instance(f"image{ext}").__class__
+        item_cls(image).serialize(tmp_path / f"image{ext}")
+        item = item_cls(tmp_path / f"image{ext}")
+
+        stage = StageCropAndPad(x=x, y=y, width=w, height=h)  # type: ignore
+        cropped = stage(Sample({"image": item}))["image"]()
+        expected = stage(Sample({"image": pli.NpyNumpyItem(image)}))["image"]()
+
+        assert np.array_equal(cropped, expected)
+        if ext != ".png":
+            assert item._data_cache is None
@@ -67,3 +67,19 @@ class TestItemInfo:
         with pytest.raises(ValueError) as exc_info:
             source.run()
         assert "shared" in str(exc_info)
+
+    @pytest.mark.parametrize("num_workers", [0, 2])
+    def test_item_info_reduce(self, minimnist_dataset: dict, num_workers: int):
+        source = SamplesSequence.from_underfolder(minimnist_dataset["path"])
+
+        stage = StageItemInfo()
+        source.map(stage).run()
+
+        reduced = source.reduce(
+            StageItemInfo,
+            StageItemInfo.update,
+            StageItemInfo.merge,
+            num_workers=num_workers,
+            track_fn=False,
+        )
+        assert reduced.items_info == stage.items_info